@@ -6,10 +6,12 @@ from rest_framework.routers import SimpleRouter
 
 from categories.urls import router as categories_router
 from orders.urls import router as orders_router
+from ratings.urls import router as ratings_router
 
 router = SimpleRouter()
 router.registry.extend(categories_router.registry)
 router.registry.extend(orders_router.registry)
+router.registry.extend(ratings_router.registry)
 
 urlpatterns = [
     path('user/', include('user.urls')),
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'categories',
     'orders',
     'payments',
+    'ratings',
 ]
 
 MIDDLEWARE = [
@@ -100,6 +101,34 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. memcached) so cache invalidation reaches every process.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+CATALOGUE_CACHE_TIMEOUT = 300
+
+# Seconds a process serves its category snapshot before rebuilding it,
+# even if no version bump reached it
+CATEGORY_SNAPSHOT_MAX_AGE = 60
+
+# Seconds stock stays reserved for a cart item and for an unpaid checkout
+CART_RESERVATION_TTL = 15 * 60
+CHECKOUT_RESERVATION_TTL = 30 * 60
+
+# Guest carts live in a signed cookie, kept well under the 4KB cookie limit
+GUEST_CART_MAX_AGE = 30 * 24 * 60 * 60
+GUEST_CART_MAX_ITEMS = 50
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -148,6 +177,15 @@ MEDIA_URL = '/static/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
+# Media is served by core.views.serve_media. Set MEDIA_SENDFILE_HEADER to
+# X-Sendfile (Apache, lighttpd) or X-Accel-Redirect (nginx, with an
+# internal location mapped to MEDIA_ROOT) to hand the file transfer off
+# to the web server.
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')
+MEDIA_ACCEL_REDIRECT_LOCATION = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_LOCATION', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
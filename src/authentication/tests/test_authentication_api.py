@@ -4,7 +4,11 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.models import Cart, Reservation
+from helpers.test_helpers import create_product
+
 CREATE_TOKEN_URL = reverse('token:create')
+GUEST_CART_URL = reverse('carts:guest')
 
 
 class AuthenticationTokenApiTests(TestCase):
@@ -19,6 +23,34 @@ class AuthenticationTokenApiTests(TestCase):
             last_name='Last Name'
         )
 
+    def test_login_merges_guest_cart(self):
+        """
+        Logging in with a guest cart
+        should merge it into the user's cart, up to the available inventory
+        """
+        first = create_product(self.user, inventory=3)
+        second = create_product(self.user, inventory=5)
+        Cart.objects.create(user=self.user, product=first, quantity=2)
+        self.client.post(GUEST_CART_URL, {'operations': [
+            {'op': 'add', 'product': first.id, 'quantity': 3},
+            {'op': 'add', 'product': second.id, 'quantity': 4},
+        ]}, format='json')
+
+        res = self.client.post(CREATE_TOKEN_URL, {
+            'email': 'example@email.com',
+            'password': 'testpass',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.cookies['guest_cart'].value, '')
+        self.assertEqual(
+            dict(Cart.objects.filter(user=self.user).values_list('product', 'quantity')),
+            {first.id: 3, second.id: 4})
+        self.assertEqual(
+            dict(Reservation.objects.filter(user=self.user).values_list(
+                'product', 'quantity')),
+            {first.id: 3, second.id: 4})
+
     def test_obtain_token(self):
         """
         Tokens are set as http only cookies
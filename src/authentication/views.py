@@ -1,19 +1,40 @@
+from django.conf import settings
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from carts.guest import load_guest_cart, merge_guest_cart, save_guest_cart
+
 
 class CookieTokenObtainView(TokenObtainPairView):
     """
-    Sets the refresh and access token as http only cookies
+    Sets the refresh and access token as http only cookies,
+    and merges the guest cart into the user's cart
     """
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        response = Response(serializer.validated_data, status=status.HTTP_200_OK)
+        items = load_guest_cart(request)
+        if items:
+            merge_guest_cart(
+                serializer.user, items, settings.CART_RESERVATION_TTL)
+            save_guest_cart(response, {})
+
+        return response
+
     def finalize_response(self, request, response, *args, **kwargs):
         if response.status_code == 200:
             access_token = response.data.pop('access')
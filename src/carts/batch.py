@@ -0,0 +1,170 @@
+"""
+Batched cart mutations.
+
+The operations of a batch are replayed in order against the cart
+quantities of the products they name, checked against the availability
+read in one query after locking those products. Operations that can't
+be applied are reported and skipped, the net change per product is then
+written with one bulk statement per kind of change.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from carts.serializers import CartBatchSerializer, CartOperationSerializer
+from carts.summary import invalidate_cart_cache
+from core.models import Cart, Product, Reservation
+from products.inventory import get_available_inventory
+
+
+def parse_operations(data):
+    """
+    Validate a batch and each of its operations on its own
+
+    :returns: (valid operations, result of every operation)
+    :raises: ValidationError if the batch itself is invalid
+    """
+    batch = CartBatchSerializer(data=data)
+    batch.is_valid(raise_exception=True)
+
+    operations = []
+    results = []
+    for data in batch.validated_data['operations']:
+        serialized = CartOperationSerializer(data=data)
+        if serialized.is_valid():
+            operations.append(serialized.validated_data)
+            results.append({'status': 'applied'})
+        else:
+            results.append({'status': 'failed', 'errors': serialized.errors})
+
+    return operations, results
+
+
+def report_errors(results, errors):
+    """
+    Mark the results of the valid operations that couldn't be applied,
+    errors holding one entry per valid operation
+    """
+    errors = iter(errors)
+
+    for result in results:
+        if result['status'] == 'applied':
+            error = next(errors)
+            if error is not None:
+                result.update(status='failed', errors=[error])
+
+
+def replay_operations(operations, quantities, available, max_items=None):
+    """
+    Apply operations to quantities ({product_id: quantity}) in place,
+    holding at most max_items products if set
+
+    :returns: list of the error of each operation, None if applied
+    """
+    errors = []
+
+    for operation in operations:
+        product_id = operation['product']
+        current = quantities.get(product_id, 0)
+
+        if product_id not in available:
+            errors.append('Product not found.')
+            continue
+
+        if operation['op'] == CartOperationSerializer.ADD:
+            quantity = current + operation['quantity']
+            held = sum(1 for value in quantities.values() if value)
+            if not current and max_items is not None and held >= max_items:
+                errors.append('Cart is full.')
+                continue
+        elif not current:
+            errors.append('Product not in cart.')
+            continue
+        elif operation['op'] == CartOperationSerializer.SET:
+            quantity = operation['quantity']
+        else:
+            quantity = 0
+
+        if quantity > current and quantity > available[product_id]:
+            errors.append('Insufficient inventory')
+            continue
+
+        quantities[product_id] = quantity
+        errors.append(None)
+
+    return errors
+
+
+def apply_operations(user, operations, ttl):
+    """
+    Apply validated cart operations of user in one transaction,
+    holding the resulting quantities for ttl seconds
+
+    :returns: list of the error of each operation, None if applied
+    """
+    product_ids = sorted({operation['product'] for operation in operations})
+    now = timezone.now()
+
+    with transaction.atomic():
+        prices = dict(
+            Product.objects.select_for_update().filter(pk__in=product_ids)
+            .order_by('pk').values_list('pk', 'price')
+        )
+        available = get_available_inventory(product_ids, user=user)
+        carts = {
+            cart.product_id: cart
+            for cart in Cart.objects.filter(user=user, product__in=product_ids)
+        }
+        quantities = {
+            product_id: cart.quantity for product_id, cart in carts.items()}
+
+        errors = replay_operations(operations, quantities, available)
+
+        changed = {
+            product_id: quantity
+            for product_id, quantity in quantities.items()
+            if product_id not in carts or carts[product_id].quantity != quantity
+        }
+        if not changed:
+            return errors
+
+        removed = [pk for pk, quantity in changed.items() if not quantity]
+        updated = []
+        created = []
+        for product_id, quantity in changed.items():
+            if not quantity:
+                continue
+
+            cart = carts.get(product_id) or Cart(user=user, product_id=product_id)
+            cart.quantity = quantity
+            cart.unit_price = prices[product_id]
+            cart.updated_at = now
+            (updated if cart.pk else created).append(cart)
+
+        if removed:
+            Cart.objects.filter(user=user, product__in=removed).delete()
+        if updated:
+            Cart.objects.bulk_update(
+                updated, ['quantity', 'unit_price', 'updated_at'])
+        if created:
+            Cart.objects.bulk_create(created)
+        # Bulk statements send no signals
+        invalidate_cart_cache(user.pk)
+
+        Reservation.objects.filter(
+            user=user, order__isnull=True, product__in=list(changed)).delete()
+        reservations = []
+        for product_id, quantity in changed.items():
+            # A lowered quantity may still exceed what is left
+            held = min(quantity, max(available[product_id], 0))
+            if held:
+                reservations.append(Reservation(
+                    product_id=product_id,
+                    user=user,
+                    quantity=held,
+                    expires_at=now + timedelta(seconds=ttl),
+                ))
+        Reservation.objects.bulk_create(reservations)
+
+    return errors
@@ -0,0 +1,133 @@
+"""
+Carts of anonymous shoppers.
+
+A guest cart lives in a signed cookie as compact "product:quantity"
+pairs, so browsing without an account never writes to the database.
+Guest carts hold no reservations, their quantities are only checked
+against the available inventory. At login the guest cart is merged
+into the user's cart by one upsert, capped at what is available, which
+reserves the merged quantities.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction
+from django.utils import timezone
+
+from carts.summary import invalidate_cart_cache
+from core.models import Cart, Product, Reservation
+
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_SALT = 'carts.guest'
+
+MERGE_SQL = '''
+    WITH guest AS (
+        SELECT *
+        FROM unnest(%(products)s::bigint[], %(quantities)s::integer[])
+            AS guest(product_id, quantity)
+    ), product AS (
+        SELECT product.id, product.price, product.inventory - COALESCE((
+            SELECT SUM(reservation.quantity)
+            FROM {reservations} reservation
+            WHERE reservation.product_id = product.id
+                AND reservation.expires_at > %(now)s
+                AND (reservation.user_id <> %(user)s
+                     OR reservation.order_id IS NOT NULL)
+        ), 0) AS available
+        FROM {products} product
+        WHERE product.id = ANY(%(products)s)
+    ), cart AS (
+        INSERT INTO {carts} AS cart
+            (user_id, product_id, unit_price, quantity, created_at, updated_at)
+        SELECT %(user)s, product.id, product.price,
+               LEAST(guest.quantity, product.available), %(now)s, %(now)s
+        FROM guest
+        JOIN product ON product.id = guest.product_id
+        WHERE product.available > 0
+        ON CONFLICT (user_id, product_id) DO UPDATE
+        SET quantity = GREATEST(cart.quantity, LEAST(
+                cart.quantity + EXCLUDED.quantity,
+                (SELECT available FROM product WHERE id = EXCLUDED.product_id))),
+            unit_price = EXCLUDED.unit_price,
+            updated_at = EXCLUDED.updated_at
+        RETURNING cart.product_id, cart.quantity
+    ), reservation AS (
+        INSERT INTO {reservations}
+            (product_id, user_id, order_id, quantity, expires_at, created_at)
+        SELECT cart.product_id, %(user)s, NULL,
+               LEAST(cart.quantity, product.available), %(expires_at)s, %(now)s
+        FROM cart
+        JOIN product ON product.id = cart.product_id
+        ON CONFLICT (product_id, user_id) WHERE order_id IS NULL DO UPDATE
+        SET quantity = EXCLUDED.quantity, expires_at = EXCLUDED.expires_at
+    )
+    SELECT COUNT(*) FROM cart
+'''
+
+
+def load_guest_cart(request):
+    """
+    :returns: {product_id: quantity}, empty if the cookie is missing,
+        tampered with or malformed
+    """
+    try:
+        value = request.get_signed_cookie(
+            GUEST_CART_COOKIE, default='', salt=GUEST_CART_SALT)
+        pairs = (item.split(':') for item in value.split(',') if item)
+        return {int(product): int(quantity) for product, quantity in pairs}
+    except (signing.BadSignature, ValueError):
+        return {}
+
+
+def save_guest_cart(response, items):
+    items = {product: quantity for product, quantity in items.items() if quantity}
+
+    if not items:
+        response.delete_cookie(GUEST_CART_COOKIE)
+        return
+
+    response.set_signed_cookie(
+        GUEST_CART_COOKIE,
+        ','.join(f'{product}:{quantity}' for product, quantity in items.items()),
+        salt=GUEST_CART_SALT,
+        max_age=settings.GUEST_CART_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def merge_guest_cart(user, items, ttl):
+    """
+    Add the guest cart items to the user's cart, each capped at the
+    units available to the user, and hold them for ttl seconds
+
+    :returns: number of cart items written
+    """
+    if not items:
+        return 0
+
+    quote_name = connection.ops.quote_name
+    product_ids = sorted(items)
+    now = timezone.now()
+    sql = MERGE_SQL.format(
+        reservations=quote_name(Reservation._meta.db_table),
+        products=quote_name(Product._meta.db_table),
+        carts=quote_name(Cart._meta.db_table),
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Locked first, see carts.upsert
+        list(Product.objects.select_for_update().filter(
+            pk__in=product_ids).order_by('pk').values_list('pk'))
+        cursor.execute(sql, {
+            'user': user.pk,
+            'products': product_ids,
+            'quantities': [items[pk] for pk in product_ids],
+            'now': now,
+            'expires_at': now + timedelta(seconds=ttl),
+        })
+        merged = cursor.fetchone()[0]
+
+    invalidate_cart_cache(user.pk)
+    return merged
@@ -0,0 +1,72 @@
+"""
+Repricing of cart items.
+
+A cart item keeps the unit price its product had when it was last
+saved. Repricing copies the current prices into every stale cart row
+with UPDATE ... FROM, walking the carts in id order chunk_size rows at
+a time, so a product in many carts never holds one long lock on them.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from carts.summary import invalidate_cart_cache
+from core.models import Cart, Product
+
+REPRICE_SQL = '''
+    WITH chunk AS (
+        SELECT cart.id
+        FROM {carts} cart
+        JOIN {products} product ON product.id = cart.product_id
+        WHERE cart.id > %(after)s
+            AND cart.unit_price <> product.price
+            {product_filter}
+        ORDER BY cart.id
+        LIMIT %(size)s
+    )
+    UPDATE {carts} cart
+    SET unit_price = product.price, updated_at = %(now)s
+    FROM chunk, {products} product
+    WHERE cart.id = chunk.id AND product.id = cart.product_id
+    RETURNING cart.id, cart.user_id
+'''
+
+
+def get_reprice_sql(product_ids):
+    quote_name = connection.ops.quote_name
+
+    return REPRICE_SQL.format(
+        carts=quote_name(Cart._meta.db_table),
+        products=quote_name(Product._meta.db_table),
+        product_filter=(
+            'AND cart.product_id = ANY(%(products)s)'
+            if product_ids is not None else ''),
+    )
+
+
+def reprice_carts(product_ids=None, chunk_size=1000):
+    """
+    Copy the current price of the products into their cart items,
+    of every product if product_ids is None
+
+    :returns: number of cart items repriced
+    """
+    sql = get_reprice_sql(product_ids)
+    params = {
+        'products': list(product_ids or []),
+        'size': chunk_size,
+        'after': 0,
+    }
+    repriced = 0
+
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, dict(params, now=timezone.now()))
+            rows = cursor.fetchall()
+
+            for user_id in {user_id for _, user_id in rows}:
+                invalidate_cart_cache(user_id)
+
+        repriced += len(rows)
+        if len(rows) < chunk_size:
+            return repriced
+        params['after'] = max(cart_id for cart_id, _ in rows)
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 
 from core.models import Cart
+from core.serializers import SparseFieldsetMixin
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     total = serializers.SerializerMethodField()
     product_name = serializers.SerializerMethodField()
@@ -22,6 +23,10 @@ class CartSerializer(serializers.ModelSerializer):
             'created_at': {'read_only': True},
             'updated_at': {'read_only': True},
         }
+        method_field_paths = {
+            'total': ['unit_price', 'quantity'],
+            'product_name': ['product__name'],
+        }
 
     def get_total(self, instance):
         """
@@ -40,6 +45,7 @@ class CartSerializer(serializers.ModelSerializer):
         product = attrs.get('product')
         quantity = attrs.get('quantity')
 
+        # Only a quick check, the view reserves the units under a lock
         if (product.inventory < quantity):
             raise serializers.ValidationError('Insufficient inventory')
 
@@ -89,3 +95,65 @@ class CartDetailSerializer(CartSerializer):
                     field_name: "This field is read-only."
                 })
         return super().to_internal_value(data)
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    Serializer for one operation of a cart batch
+    """
+    ADD = 'add'
+    SET = 'set'
+    REMOVE = 'remove'
+
+    op = serializers.ChoiceField(choices=[ADD, SET, REMOVE])
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(
+        min_value=1, max_value=32767, required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != self.REMOVE and 'quantity' not in attrs:
+            raise serializers.ValidationError(
+                {'quantity': 'This field is required.'})
+
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """
+    Serializer for a list of cart operations, each validated on its own
+    so an invalid one doesn't reject the others
+    """
+    operations = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=100)
+
+
+class SellerSubtotalSerializer(serializers.Serializer):
+    seller = serializers.IntegerField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
+    subtotal = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True)
+
+
+class CartSummarySerializer(serializers.Serializer):
+    """
+    Serializer for the totals of a cart, overall and per seller
+    """
+    count = serializers.IntegerField(read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
+    subtotal = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True)
+    sellers = SellerSubtotalSerializer(many=True, read_only=True)
+
+
+class GuestCartItemSerializer(serializers.Serializer):
+    """
+    Serializer for an item of a guest cart, read from its product row
+    """
+    product = serializers.IntegerField(source='id', read_only=True)
+    product_name = serializers.CharField(source='name', read_only=True)
+    unit_price = serializers.DecimalField(
+        source='price', max_digits=12, decimal_places=2, read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
+    total = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True)
@@ -0,0 +1,60 @@
+"""
+Cart totals for the header of every page.
+
+The summary is one aggregate query grouped by seller, the overall
+totals are added up from the seller rows. It is cached per user under
+the user's 'cart:<pk>' version, which every cart write bumps.
+"""
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Sum
+
+from core.cache import get_version
+from core.models import Cart
+from products.cache import invalidate
+
+SUMMARY_TIMEOUT = 60 * 60
+
+
+def cart_version(user_id):
+    return f'cart:{user_id}'
+
+
+def invalidate_cart_cache(user_id):
+    invalidate(cart_version(user_id))
+
+
+def aggregate_cart(user):
+    """
+    :returns: the summary of the user's cart, with its subtotal per seller
+    """
+    sellers = list(
+        Cart.objects.filter(user=user)
+        .values(seller=F('product__user'))
+        # subtotal first, F('quantity') would read the quantity sum after it
+        .annotate(
+            subtotal=Sum(
+                F('unit_price') * F('quantity'),
+                output_field=DecimalField(max_digits=14, decimal_places=2)),
+            count=Count('id'),
+            quantity=Sum('quantity'),
+        )
+        .order_by('seller')
+    )
+
+    return {
+        'count': sum(seller['count'] for seller in sellers),
+        'quantity': sum(seller['quantity'] for seller in sellers),
+        'subtotal': sum(seller['subtotal'] for seller in sellers),
+        'sellers': sellers,
+    }
+
+
+def get_cart_summary(user):
+    key = f'cart_summary:{user.pk}:{get_version(cart_version(user.pk))}'
+    summary = cache.get(key)
+
+    if summary is None:
+        summary = aggregate_cart(user)
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+
+    return summary
@@ -1,13 +1,24 @@
-from django.test import TestCase
+import threading
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from carts.serializers import CartSerializer
-from core.models import Cart
+from carts.upsert import add_to_cart
+from core.models import Cart, Product, Reservation
 from helpers.test_helpers import create_carts, create_product, create_user
 
 CARTS_URL = reverse('carts:carts-list')
+BATCH_URL = reverse('carts:carts-batch')
+SUMMARY_URL = reverse('carts:summary')
+GUEST_URL = reverse('carts:guest')
 
 
 def detail_url(id):
@@ -35,6 +46,73 @@ class PublicCartsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class GuestCartApiTests(TestCase):
+    """
+    Tests for the cookie based carts of anonymous shoppers
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = create_user()
+        self.products = [
+            create_product(self.seller, price=100, inventory=3) for _ in range(3)]
+
+    def post(self, *operations):
+        return self.client.post(
+            GUEST_URL, {'operations': list(operations)}, format='json')
+
+    def test_guest_cart(self):
+        """
+        Adding products to a guest cart
+        should keep them in a cookie without writing to the database
+        """
+        first, second, _ = self.products
+
+        with CaptureQueriesContext(connection) as queries:
+            self.post({'op': 'add', 'product': first.id, 'quantity': 2},
+                      {'op': 'add', 'product': second.id, 'quantity': 1})
+            res = self.post({'op': 'add', 'product': first.id, 'quantity': 2},
+                            {'op': 'remove', 'product': second.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']], ['failed', 'applied'])
+        self.assertTrue(all(
+            query['sql'].lstrip().upper().startswith('SELECT') for query in queries))
+        self.assertFalse(Cart.objects.exists())
+
+        res = self.client.get(GUEST_URL)
+
+        self.assertEqual(
+            [(item['product'], item['quantity'], item['total'])
+             for item in res.data['items']],
+            [(first.id, 2, '200.00')])
+
+    def test_tampered_cookie_is_ignored(self):
+        """
+        Fetching a guest cart with a cookie not signed by the server
+        should return an empty cart
+        """
+        self.client.cookies['guest_cart'] = f'{self.products[0].id}:1'
+        res = self.client.get(GUEST_URL)
+
+        self.assertEqual(res.data['items'], [])
+
+    @override_settings(GUEST_CART_MAX_ITEMS=2)
+    def test_guest_cart_size_is_limited(self):
+        """
+        Adding more products than a guest cart can hold
+        should report the extra ones as failed
+        """
+        res = self.post(*[
+            {'op': 'add', 'product': product.id, 'quantity': 1}
+            for product in self.products
+        ])
+
+        self.assertEqual(res.data['results'][2]['errors'], ['Cart is full.'])
+        self.assertEqual(len(res.data['items']), 2)
+
+
 class PrivateCartsApiTests(TestCase):
     """
     Tests for authenticated carts api request
@@ -196,3 +274,278 @@ class PrivateCartsApiTests(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_adding_to_cart_twice(self):
+        """
+        Adding a product already in cart
+        should add to its quantity and reservation in a single upsert
+        """
+        product = create_product(self.seller, inventory=5)
+        self.client.post(CARTS_URL, {'product': product.id, 'quantity': 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(CARTS_URL, {'product': product.id, 'quantity': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['quantity'], 5)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 5)
+        self.assertEqual(Reservation.objects.get(user=self.user).quantity, 5)
+        self.assertEqual(
+            len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 3)
+
+        res = self.client.post(CARTS_URL, {'product': product.id, 'quantity': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 5)
+
+    def test_cart_reserves_inventory(self):
+        """
+        Adding the last units of a product to cart
+        should keep other users from adding them, until the cart is deleted
+        """
+        product = create_product(self.seller, inventory=2)
+        res = self.client.post(CARTS_URL, {'product': product.id, 'quantity': 2})
+        cart_id = res.data['id']
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.get(user=self.user).quantity, 2)
+
+        self.client.force_authenticate(self.seller)
+        res = self.client.post(CARTS_URL, {'product': product.id, 'quantity': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.user)
+        self.client.delete(detail_url(cart_id))
+        self.client.force_authenticate(self.seller)
+        res = self.client.post(CARTS_URL, {'product': product.id, 'quantity': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_batch_operations(self):
+        """
+        Posting a batch of cart operations
+        should apply them in order and return the resulting cart
+        """
+        products = [create_product(self.seller, inventory=5) for _ in range(3)]
+        Cart.objects.create(user=self.user, product=products[0], quantity=1)
+        payload = {'operations': [
+            {'op': 'add', 'product': products[0].id, 'quantity': 2},
+            {'op': 'add', 'product': products[1].id, 'quantity': 4},
+            {'op': 'set', 'product': products[1].id, 'quantity': 2},
+            {'op': 'add', 'product': products[2].id, 'quantity': 1},
+            {'op': 'remove', 'product': products[2].id},
+        ]}
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']], ['applied'] * 5)
+        self.assertEqual(
+            [(cart['product'], cart['quantity']) for cart in res.data['carts']],
+            [(products[0].id, 3), (products[1].id, 2)])
+        self.assertEqual(
+            dict(Reservation.objects.filter(user=self.user).values_list(
+                'product', 'quantity')),
+            {products[0].id: 3, products[1].id: 2})
+
+    def test_batch_reports_failed_operations(self):
+        """
+        Posting a batch with operations that can't be applied
+        should report them and still apply the others
+        """
+        product = create_product(self.seller, inventory=2)
+        payload = {'operations': [
+            {'op': 'add', 'product': product.id, 'quantity': 3},
+            {'op': 'add', 'product': product.id, 'quantity': 2},
+            {'op': 'set', 'product': product.id},
+            {'op': 'remove', 'product': 0},
+            {'op': 'remove', 'product': product.id + 1000},
+            {'op': 'clear', 'product': product.id},
+        ]}
+        res = self.client.post(BATCH_URL, payload, format='json')
+        results = res.data['results']
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['failed', 'applied', 'failed', 'failed', 'failed', 'failed'])
+        self.assertEqual(results[0]['errors'], ['Insufficient inventory'])
+        self.assertIn('quantity', results[2]['errors'])
+        self.assertEqual(results[4]['errors'], ['Product not found.'])
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 2)
+
+    def test_batch_query_count_is_constant(self):
+        """
+        Posting a larger batch
+        should run the same number of queries
+        """
+        products = [create_product(self.seller, inventory=5) for _ in range(6)]
+
+        def post(count):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(BATCH_URL, {'operations': [
+                    {'op': 'add', 'product': product.id, 'quantity': 1}
+                    for product in products[:count]
+                ]}, format='json')
+            Cart.objects.all().delete()
+            return len(queries)
+
+        self.assertEqual(post(2), post(6))
+
+    def test_cart_summary(self):
+        """
+        Fetching the cart summary
+        should return the totals overall and per seller from one query
+        """
+        other_seller = create_user(email='other@email.com', username='other')
+        first = create_product(self.seller, price=10, inventory=5)
+        second = create_product(self.seller, price=2.5, inventory=5)
+        third = create_product(other_seller, price=100, inventory=5)
+        for product, quantity in [(first, 2), (second, 4), (third, 1)]:
+            Cart.objects.create(user=self.user, product=product, quantity=quantity)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(res.data['quantity'], 7)
+        self.assertEqual(res.data['subtotal'], '130.00')
+        self.assertEqual(
+            [(seller['seller'], seller['subtotal']) for seller in res.data['sellers']],
+            [(self.seller.id, '30.00'), (other_seller.id, '100.00')])
+
+    def test_cart_summary_cache(self):
+        """
+        Fetching the cart summary again
+        should be served from cache until the cart changes
+        """
+        product = create_product(self.seller, price=10, inventory=5)
+        self.client.get(SUMMARY_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(SUMMARY_URL)
+        self.assertEqual(res.data['count'], 0)
+
+        self.client.post(CARTS_URL, {'product': product.id, 'quantity': 2})
+        res = self.client.get(SUMMARY_URL)
+        self.assertEqual(res.data['subtotal'], '20.00')
+
+        self.client.post(BATCH_URL, {'operations': [
+            {'op': 'set', 'product': product.id, 'quantity': 1}]}, format='json')
+        res = self.client.get(SUMMARY_URL)
+        self.assertEqual(res.data['subtotal'], '10.00')
+
+        self.client.delete(detail_url(Cart.objects.get(user=self.user).id))
+        res = self.client.get(SUMMARY_URL)
+        self.assertEqual(res.data['quantity'], 0)
+
+    def test_price_change_reprices_carts(self):
+        """
+        Changing the price of a product
+        should reprice the cart items holding it and report how many
+        """
+        product = create_product(self.seller, price=100, inventory=5)
+        other = create_product(self.seller, price=100, inventory=5)
+        cart = Cart.objects.create(user=self.user, product=product, quantity=2)
+        Cart.objects.create(user=self.seller, product=product, quantity=1)
+        Cart.objects.create(user=self.user, product=other, quantity=1)
+        self.assertEqual(self.client.get(SUMMARY_URL).data['subtotal'], '300.00')
+
+        self.client.force_authenticate(self.seller)
+        url = reverse('products:products-detail', args=[product.id])
+        res = self.client.patch(url, {'price': 120}, format='json')
+        self.client.force_authenticate(self.user)
+        cart.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Carts-Repriced'], '2')
+        self.assertEqual(cart.unit_price, 120)
+        self.assertEqual(self.client.get(SUMMARY_URL).data['subtotal'], '340.00')
+
+    def test_reprice_carts_command(self):
+        """
+        Running reprice_carts
+        should resync every stale cart item, chunk by chunk
+        """
+        products = [
+            create_product(self.seller, price=100, inventory=5) for _ in range(3)]
+        for product in products:
+            Cart.objects.create(user=self.user, product=product, quantity=1)
+        Product.objects.filter(pk__in=[products[0].pk, products[2].pk]).update(price=200)
+        stdout = StringIO()
+
+        call_command('reprice_carts', chunk_size=1, stdout=stdout)
+
+        self.assertIn('Repriced 2 cart items.', stdout.getvalue())
+        self.assertEqual(
+            list(Cart.objects.order_by('product').values_list('unit_price', flat=True)),
+            [200, 100, 200])
+
+    def test_list_query_count_is_constant(self):
+        """
+        Fetching carts with a larger page size
+        should run the same number of queries
+        """
+        create_carts(cart_user=self.user, product_user=self.seller, count=6)
+
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(CARTS_URL, {'limit': 2})
+        with CaptureQueriesContext(connection) as full_page:
+            res = self.client.get(CARTS_URL, {'limit': 6})
+
+        self.assertEqual(len(res.data['results']), 6)
+        self.assertEqual(len(small_page), len(full_page))
+
+    def test_sparse_fieldset(self):
+        """
+        Fetching carts with fields
+        should skip the product join nobody asked for
+        """
+        create_carts(cart_user=self.user, product_user=self.seller, count=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(CARTS_URL, {'fields': 'id,quantity,total'})
+
+        self.assertEqual(
+            set(res.data['results'][0]), {'id', 'quantity', 'total'})
+        self.assertNotIn(
+            'core_product', ' '.join(query['sql'] for query in queries))
+
+
+class ConcurrentCartTests(TransactionTestCase):
+    """
+    Tests for concurrent additions to the same cart
+    """
+
+    def test_concurrent_adds_lose_no_increment(self):
+        """
+        Adding the same product to a cart from many threads at once
+        should count every unit added
+        """
+        user = create_user()
+        product = create_product(user, inventory=100)
+        barrier = threading.Barrier(8)
+        errors = []
+
+        def add():
+            try:
+                barrier.wait()
+                for _ in range(5):
+                    add_to_cart(user, product.id, 1, 60)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Cart.objects.get(user=user).quantity, 40)
+        self.assertEqual(Reservation.objects.get(user=user).quantity, 40)
@@ -0,0 +1,104 @@
+"""
+Atomic add-to-cart.
+
+Adding a product inserts the cart row or adds to its quantity with
+INSERT ... ON CONFLICT, checks the new quantity against the available
+inventory and renews the cart's reservation, all in one statement.
+Concurrent adds to the same cart therefore never lose an increment nor
+fail on the (user, product) unique constraint.
+
+The product row is locked by a statement of its own first: a statement
+reads the reservations of its starting snapshot, so the check would
+miss those committed while it waited for the lock.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from carts.summary import invalidate_cart_cache
+from core.models import Cart, Product, Reservation
+from products.inventory import InsufficientInventory
+
+UPSERT_SQL = '''
+    WITH product AS (
+        SELECT id, price, inventory - COALESCE((
+            SELECT SUM(quantity)
+            FROM {reservations}
+            WHERE product_id = %(product)s
+                AND expires_at > %(now)s
+                AND (user_id IS DISTINCT FROM %(user)s OR order_id IS NOT NULL)
+        ), 0) AS available
+        FROM {products}
+        WHERE id = %(product)s
+    ), cart AS (
+        INSERT INTO {carts} AS cart
+            (user_id, product_id, unit_price, quantity, created_at, updated_at)
+        SELECT %(user)s, id, price, %(quantity)s, %(now)s, %(now)s
+        FROM product
+        WHERE %(quantity)s <= available
+        ON CONFLICT (user_id, product_id) DO UPDATE
+        SET quantity = cart.quantity + EXCLUDED.quantity,
+            unit_price = EXCLUDED.unit_price,
+            updated_at = EXCLUDED.updated_at
+        WHERE cart.quantity + EXCLUDED.quantity <= (SELECT available FROM product)
+        RETURNING cart.*
+    ), reservation AS (
+        INSERT INTO {reservations}
+            (product_id, user_id, order_id, quantity, expires_at, created_at)
+        SELECT product_id, user_id, NULL, quantity, %(expires_at)s, %(now)s
+        FROM cart
+        ON CONFLICT (product_id, user_id) WHERE order_id IS NULL DO UPDATE
+        SET quantity = EXCLUDED.quantity, expires_at = EXCLUDED.expires_at
+    )
+    SELECT product.available, {columns}
+    FROM product
+    LEFT JOIN cart ON TRUE
+'''
+
+
+def get_upsert_sql():
+    quote_name = connection.ops.quote_name
+    columns = [field.column for field in Cart._meta.concrete_fields]
+
+    return UPSERT_SQL.format(
+        reservations=quote_name(Reservation._meta.db_table),
+        products=quote_name(Product._meta.db_table),
+        carts=quote_name(Cart._meta.db_table),
+        columns=', '.join(f'cart.{quote_name(column)}' for column in columns),
+    ), [field.attname for field in Cart._meta.concrete_fields]
+
+
+def add_to_cart(user, product_id, quantity, ttl):
+    """
+    Add quantity units of a product to the user's cart and hold them
+    for ttl seconds
+
+    :returns: the updated Cart
+    :raises: InsufficientInventory if the cart would hold more units
+        than available, Product.DoesNotExist
+    """
+    sql, attnames = get_upsert_sql()
+    now = timezone.now()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT 1 FROM {connection.ops.quote_name(Product._meta.db_table)} '
+            f'WHERE id = %s FOR UPDATE', [product_id])
+        cursor.execute(sql, {
+            'user': user.pk,
+            'product': product_id,
+            'quantity': quantity,
+            'now': now,
+            'expires_at': now + timedelta(seconds=ttl),
+        })
+        row = cursor.fetchone()
+
+    if row is None:
+        raise Product.DoesNotExist
+    available, values = row[0], row[1:]
+    if values[0] is None:
+        raise InsufficientInventory(product_id, available)
+
+    invalidate_cart_cache(user.pk)
+    return Cart.from_db(connection.alias, attnames, values)
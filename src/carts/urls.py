@@ -1,7 +1,8 @@
 from django.urls import path
 from rest_framework.routers import SimpleRouter
 
-from carts.views import CartCountView, CartViewSet
+from carts.views import (CartCountView, CartSummaryView, CartViewSet,
+                         GuestCartView)
 
 app_name = 'carts'
 
@@ -9,7 +10,9 @@ router = SimpleRouter()
 router.register('carts', CartViewSet, basename='carts')
 
 urlpatterns = [
-    path('carts/count/', CartCountView.as_view(), name='count')
+    path('carts/count/', CartCountView.as_view(), name='count'),
+    path('carts/summary/', CartSummaryView.as_view(), name='summary'),
+    path('carts/guest/', GuestCartView.as_view(), name='guest'),
 ]
 
 urlpatterns += router.urls
@@ -1,45 +1,109 @@
-from rest_framework import permissions, status, views, viewsets
+from django.conf import settings
+from django.db import transaction
+from rest_framework import (exceptions, permissions, serializers, status,
+                            views, viewsets)
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from carts.serializers import CartDetailSerializer, CartSerializer
-from core.models import Cart
+from carts.batch import (apply_operations, parse_operations, replay_operations,
+                         report_errors)
+from carts.guest import load_guest_cart, save_guest_cart
+from carts.serializers import (CartDetailSerializer, CartSerializer,
+                               CartSummarySerializer, GuestCartItemSerializer)
+from carts.summary import get_cart_summary
+from carts.upsert import add_to_cart
+from core.mixins import QuerysetPlannerMixin
+from core.models import Cart, Product
+from products.inventory import (InsufficientInventory,
+                                get_available_inventory, release, reserve,
+                                shrink_reservation)
 
 
-class CartViewSet(viewsets.ModelViewSet):
+class CartViewSet(QuerysetPlannerMixin, viewsets.ModelViewSet):
     serializer_class = CartDetailSerializer
+    queryset = Cart.objects.all()
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['get', 'post', 'head', 'options', 'patch', 'delete']
 
+    def reserve(self, product_id, quantity):
+        """
+        Hold the cart quantity of the product for the current user
+
+        :raises: ValidationError if not enough units are available
+        """
+        try:
+            reserve(product_id, quantity, settings.CART_RESERVATION_TTL,
+                    user=self.request.user)
+        except InsufficientInventory:
+            raise serializers.ValidationError('Insufficient inventory')
+
     def create(self, request, *args, **kwargs):
         serialized = self.get_serializer(data=request.data)
         serialized.is_valid(raise_exception=True)
         product = serialized.validated_data.get('product')
         quantity = serialized.validated_data.get('quantity')
-        user = request.user
 
-        if Cart.objects.filter(user=user, product=product).exists():
-            cart = Cart.objects.filter(user=user, product=product).first()
-            cart.quantity += quantity
-            cart.save()
-            serialized = self.get_serializer(cart)
-        else:
-            self.perform_create(serialized)
+        try:
+            cart = add_to_cart(request.user, product.pk, quantity,
+                               settings.CART_RESERVATION_TTL)
+        except InsufficientInventory:
+            raise serializers.ValidationError('Insufficient inventory')
+        except Product.DoesNotExist:
+            raise exceptions.NotFound('Product not found.')
+
+        cart.product = product
+        serialized = self.get_serializer(cart)
 
         return Response(serialized.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Apply a list of add, set and remove operations to the cart at once.
+        Operations that are invalid or can't be applied are reported with
+        their errors and skipped, the others are applied.
+        """
+        operations, results = parse_operations(request.data)
+        report_errors(results, apply_operations(
+            request.user, operations, settings.CART_RESERVATION_TTL))
+
+        carts = self.get_queryset().order_by('id')
+
+        return Response({
+            'results': results,
+            'carts': CartSerializer(carts, many=True).data,
+        })
+
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
 
     def get_serializer_class(self):
-        if (self.action == 'create' or self.action == 'list'):
+        if self.action in ('create', 'list', 'batch'):
             return CartSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        cart = serializer.instance
+        quantity = serializer.validated_data.get('quantity', cart.quantity)
+
+        if quantity > cart.quantity:
+            self.reserve(cart.product_id, quantity)
+        else:
+            shrink_reservation(cart.product_id, quantity, user=self.request.user)
+
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            release([instance.product_id], user=self.request.user)
+            instance.delete()
+
 
 class CartCountView(views.APIView):
     authentication_classes = [JWTAuthentication]
@@ -48,3 +112,66 @@ class CartCountView(views.APIView):
     def get(self, request):
         count = Cart.objects.filter(user=request.user).count()
         return Response({'count': count}, status=200)
+
+
+class CartSummaryView(views.APIView):
+    """
+    Item count, units, subtotal and subtotals per seller of the cart,
+    aggregated by the database and cached until the cart changes
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        summary = CartSummarySerializer(get_cart_summary(request.user))
+        return Response(summary.data)
+
+
+class GuestCartView(views.APIView):
+    """
+    Cart of an anonymous shopper, kept in a signed cookie until it is
+    merged into the user's cart at login. Products are read to check
+    the operations, nothing is written to the database.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get_items(self, items):
+        products = (
+            Product.objects.filter(pk__in=items)
+            .values('id', 'name', 'price').order_by('id')
+        )
+        for product in products:
+            product['quantity'] = items[product['id']]
+            product['total'] = product['price'] * product['quantity']
+
+        return GuestCartItemSerializer(products, many=True).data
+
+    def get(self, request):
+        return Response({'items': self.get_items(load_guest_cart(request))})
+
+    def post(self, request):
+        """
+        Apply add, set and remove operations like the cart batch endpoint
+        """
+        operations, results = parse_operations(request.data)
+        items = load_guest_cart(request)
+        available = get_available_inventory(
+            {operation['product'] for operation in operations})
+        report_errors(results, replay_operations(
+            operations, items, available, settings.GUEST_CART_MAX_ITEMS))
+
+        response = Response({
+            'results': results,
+            'items': self.get_items(
+                {product: quantity for product, quantity in items.items() if quantity}),
+        })
+        save_guest_cart(response, items)
+
+        return response
+
+    def delete(self, request):
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        save_guest_cart(response, {})
+
+        return response
@@ -0,0 +1,75 @@
+"""
+Resolution of category names to ids for product writes.
+
+Names are looked up in a process-local cache first and the rest are
+fetched with a single ``name__in`` query. Cache keys carry the shared
+'categories' version, bumped on every Category write, so a rename or
+delete in another process makes the old entries unreachable; writes in
+this process also clear the cache outright.
+"""
+from django.db import router, transaction
+
+from core.cache import LocalTTLCache, get_version
+from core.models import Category
+from products.cache import CATEGORIES
+
+category_ids = LocalTTLCache(max_size=4096, timeout=300)
+
+
+def normalize_category_names(names):
+    """
+    Lowercase names the way Category.save stores them, trimming
+    whitespace and dropping blanks and duplicates but keeping their order
+    """
+    return list(dict.fromkeys(
+        name.strip().lower() for name in names if name.strip()))
+
+
+def resolve_category_ids(names):
+    """
+    Map normalized category names to their ids
+
+    :returns: ({name: id} for the existing names, [missing names])
+    """
+    version = get_version(CATEGORIES)
+    resolved = {}
+    unknown = []
+
+    for name in names:
+        category_id = category_ids.get((version, name))
+        if category_id is None:
+            unknown.append(name)
+        else:
+            resolved[name] = category_id
+
+    if unknown:
+        fetched = dict(Category.objects.filter(
+            name__in=unknown).values_list('name', 'id'))
+        resolved.update(fetched)
+        # A category created by the current transaction may still be
+        # rolled back, so ids are only cached once it commits
+        transaction.on_commit(lambda: cache_category_ids(version, fetched))
+
+    missing = [name for name in names if name not in resolved]
+    return resolved, missing
+
+
+def cache_category_ids(version, ids):
+    for name, category_id in ids.items():
+        category_ids.set((version, name), category_id)
+
+
+def build_categories(names, resolved):
+    """
+    Category instances for resolved names, loaded with only their id
+    and name instead of being queried again
+    """
+    db = router.db_for_read(Category)
+    return [
+        Category.from_db(db, ['id', 'name'], [resolved[name], name])
+        for name in names
+    ]
+
+
+def clear_category_ids():
+    category_ids.clear()
@@ -6,11 +6,20 @@ class CategorySerializer(serializers.ModelSerializer):
     """
     Serializer for categories
     """
+    product_count = serializers.SerializerMethodField()
+
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'created_at', 'updated_at']
+        fields = [
+            'id', 'name', 'slug', 'product_count', 'created_at', 'updated_at']
         extra_kwargs = {
             'id': {'read_only': True},
             'created_at': {'read_only': True},
             'updated_at': {'read_only': True},
         }
+
+    def get_product_count(self, obj):
+        # Annotated by the category snapshot
+        if hasattr(obj, 'product_count'):
+            return obj.product_count
+        return obj.product_set.count()
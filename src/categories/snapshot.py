@@ -0,0 +1,97 @@
+"""
+In-process snapshot of every category, as the API renders them.
+
+The snapshot is built with one query, including the product count of
+each category, and shared read-only by every thread of the process.
+It is tagged with the shared 'categories' and 'category_counts'
+versions: a write bumps one of them, and the next read here notices
+the mismatch and rebuilds the snapshot. The versions are only shared
+between processes by a shared cache backend, so a snapshot is also
+rebuilt once older than CATEGORY_SNAPSHOT_MAX_AGE seconds, bounding how
+long a process serves categories changed by another one.
+"""
+import hashlib
+import json
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+
+from categories.serializers import CategorySerializer
+from core.cache import get_versions
+from core.models import Category
+from products.cache import CATEGORIES, CATEGORY_COUNTS
+
+VERSIONS = [CATEGORIES, CATEGORY_COUNTS]
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+class CategorySnapshot:
+    """
+    Serialized categories ordered by name, looked up by id through
+    ``by_id``. Entries must not be modified, copy them before changing.
+    """
+
+    def __init__(self, version, categories, modified):
+        self.version = version
+        self.categories = tuple(categories)
+        self.by_id = MappingProxyType(
+            {category['id']: category for category in self.categories})
+        self.modified = MappingProxyType(modified)
+        self.last_modified = max(modified.values(), default=None)
+        # From the content, as a rebuild on age may keep the same version
+        self.etag = hashlib.md5(json.dumps(
+            self.categories, cls=DjangoJSONEncoder).encode()).hexdigest()
+        self.built_at = time.monotonic()
+
+    def is_current(self, version):
+        return (
+            self.version == version
+            and time.monotonic() - self.built_at < settings.CATEGORY_SNAPSHOT_MAX_AGE
+        )
+
+
+def build_snapshot(version):
+    categories = list(
+        Category.objects.annotate(product_count=Count('product')).order_by('name'))
+    data = CategorySerializer(categories, many=True).data
+
+    return CategorySnapshot(
+        version,
+        [dict(category) for category in data],
+        {category.pk: category.updated_at for category in categories},
+    )
+
+
+def get_snapshot():
+    """
+    Return the current snapshot, rebuilding it if a category or
+    product count changed since it was built, or if it is too old
+    """
+    global _snapshot
+    version = tuple(get_versions(VERSIONS))
+    snapshot = _snapshot
+
+    if snapshot is not None and snapshot.is_current(version):
+        return snapshot
+
+    with _lock:
+        if _snapshot is not None and _snapshot.is_current(version):
+            return _snapshot
+
+        snapshot = build_snapshot(version)
+
+    def publish():
+        global _snapshot
+        _snapshot = snapshot
+
+    # A snapshot read inside a transaction may include its uncommitted
+    # writes, so it is only shared once the transaction commits
+    transaction.on_commit(publish)
+    return snapshot
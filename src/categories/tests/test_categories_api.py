@@ -1,8 +1,9 @@
 from categories.serializers import CategorySerializer
 from core.models import Category
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
-from helpers.test_helpers import create_category, create_user
+from helpers.test_helpers import create_category, create_product, create_user
 from rest_framework import status
 from rest_framework.test import APIClient
 
@@ -35,6 +36,33 @@ class PublicCategoriesApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['results'], serialized_categories.data)
 
+    def test_list_categories_not_modified(self):
+        """
+        Fetching list of categories with its current ETag
+        should return 304 - Not Modified, until a category changes
+        """
+        category = create_category(name='category')
+        etag = self.client.get(CATEGORIES_URL)['ETag']
+
+        res = self.client.get(CATEGORIES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        category.name = 'renamed'
+        category.save()
+        res = self.client.get(CATEGORIES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_fetch_single_category_not_modified(self):
+        """
+        Fetching a single category with its current ETag
+        should return 304 - Not Modified
+        """
+        category = create_category()
+        etag = self.client.get(detail_url(category.id))['ETag']
+        res = self.client.get(detail_url(category.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
     def test_fetch_single_category(self):
         """
         Fetching a single category
@@ -199,3 +227,92 @@ class PrivateCategoriesApiTests(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CategorySnapshotTests(TestCase):
+    """
+    Tests for serving categories from the in-process snapshot
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        cache.clear()
+
+    def test_list_served_without_queries(self):
+        """
+        Fetching categories again once the snapshot is built
+        should not query the database
+        """
+        category = create_category(name='shoes')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(CATEGORIES_URL)
+
+        with self.assertNumQueries(0):
+            list_res = self.client.get(CATEGORIES_URL)
+            detail_res = self.client.get(detail_url(category.id))
+
+        self.assertEqual(list_res.data['results'][0]['name'], 'shoes')
+        self.assertEqual(detail_res.data['id'], category.id)
+
+    def test_product_counts(self):
+        """
+        Fetching categories
+        should return their product counts, updated as products change
+        """
+        shoes = create_category(name='shoes')
+        create_category(name='bags')
+        product = create_product(self.user)
+        product.categories.add(shoes)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.get(CATEGORIES_URL)
+
+        counts = {item['name']: item['product_count'] for item in res.data['results']}
+        self.assertEqual(counts, {'bags': 0, 'shoes': 1})
+
+        product.delete()
+        res = self.client.get(detail_url(shoes.id))
+        self.assertEqual(res.data['product_count'], 0)
+
+    def test_write_rebuilds_snapshot(self):
+        """
+        Renaming a category
+        should be visible in the next response
+        """
+        category = create_category(name='shoes')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(detail_url(category.id))
+
+        category.name = 'sneakers'
+        category.save()
+        res = self.client.get(detail_url(category.id))
+
+        self.assertEqual(res.data['name'], 'sneakers')
+
+    def test_snapshot_expires(self):
+        """
+        Renaming a category without bumping the versions, as a write
+        from a process with its own cache does
+        should be visible once the snapshot is older than its max age
+        """
+        category = create_category(name='shoes')
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.get(CATEGORIES_URL)
+
+        Category.objects.filter(pk=category.pk).update(name='sneakers')
+        res = self.client.get(CATEGORIES_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with override_settings(CATEGORY_SNAPSHOT_MAX_AGE=0):
+            res = self.client.get(CATEGORIES_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['name'], 'sneakers')
+
+    def test_missing_category(self):
+        """
+        Fetching a nonexistent category
+        should return 404 - Not Found
+        """
+        res = self.client.get(detail_url(999))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
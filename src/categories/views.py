@@ -1,11 +1,20 @@
-from rest_framework import permissions, viewsets
+from django.utils.http import quote_etag
+from rest_framework import exceptions, permissions, viewsets
+from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from categories.serializers import CategorySerializer
+from categories.snapshot import get_snapshot
+from core.mixins import ConditionalGetMixin
 from core.models import Category
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    """
+    Categories, read by the storefront and written by admins.
+    list/retrieve are served from the in-process category snapshot,
+    validators included, without querying the database.
+    """
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
     authentication_classes = [JWTAuthentication]
@@ -15,3 +24,63 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if (self.action == 'list' or self.action == 'retrieve'):
             return [permissions.AllowAny()]
         return super().get_permissions()
+
+    def get_snapshot(self):
+        # One snapshot for both the validators and the response
+        if not hasattr(self, '_snapshot'):
+            self._snapshot = get_snapshot()
+        return self._snapshot
+
+    def get_snapshot_category(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        try:
+            pk = int(self.kwargs[lookup_url_kwarg])
+        except ValueError:
+            return None
+
+        return self.get_snapshot().by_id.get(pk)
+
+    def get_list_validators(self):
+        snapshot = self.get_snapshot()
+        return 'W/' + quote_etag(snapshot.etag), snapshot.last_modified
+
+    def get_detail_validators(self):
+        category = self.get_snapshot_category()
+
+        if category is None:
+            return None, None
+
+        last_modified = self.get_snapshot().modified[category['id']]
+        etag = (
+            f'{category["id"]}-{last_modified.timestamp():.6f}-'
+            f'{category["product_count"]}'
+        )
+        return quote_etag(etag), last_modified
+
+    def list_snapshot(self, request, *args, **kwargs):
+        categories = list(self.get_snapshot().categories)
+        page = self.paginate_queryset(categories)
+
+        if page is not None:
+            return self.get_paginated_response(
+                [dict(category) for category in page])
+
+        return Response([dict(category) for category in categories])
+
+    def retrieve_snapshot(self, request, *args, **kwargs):
+        category = self.get_snapshot_category()
+
+        if category is None:
+            raise exceptions.NotFound()
+
+        return Response(dict(category))
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.list_snapshot, self.get_list_validators, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.retrieve_snapshot, self.get_detail_validators,
+            request, *args, **kwargs)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from core.models import (Product, Category,
-                         Cart, OrderItem, Order)
+                         Cart, OrderItem, Order, Rating)
 
 
 admin.site.register(get_user_model())
@@ -10,3 +10,4 @@ admin.site.register(Category)
 admin.site.register(Cart)
 admin.site.register(OrderItem)
 admin.site.register(Order)
+admin.site.register(Rating)
@@ -0,0 +1,135 @@
+"""
+Helpers shared by the benchmark management commands
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from core.models import Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block in a transaction that is always rolled back,
+    so seeded benchmark data never reaches the database
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def get_benchmark_user():
+    user, _ = get_user_model().objects.get_or_create(
+        email='benchmark@email.com',
+        defaults={
+            'username': 'benchmark',
+            'first_name': 'benchmark',
+            'last_name': 'benchmark',
+        },
+    )
+    return user
+
+
+def make_vocabulary(size, seed=0):
+    """
+    Return ``size`` distinct made-up words to build product text from
+    """
+    rng = random.Random(seed)
+    words = set()
+
+    while len(words) < size:
+        words.add(''.join(
+            rng.choice('bcdfghklmnprstvz') + rng.choice('aeiou')
+            for _ in range(rng.randint(3, 4))
+        ))
+
+    return sorted(words)
+
+
+def seed_products(user, count, batch_size=5000, seed=0, vocabulary=None):
+    """
+    Bulk insert ``count`` products with varied prices and sales.
+    Names and descriptions are drawn from ``vocabulary`` when given.
+    """
+    rng = random.Random(seed)
+    products = []
+
+    for index in range(count):
+        if vocabulary:
+            name = ' '.join(rng.sample(vocabulary, 3))
+            description = ' '.join(rng.sample(vocabulary, 12))
+        else:
+            name = f'Benchmark product {index}'
+            description = f'Seeded product number {index}'
+
+        products.append(Product(
+            user=user,
+            name=name,
+            description=description,
+            price=rng.randint(50, 100000),
+            inventory=rng.randint(1, 1000),
+            total_sold=rng.randint(0, 5000),
+        ))
+
+        if len(products) == batch_size:
+            Product.objects.bulk_create(products)
+            products = []
+
+    Product.objects.bulk_create(products)
+
+
+def time_call(func, repeat):
+    """
+    Call ``func`` ``repeat`` times and return the timings in milliseconds
+    """
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'p95': percentile(samples, 95),
+    }
+
+
+@contextmanager
+def view_client(view):
+    """
+    Yield a ``get(path, params)`` callable that renders ``view`` in-process
+    """
+    factory = RequestFactory()
+
+    def get(path, params=None, **extra):
+        response = view(factory.get(path, params or {}, **extra))
+        response.render()
+        return response
+
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        yield get
@@ -0,0 +1,113 @@
+"""
+Caching helpers shared across apps
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+
+class LocalTTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after ``timeout`` seconds.
+    Entries live in the current process only.
+    """
+
+    def __init__(self, max_size=1024, timeout=60):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    """
+    Return the current value of a named version counter in the shared cache.
+    Counters start from a timestamp, so one that was evicted never restarts
+    at a value older cache entries were stored under.
+    """
+    key = _version_key(name)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+
+    return version
+
+
+def get_versions(names):
+    keys = {_version_key(name): name for name in names}
+    versions = cache.get_many(keys)
+
+    return [
+        versions.get(key) or get_version(name)
+        for key, name in keys.items()
+    ]
+
+
+def bump_version(*names):
+    """
+    Increment the named version counters, invalidating every cache entry
+    keyed on their previous values
+    """
+    for name in names:
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            cache.add(_version_key(name), time.time_ns(), None)
+
+
+def record_cache_access(name, hit):
+    key = f'stats:{name}:{"hits" if hit else "misses"}'
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_cache_stats(name):
+    stats = cache.get_many([f'stats:{name}:hits', f'stats:{name}:misses'])
+    hits = stats.get(f'stats:{name}:hits', 0)
+    misses = stats.get(f'stats:{name}:misses', 0)
+    total = hits + misses
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0,
+    }
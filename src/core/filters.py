@@ -1,19 +1,88 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, FloatField, OuterRef, Q
+from django.db.models.functions import Cast
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
 
-from core.models import Product
+from core.models import Category, Product
 
 
 class ProductFilter(filters.FilterSet):
     """
     Filter for Products
     """
-    categories = filters.CharFilter(method='filter_by_categories')
+    ANY = 'any'
+    ALL = 'all'
+
+    categories = filters.CharFilter(
+        method='filter_by_categories',
+        help_text='Comma separated category names or slugs')
+    categories_match = filters.ChoiceFilter(
+        choices=[(ANY, 'Any of the categories'), (ALL, 'All of the categories')],
+        method='filter_categories_match',
+        help_text='Whether products need any (default) or all of the categories')
     price = filters.RangeFilter(field_name='price')
+    rating = filters.RangeFilter(field_name='rating_avg')
 
     class Meta:
         model = Product
-        fields = ['categories', 'price']
+        fields = ['categories', 'categories_match', 'price', 'rating']
 
     def filter_by_categories(self, queryset, name, value):
-        category_names = value.split(',')
-        return queryset.filter(categories__name__in=category_names).distinct()
+        """
+        Filter with EXISTS semijoins on the product/category through table,
+        which unlike a join never repeats a product, so no DISTINCT is needed
+        """
+        values = {
+            category.strip().lower()
+            for category in value.split(',') if category.strip()
+        }
+
+        if not values:
+            return queryset
+
+        if self.form.cleaned_data.get('categories_match') == self.ALL:
+            for category in values:
+                queryset = queryset.filter(self.has_category(category))
+            return queryset
+
+        return queryset.filter(self.has_category(*values))
+
+    def filter_categories_match(self, queryset, name, value):
+        # Read by filter_by_categories
+        return queryset
+
+    @staticmethod
+    def has_category(*values):
+        """
+        EXISTS on the product having any category named or slugged values
+        """
+        categories = Category.objects.filter(
+            Q(name__in=values) | Q(slug__in=values)).values('pk')
+
+        return Exists(Product.categories.through.objects.filter(
+            product_id=OuterRef('pk'), category_id__in=categories))
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Full-text search on the GIN indexed Product.search_vector,
+    where name matches weigh more than description matches.
+    Results are ordered by relevance unless an ordering is requested.
+    """
+    search_config = 'english'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '').strip()
+
+        if not terms:
+            return queryset
+
+        query = SearchQuery(
+            terms, config=self.search_config, search_type='websearch')
+
+        # ts_rank() returns a real, cast it so cursor positions round-trip
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=rank).order_by('-search_rank')
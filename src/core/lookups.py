@@ -0,0 +1,25 @@
+"""
+Trigram word similarity lookups and expressions from pg_trgm,
+which Django 3.2 does not ship yet
+"""
+from django.db.models import FloatField, Func, Value
+from django.db.models.lookups import PostgresOperatorLookup
+
+
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """
+    ``field %> string``, true when the string is similar to some
+    continuous extent of words in the field. Backed by gin_trgm_ops.
+    """
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, transaction
+
+from carts.upsert import add_to_cart
+from core.benchmarks import get_benchmark_user
+from core.models import Cart, Product
+from products.inventory import reserve
+
+
+def legacy_add_to_cart(user, product, quantity):
+    """
+    The add-to-cart of CartViewSet.create before the upsert:
+    check, read, then write the cart
+    """
+    with transaction.atomic():
+        cart = None
+        if Cart.objects.filter(user=user, product=product).exists():
+            cart = Cart.objects.filter(user=user, product=product).first()
+            cart.quantity += quantity
+        reserve(product.pk, cart.quantity if cart else quantity,
+                settings.CART_RESERVATION_TTL, user=user)
+        if cart is None:
+            cart = Cart(user=user, product_id=product.pk, quantity=quantity)
+        cart.save()
+
+
+class Command(BaseCommand):
+    """
+    Command to hammer a single cart from many threads through the legacy
+    read-modify-write add-to-cart and through the upsert, reporting the
+    throughput and the increments lost by each.
+    Rows are committed, since the threads use their own connections,
+    and deleted afterwards.
+    """
+    help = 'Benchmark concurrent add-to-cart, legacy vs upsert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--adds', type=int, default=100,
+                            help='Adds of one unit per thread')
+
+    def run(self, add, threads, adds):
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(adds):
+                    try:
+                        add()
+                    except IntegrityError:
+                        errors.append(1)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        return time.perf_counter() - start, len(errors)
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'])
+        adds = max(1, options['adds'])
+        total = threads * adds
+        user = get_benchmark_user()
+        product = Product.objects.create(
+            user=user, name='Benchmark cart product', price=100,
+            inventory=total)
+
+        try:
+            variants = [
+                ('legacy', lambda: legacy_add_to_cart(user, product, 1)),
+                ('upsert', lambda: add_to_cart(
+                    user, product.pk, 1, settings.CART_RESERVATION_TTL)),
+            ]
+            results = {}
+
+            for name, add in variants:
+                Cart.objects.filter(user=user, product=product).delete()
+                product.reservations.all().delete()
+
+                elapsed, errors = self.run(add, threads, adds)
+                quantity = Cart.objects.filter(
+                    user=user, product=product).values_list(
+                    'quantity', flat=True).first() or 0
+                results[name] = total / elapsed
+                self.stdout.write(
+                    f'{name:>7}  {results[name]:8.0f} adds/s  '
+                    f'{errors} integrity errors  '
+                    f'{total - errors - quantity} lost increments'
+                )
+
+            self.stdout.write(
+                f'Speedup {results["upsert"] / results["legacy"]:.1f}x')
+        finally:
+            product.delete()
@@ -0,0 +1,68 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from core.benchmarks import (get_benchmark_user, rolled_back, seed_products,
+                             summarize, time_call, view_client)
+from products.views import PublicProductView
+
+
+class Command(BaseCommand):
+    """
+    Command to compare deep page latency of offset and cursor pagination
+    on the public product list. Seeded rows are rolled back afterwards.
+    """
+    help = 'Benchmark offset vs cursor pagination on the public product list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--page', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        page = options['page']
+        limit = options['limit']
+        repeat = options['repeat']
+
+        if rows < page * limit:
+            self.stderr.write(f'--rows must be at least {page * limit}.')
+            return
+
+        path = reverse('products:public-list')
+        view = PublicProductView.as_view()
+
+        with rolled_back(), view_client(view) as get:
+            self.stdout.write(f'Seeding {rows} products...')
+            seed_products(get_benchmark_user(), rows)
+
+            self.stdout.write(f'Page {page}, limit {limit}, {repeat} runs (ms)')
+            for ordering in ['price', '-total_sold', 'created_at']:
+                params = {'ordering': ordering, 'limit': limit}
+                offset_params = dict(params, offset=(page - 1) * limit)
+                offset = summarize(time_call(
+                    lambda: get(path, offset_params), repeat))
+
+                cursor_params = self.walk_to_page(
+                    get, path, dict(params, pagination='cursor'), page)
+                cursor = summarize(time_call(
+                    lambda: get(path, cursor_params), repeat))
+
+                self.stdout.write(
+                    f'{ordering:>12}  '
+                    f'offset median {offset["median"]:8.2f} p95 {offset["p95"]:8.2f}  '
+                    f'cursor median {cursor["median"]:8.2f} p95 {cursor["p95"]:8.2f}'
+                )
+
+    def walk_to_page(self, get, path, params, page):
+        """
+        Follow the next links to get the query params of the requested page
+        """
+        for _ in range(page - 1):
+            next_link = get(path, params).data['next']
+            query = parse_qs(urlparse(next_link).query)
+            params = {key: values[0] for key, values in query.items()}
+
+        return params
@@ -0,0 +1,78 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.benchmarks import (get_benchmark_user, make_vocabulary,
+                             rolled_back, seed_products, summarize,
+                             time_call)
+from core.filters import ProductSearchFilter
+from core.models import Product
+
+
+class Command(BaseCommand):
+    """
+    Command to compare ILIKE and full-text product search latency as the
+    product table grows. Seeded rows are rolled back afterwards.
+    """
+    help = 'Benchmark ILIKE vs full-text product search at growing table sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10000,50000,100000',
+            help='Comma separated product table sizes to measure at')
+        parser.add_argument('--vocabulary', type=int, default=50000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        vocabulary = make_vocabulary(options['vocabulary'])
+        limit = options['limit']
+        rng = random.Random(1)
+        terms = [rng.choice(vocabulary) for _ in range(options['queries'])]
+        search_filter = ProductSearchFilter()
+
+        def ilike(term):
+            list(Product.objects.filter(name__icontains=term)[:limit])
+
+        def full_text(term):
+            request = _QueryParams({search_filter.search_param: term})
+            queryset = search_filter.filter_queryset(
+                request, Product.objects.all(), None)
+            list(queryset[:limit])
+
+        with rolled_back():
+            user = get_benchmark_user()
+            seeded = 0
+
+            for size in sizes:
+                self.stdout.write(f'Seeding up to {size} products...')
+                seed_products(user, size - seeded, seed=size,
+                              vocabulary=vocabulary)
+                seeded = size
+
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE core_product')
+
+                results = {}
+                for name, search in [('ilike', ilike), ('fts', full_text)]:
+                    timings = []
+                    for term in terms:
+                        timings += time_call(lambda: search(term), 1)
+                    results[name] = summarize(timings)
+
+                self.stdout.write(
+                    f'{size:>9} rows  '
+                    f'ilike p95 {results["ilike"]["p95"]:8.2f} ms  '
+                    f'fts p95 {results["fts"]["p95"]:8.2f} ms'
+                )
+
+
+class _QueryParams:
+    """
+    Minimal request stand-in for calling filter backends directly
+    """
+
+    def __init__(self, query_params):
+        self.query_params = query_params
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks import (get_benchmark_user, make_vocabulary,
+                             rolled_back, seed_products, summarize,
+                             time_call)
+from core.models import Category, Product
+from core.serializers import get_read_plan
+from products.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    """
+    Command to compare the throughput of rendering a product list with
+    ProductSerializer(many=True) against its precompiled read plan.
+    Seeded rows are rolled back afterwards.
+    """
+    help = 'Benchmark serializer vs read plan rendering of product lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        renderer = JSONRenderer()
+
+        with rolled_back():
+            user = get_benchmark_user()
+            seed_products(user, rows, vocabulary=make_vocabulary(1000))
+            categories = [
+                Category.objects.create(name=f'benchmark category {index}')
+                for index in range(5)
+            ]
+            products = list(
+                Product.objects.filter(user=user).values_list('id', flat=True))
+            Product.categories.through.objects.bulk_create([
+                Product.categories.through(
+                    product_id=product_id,
+                    category=categories[index % len(categories)])
+                for index, product_id in enumerate(products)
+            ])
+
+            queryset = (
+                Product.objects.filter(user=user)
+                .prefetch_related('categories').order_by('id')
+            )
+            serializer = ProductSerializer()
+            plan = get_read_plan(serializer)
+            if plan is None:
+                raise CommandError('ProductSerializer has no read plan.')
+
+            def regular():
+                return renderer.render(
+                    ProductSerializer(queryset.all(), many=True).data)
+
+            def fast():
+                return renderer.render(
+                    get_read_plan(serializer).render(
+                        queryset.prefetch_related(None).values(*plan.columns)))
+
+            if regular() != fast():
+                raise CommandError('Read plan output differs from the serializer.')
+
+            results = {}
+            for name, render in [('serializer', regular), ('read plan', fast)]:
+                timings = summarize(time_call(render, repeat))
+                results[name] = rows / (timings['median'] / 1000)
+                self.stdout.write(
+                    f'{name:>10}  median {timings["median"]:9.2f} ms  '
+                    f'{results[name]:10.0f} rows/s'
+                )
+
+            self.stdout.write(
+                f'Speedup {results["read plan"] / results["serializer"]:.1f}x')
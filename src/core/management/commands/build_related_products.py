@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from products.related import build_related_products
+
+
+class Command(BaseCommand):
+    """
+    Command to count new orders into the co-purchase pairs and re-rank
+    the "frequently bought together" products they touch
+    """
+    help = 'Build the frequently bought together recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Orders counted per transaction')
+        parser.add_argument(
+            '--size', type=int, default=10,
+            help='Number of related products kept per product')
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recount every order from scratch')
+
+    def handle(self, *args, **options):
+        result = build_related_products(
+            batch_size=max(1, options['batch_size']),
+            size=max(1, options['size']),
+            full=options['full'],
+        )
+
+        self.stdout.write(
+            f'Counted {result["orders"]} orders, related products of '
+            f'{result["products"]} products ranked.')
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.inventory import expire_reservations
+
+
+class Command(BaseCommand):
+    """
+    Command to delete expired inventory reservations in batches,
+    once or every --interval seconds
+    """
+    help = 'Delete expired cart and checkout reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Seconds between sweeps, 0 sweeps once and exits')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = expire_reservations(max(1, options['batch_size']))
+            self.stdout.write(f'Deleted {deleted} expired reservations.')
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
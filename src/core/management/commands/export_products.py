@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import export_products
+
+
+class Command(BaseCommand):
+    """
+    Command to export a seller's products as CSV or NDJSON
+    """
+    help = 'Export the products of a user as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the selling user')
+        parser.add_argument(
+            '--file-format', choices=['csv', 'ndjson'], default='ndjson')
+        parser.add_argument(
+            '--output', help='File to write to, defaults to stdout')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["email"]} does not exist.')
+
+        lines = export_products(user, options['file_format'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', newline='') as output:
+            output.writelines(lines)
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.storage import collect_blobs
+from products.images import delete_variants
+
+
+class Command(BaseCommand):
+    """
+    Command to delete stored images, and their variants, that no product
+    has referenced for longer than the grace period
+    """
+    help = 'Garbage collect unreferenced product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-period', type=int, default=3600,
+            help='Seconds an image must have been unreferenced for')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        deleted = collect_blobs(
+            timedelta(seconds=max(0, options['grace_period'])),
+            batch_size=max(1, options['batch_size']),
+            on_delete=delete_variants,
+        )
+
+        self.stdout.write(f'Deleted {deleted} unreferenced images.')
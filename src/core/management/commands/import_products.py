@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import (InvalidImportFile, decode_lines, get_file_format,
+                           import_products)
+
+
+class Command(BaseCommand):
+    """
+    Command to import a seller's products from a CSV or NDJSON file
+    """
+    help = 'Import products for a user from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the selling user')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--file-format', choices=['csv', 'ndjson'],
+            help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+            file_format = get_file_format(
+                options['file_format'], options['path'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["email"]} does not exist.')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_products(
+                    user, decode_lines(stream), file_format,
+                    chunk_size=options['chunk_size'], max_errors=None)
+        except InvalidImportFile as e:
+            raise CommandError(f'Line {e.line}: {e}')
+
+        for error in result['errors']:
+            self.stderr.write(f'Line {error["line"]}: {error["errors"]}')
+        self.stdout.write(
+            f'Imported {result["created"]} products, '
+            f'skipped {result["skipped"]} invalid rows.')
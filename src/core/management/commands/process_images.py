@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from products.images import (claim_jobs, fail_job, finish_job,
+                             get_render_args, is_unchanged, render_variants)
+
+
+class Command(BaseCommand):
+    """
+    Worker that renders the queued product image variants.
+    The CPU-bound resizing is spread across a process pool.
+    """
+    help = 'Render queued product image variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of rendering processes, 1 renders inline')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='Seconds after which a processing job is retried')
+        parser.add_argument(
+            '--poll-interval', type=float, default=2,
+            help='Seconds to wait when the queue is empty')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        executor = None
+
+        if workers > 1:
+            # Spawned rather than forked, so workers never inherit
+            # the parent's database connections
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+
+        try:
+            while True:
+                jobs = claim_jobs(
+                    options['batch_size'],
+                    options['max_attempts'],
+                    options['stale_after'],
+                )
+
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.process(jobs, executor, options['max_attempts'])
+        finally:
+            if executor:
+                executor.shutdown()
+
+    def process(self, jobs, executor, max_attempts):
+        pending = {}
+
+        for job in jobs:
+            if is_unchanged(job):
+                finish_job(job)
+                continue
+
+            args = get_render_args(job)
+            if executor:
+                pending[job] = executor.submit(render_variants, *args)
+            else:
+                pending[job] = args
+
+        for job, work in pending.items():
+            try:
+                if executor:
+                    variants = work.result()
+                else:
+                    variants = render_variants(*work)
+            except Exception as e:
+                fail_job(job, e, max_attempts)
+                self.stderr.write(f'Image job {job.pk} failed: {e}')
+                continue
+
+            finish_job(job, variants)
+            self.stdout.write(f'Image job {job.pk} done.')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from core.models import Product
+from ratings.aggregates import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    """
+    Command to recompute the product rating aggregates from the ratings
+    table, one id range per transaction
+    """
+    help = 'Rebuild Product.rating_sum/rating_count/rating_avg from ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        last_id = Product.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        updated = 0
+
+        for start_id in range(1, last_id + 1, chunk_size):
+            with transaction.atomic():
+                updated += len(rebuild_rating_aggregates(
+                    start_id, start_id + chunk_size))
+
+        self.stdout.write(f'Rebuilt rating aggregates, {updated} products updated.')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from products.leaderboards import refresh_leaderboards
+
+
+class Command(BaseCommand):
+    """
+    Command to roll recent order items up into the hourly sales buckets
+    and recompute the best-seller leaderboards from them
+    """
+    help = 'Refresh the 24h/7d/30d best-seller leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookback-hours', type=int, default=2,
+            help='Hours of order items to roll up again, the command must '
+                 'run at least this often')
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild the buckets of the longest period from scratch')
+        parser.add_argument(
+            '--size', type=int, default=100,
+            help='Number of products kept per leaderboard')
+
+    def handle(self, *args, **options):
+        result = refresh_leaderboards(
+            lookback_hours=max(1, options['lookback_hours']),
+            full=options['full'],
+            size=max(1, options['size']),
+        )
+
+        self.stdout.write(
+            f'Refreshed leaderboards, {result["buckets"]} sales buckets '
+            f'and {result["entries"]} entries written.')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from carts.pricing import reprice_carts
+
+
+class Command(BaseCommand):
+    """
+    Command to copy the current product prices into every cart item
+    holding an outdated one
+    """
+    help = 'Resync the unit price of every cart item with its product'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Cart items updated per transaction')
+
+    def handle(self, *args, **options):
+        repriced = reprice_carts(chunk_size=max(1, options['chunk_size']))
+
+        self.stdout.write(f'Repriced {repriced} cart items.')
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:55
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_product_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        # Case-insensitive prefix matches (name__istartswith compiles to
+        # UPPER(name) LIKE UPPER('prefix%'), which the trigram index
+        # can't serve)
+        migrations.RunSQL(
+            sql='CREATE INDEX product_name_upper_prefix_idx '
+                'ON core_product (UPPER(name) text_pattern_ops);',
+            reverse_sql='DROP INDEX product_name_upper_prefix_idx;',
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index the product/category through table from the category side,
+    so category filters can probe it with an index-only scan
+    """
+
+    dependencies = [
+        ('core', '0030_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX core_product_categories_category_product_idx '
+                'ON core_product_categories (category_id, product_id);',
+            reverse_sql='DROP INDEX core_product_categories_category_product_idx;',
+        ),
+    ]
@@ -0,0 +1,367 @@
+"""
+Mixins shared by the API views
+"""
+import hashlib
+from abc import ABC, abstractmethod
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from core.cache import get_versions, record_cache_access
+from core.serializers import get_read_plan
+
+
+def get_serializer_paths(serializer, prefix='', include_pk_only=False):
+    """
+    Yield the model paths (``relation__field``) read by the serializer.
+
+    SerializerMethodFields are opaque, so serializers list the paths
+    their methods read in ``Meta.method_field_paths``. Relations that
+    are only read by primary key need no join and are left out unless
+    include_pk_only is set.
+    """
+    meta = getattr(serializer, 'Meta', None)
+    method_field_paths = getattr(meta, 'method_field_paths', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        if isinstance(field, serializers.SerializerMethodField):
+            for path in method_field_paths.get(name, ()):
+                yield prefix + path
+            continue
+
+        if field.source == '*':
+            if isinstance(field, serializers.BaseSerializer):
+                yield from get_serializer_paths(field, prefix, include_pk_only)
+            continue
+
+        path = prefix + '__'.join(field.source_attrs)
+
+        if isinstance(field, serializers.ListSerializer):
+            yield path
+            yield from get_serializer_paths(
+                field.child, path + '__', include_pk_only)
+        elif isinstance(field, serializers.BaseSerializer):
+            yield path
+            yield from get_serializer_paths(field, path + '__', include_pk_only)
+        elif isinstance(field, serializers.RelatedField):
+            # Primary keys are read from the local <field>_id column
+            if include_pk_only or not field.use_pk_only_optimization():
+                yield path
+        else:
+            yield path
+
+
+def get_relation_field(model, name):
+    """
+    Return the relation named ``name`` on model, looking reverse
+    relations up by their accessor name as well
+    """
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for field in model._meta.related_objects:
+            if field.get_accessor_name() == name:
+                return field
+    return None
+
+
+def plan_related_lookups(model, paths):
+    """
+    Split the relations traversed by ``paths`` into select_related
+    and prefetch_related lookups. Any path that crosses a to-many
+    relation has to be prefetched.
+    """
+    select_related = set()
+    prefetch_related = set()
+
+    for path in paths:
+        current = model
+        relations = []
+        many = False
+
+        for name in path.split('__'):
+            field = get_relation_field(current, name)
+
+            if field is None or not field.is_relation:
+                break
+
+            relations.append(name)
+            many = many or field.many_to_many or field.one_to_many
+            current = field.related_model
+
+        if not relations:
+            continue
+
+        lookup = '__'.join(relations)
+        if many:
+            prefetch_related.add(lookup)
+        else:
+            select_related.add(lookup)
+
+    return sorted(select_related), sorted(prefetch_related)
+
+
+def plan_only_fields(model, paths):
+    """
+    Return the ``.only()`` lookups loading just the columns read by
+    ``paths``, on the model and its select_related relations.
+    Columns read through to-many relations belong to their prefetch.
+    """
+    paths = set(paths)
+    only = set()
+
+    for path in paths:
+        current = model
+        names = []
+
+        for name in path.split('__'):
+            field = get_relation_field(current, name)
+
+            if field is None or field.many_to_many or field.one_to_many:
+                names = []
+                break
+
+            names.append(name)
+            if not field.is_relation:
+                break
+            current = field.related_model
+
+        lookup = '__'.join(names)
+        # Naming a select_related relation alone would load all its columns
+        if lookup and not any(other.startswith(lookup + '__') for other in paths):
+            only.add(lookup)
+
+    return sorted(only)
+
+
+class QuerysetPlannerMixin:
+    """
+    Applies select_related/prefetch_related to get_queryset() based on
+    the relations read by the serializer, so list endpoints run a constant
+    number of queries regardless of the page size.
+    When the request asked for a sparse fieldset, the columns nobody
+    reads are deferred with .only() as well.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer = self.get_serializer()
+        paths = list(get_serializer_paths(serializer))
+        select_related, prefetch_related = plan_related_lookups(
+            queryset.model, paths)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if getattr(serializer, 'is_sparse', False):
+            only = plan_only_fields(
+                queryset.model,
+                get_serializer_paths(serializer, include_pk_only=True))
+            queryset = queryset.only(*only or ['pk'])
+
+        return queryset
+
+
+class CachedResponseMixin(ABC):
+    """
+    Caches the rendered JSON of list/retrieve responses with their headers.
+
+    Keys include the scheme, host and full query string, since bodies
+    hold absolute URLs, and the values of the version counters named by
+    get_cache_versions(), so bumping a counter on write makes every page
+    built from the old data unreachable.
+    """
+    cache_name = None
+    cache_timeout = settings.CATALOGUE_CACHE_TIMEOUT
+    # Recomputed or set per response, never replayed from the cache
+    uncached_headers = {'content-length', 'x-cache'}
+
+    @abstractmethod
+    def get_cache_versions(self):
+        """
+        :returns: names of the version counters the response depends on
+        """
+
+    def get_response_cache_key(self, request):
+        versions = get_versions(self.get_cache_versions())
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        ))
+        raw_key = (
+            f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+            f'|{versions}'
+        )
+
+        return f'response:{self.cache_name}:{hashlib.md5(raw_key.encode()).hexdigest()}'
+
+    def is_cacheable(self, request):
+        return (
+            request.method == 'GET'
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        record_cache_access(self.cache_name, hit=cached is not None)
+
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        self.response_cache_key = key
+        return handler(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+
+        if key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            headers = [
+                (header, value) for header, value in response.items()
+                if header.lower() not in self.uncached_headers
+            ]
+            cache.set(key, (response.content, headers), self.cache_timeout)
+            response['X-Cache'] = 'MISS'
+
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Answers list/retrieve requests carrying If-None-Match/If-Modified-Since
+    with a 304, before the queryset is evaluated or serialized.
+
+    Detail views get a strong ETag from the object's id and updated_at.
+    List views get a weak one from MAX(updated_at) and the row count of
+    the filtered queryset, which a single aggregate query answers. They
+    are read from the database rather than from the version counters,
+    which a per-process cache backend doesn't share between workers.
+    """
+    modified_field = 'updated_at'
+
+    def get_validator_queryset(self):
+        return self.get_queryset().prefetch_related(None).order_by()
+
+    def get_list_validators(self):
+        """
+        :returns: (etag, last_modified) for the filtered list
+        """
+        queryset = self.filter_queryset(self.get_validator_queryset())
+        stats = queryset.aggregate(
+            last_modified=Max(self.modified_field), count=Count('*'))
+        last_modified = stats['last_modified']
+        raw_etag = (
+            f'{self.request.build_absolute_uri()}|{stats["count"]}|'
+            f'{last_modified.isoformat() if last_modified else ""}'
+        )
+        etag = 'W/' + quote_etag(hashlib.md5(raw_etag.encode()).hexdigest())
+
+        return etag, last_modified
+
+    def get_detail_validators(self):
+        """
+        :returns: (etag, last_modified) for the object, or (None, None)
+            if it does not exist
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = self.get_validator_queryset().filter(**{
+            self.lookup_field: self.kwargs[lookup_url_kwarg],
+        }).values_list('pk', self.modified_field).first()
+
+        if row is None:
+            return None, None
+
+        pk, last_modified = row
+        return quote_etag(f'{pk}-{last_modified.timestamp():.6f}'), last_modified
+
+    def get_conditional_response(self, handler, validators, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = validators()
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, self.get_list_validators, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, self.get_detail_validators, request, *args, **kwargs)
+
+
+class FastListMixin:
+    """
+    Renders list responses from ``.values()`` rows through a precompiled
+    read plan instead of serializing model instances field by field.
+    The payload is the same as the serializer's. Serializers with fields
+    a plan can't render (method fields, nested serializers) fall back to
+    the regular list.
+    """
+
+    def list(self, request, *args, **kwargs):
+        plan = get_read_plan(self.get_serializer())
+
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Ordering and annotations are selected too, so cursor pagination
+        # can read its positions from the rows
+        pk_name = queryset.model._meta.pk.attname
+        ordering = [
+            pk_name if term.lstrip('-') == 'pk' else term.lstrip('-')
+            for term in queryset.query.order_by
+            if isinstance(term, str) and term != '?'
+        ]
+        columns = dict.fromkeys([
+            *plan.columns, pk_name, *ordering, *queryset.query.annotations])
+        queryset = queryset.prefetch_related(None).values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.render(page))
+
+        return Response(plan.render(queryset))
@@ -5,11 +5,12 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
                                         PermissionsMixin)
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (EmailValidator, MaxValueValidator,
                                     MinLengthValidator, MinValueValidator)
 from django.db import models
 from django.utils.text import slugify
-from PIL import Image
 
 from core.validators import alphanumeric, letters_only
 
@@ -105,25 +106,107 @@ class Product(models.Model):
         default=0, validators=[MinValueValidator(1)])
     description = models.TextField(default='')
     total_sold = models.PositiveIntegerField(default=0)
+    # Aggregates of the non-null ratings, maintained by the ratings API
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     image = models.ImageField(null=True, upload_to=product_image_file_path)
+    # SHA-256 of the image the variants were rendered from
+    image_hash = models.CharField(max_length=64, blank=True, default='')
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Weighted name/description vector, maintained by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
-        if self.image:
-            img = Image.open(self.image.path)
-            max_size = (600, 600)
-            img.thumbnail(max_size, Image.ANTIALIAS)
-            img.save(self.image.path)
-
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['name'], name='product_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            # Orderings exposed through ordering_fields, with id as the
+            # tie-breaker used by cursor pagination
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['total_sold', 'id'],
+                         name='product_total_sold_id_idx'),
+            models.Index(fields=['created_at', 'id'],
+                         name='product_created_at_id_idx'),
+            models.Index(fields=['rating_avg', 'id'],
+                         name='product_rating_avg_id_idx'),
+            models.Index(fields=['user', '-created_at'],
+                         name='product_user_created_at_idx'),
+            # Covers the MAX(updated_at)/COUNT validator of the unfiltered
+            # product list with an index-only scan
+            models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+        ]
+
+
+class ImageBlob(models.Model):
+    """
+    A stored image file named after the SHA-256 of its content, shared
+    by every product using that image. Blobs nobody references anymore
+    are deleted by gc_images.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'ImageBlob | {self.digest} | {self.refcount}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], condition=models.Q(refcount=0),
+                         name='imageblob_unreferenced_idx'),
+        ]
+
+
+class ImageJob(models.Model):
+    """
+    Queued rendering of a product image into its size variants
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+    )
+    source = models.CharField(max_length=255)
+    source_hash = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'ImageJob | {self.product_id} | {self.status}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'],
+                         name='imagejob_status_created_idx'),
+        ]
 
 
 class Rating(models.Model):
@@ -143,6 +226,10 @@ class Rating(models.Model):
 
     class Meta:
         unique_together = ('user', 'product')
+        indexes = [
+            models.Index(fields=['product', '-created_at'],
+                         name='rating_product_created_at_idx'),
+        ]
 
 
 class Category(models.Model):
@@ -161,6 +248,7 @@ class Category(models.Model):
 
     class Meta:
         verbose_name_plural = 'Categories'
+        ordering = ['name']
 
 
 class Cart(models.Model):
@@ -215,6 +303,10 @@ class Order(models.Model):
         max_length=20, choices=ORDER_STATUS_CHOICES, default=PENDING)
     stripe_checkout_session_id = models.CharField(
         max_length=128, unique=True, null=True, blank=True)
+    # False while the stock of an unpaid checkout is only reserved
+    stock_committed = models.BooleanField(default=True)
+    # Whether its items were counted into the co-purchase pairs
+    pairs_counted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -230,6 +322,16 @@ class Order(models.Model):
 
         return total
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'],
+                         name='order_user_created_at_idx'),
+            # Orders cancelled since the last leaderboard refresh
+            models.Index(fields=['updated_at'], name='order_updated_at_idx'),
+            models.Index(fields=['id'], name='order_pairs_pending_idx',
+                         condition=models.Q(pairs_counted=False)),
+        ]
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(
@@ -248,3 +350,148 @@ class OrderItem(models.Model):
 
     def get_total(self):
         return self.quantity * self.unit_price
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'],
+                         name='orderitem_created_at_idx'),
+        ]
+
+
+class ProductSales(models.Model):
+    """
+    Units of a product sold in one hour by orders that aren't cancelled,
+    the buckets the leaderboards are summed from
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f'ProductSales | {self.product_id} | {self.hour}'
+
+    class Meta:
+        verbose_name_plural = 'Product sales'
+        unique_together = ('product', 'hour')
+        indexes = [
+            models.Index(fields=['hour'], name='productsales_hour_idx'),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A ranked best seller over a rolling period, either overall
+    (no category) or within a category
+    """
+    DAY = '24h'
+    WEEK = '7d'
+    MONTH = '30d'
+
+    PERIOD_CHOICES = (
+        (DAY, 'Last 24 hours'),
+        (WEEK, 'Last 7 days'),
+        (MONTH, 'Last 30 days'),
+    )
+
+    PERIOD_HOURS = {
+        DAY: 24,
+        WEEK: 24 * 7,
+        MONTH: 24 * 30,
+    }
+
+    period = models.CharField(max_length=3, choices=PERIOD_CHOICES)
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, blank=True)
+    rank = models.PositiveIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'LeaderboardEntry | {self.period} | {self.rank}'
+
+    class Meta:
+        verbose_name_plural = 'Leaderboard entries'
+        indexes = [
+            models.Index(fields=['period', 'category', 'rank'],
+                         name='leaderboard_period_rank_idx'),
+        ]
+
+
+class ProductPair(models.Model):
+    """
+    Number of orders in which both products were bought, an entry of the
+    sparse co-purchase matrix. Each pair is stored in both directions.
+    """
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f'ProductPair | {self.product_id} | {self.related_id}'
+
+    class Meta:
+        unique_together = ('product', 'related')
+
+
+class RelatedProduct(models.Model):
+    """
+    One of the products most often bought together with a product
+    """
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='related_products')
+    rank = models.PositiveIntegerField()
+    related = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f'RelatedProduct | {self.product_id} | {self.rank}'
+
+    class Meta:
+        unique_together = ('product', 'rank')
+
+
+class Reservation(models.Model):
+    """
+    Units of a product held for a user's cart or for a pending order
+    until expires_at. Live reservations are subtracted from the
+    product's inventory to get what is still available.
+    """
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Reservation | {self.product_id} | {self.quantity}'
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(user__isnull=False) | models.Q(order__isnull=False),
+                name='reservation_has_holder'),
+            models.UniqueConstraint(
+                fields=['product', 'user'], condition=models.Q(order__isnull=True),
+                name='reservation_cart_unique'),
+            models.UniqueConstraint(
+                fields=['product', 'order'], condition=models.Q(order__isnull=False),
+                name='reservation_order_unique'),
+        ]
+        indexes = [
+            # Sums the live reservations of a product from the index alone
+            models.Index(fields=['product', 'expires_at'], include=['quantity'],
+                         name='reservation_product_live_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expires_at_idx'),
+        ]
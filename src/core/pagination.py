@@ -0,0 +1,257 @@
+"""
+Pagination classes shared across apps
+"""
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OptInCursorPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an opt-in keyset (cursor) mode.
+
+    Requests with ``?pagination=cursor`` (or a ``cursor`` token) seek on the
+    queryset ordering plus the primary key instead of running ``COUNT(*)``
+    and ``OFFSET n``, so every page costs the same no matter how deep it is.
+    The ordering fields are expected to be non-nullable.
+    """
+    cursor_query_param = 'cursor'
+    cursor_query_description = _('The pagination cursor value.')
+    mode_query_param = 'pagination'
+    mode_query_description = _(
+        'Set to "cursor" to use keyset pagination instead of limit/offset.')
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_mode(request)
+
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.request = request
+        self.base_url = remove_query_param(
+            request.build_absolute_uri(), self.offset_query_param)
+        self.display_page_controls = False
+        self.ordering = self.get_keyset_ordering(queryset)
+        position, reverse = self.decode_cursor(request, queryset)
+
+        queryset = self.load_ordering_fields(queryset.order_by(*[
+            f'{"-" if descending != reverse else ""}{name}'
+            for name, descending in self.ordering
+        ]))
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_seek_filter(position, reverse))
+
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if results:
+            self.next_position = self.get_position(results[-1])
+            self.previous_position = self.get_position(results[0])
+        else:
+            self.next_position = self.previous_position = position
+
+        return results
+
+    def is_cursor_mode(self, request):
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def get_keyset_ordering(self, queryset):
+        """
+        Return the queryset ordering as ``(name, descending)`` pairs,
+        with the primary key appended as a unique tie-breaker
+        """
+        order_by = queryset.query.order_by or queryset.model._meta.ordering
+        ordering = []
+
+        for term in order_by:
+            if not isinstance(term, str) or term == '?':
+                continue
+            name = term.lstrip('-')
+            if name == 'pk':
+                name = queryset.model._meta.pk.attname
+            ordering.append((name, term.startswith('-')))
+
+        pk_name = queryset.model._meta.pk.attname
+        if pk_name not in [name for name, descending in ordering]:
+            descending = ordering[0][1] if ordering else False
+            ordering.append((pk_name, descending))
+
+        return ordering
+
+    def load_ordering_fields(self, queryset):
+        """
+        Make sure a queryset narrowed with .only() still loads the
+        ordering fields, which the cursor positions are read from
+        """
+        field_names, deferred = queryset.query.deferred_loading
+
+        if deferred or not field_names:
+            return queryset
+
+        return queryset.only(*field_names, *[
+            name for name, descending in self.ordering
+            if name not in queryset.query.annotations
+        ])
+
+    def get_seek_filter(self, position, reverse):
+        """
+        Build the lexicographic "comes after position" condition.
+
+        The leading ``>=``/``<=`` bound lets Postgres start an index range
+        scan at the cursor instead of filtering from the first row.
+        """
+        condition = Q()
+        equal = Q()
+
+        for (name, descending), value in zip(self.ordering, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        name, descending = self.ordering[0]
+        bound = 'lte' if descending != reverse else 'gte'
+
+        return Q(**{f'{name}__{bound}': position[0]}) & condition
+
+    def get_position(self, instance):
+        position = []
+
+        for name, descending in self.ordering:
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, name)
+            position.append(value)
+
+        return position
+
+    def get_field(self, queryset, name):
+        annotation = queryset.query.annotations.get(name)
+
+        if annotation is not None:
+            return annotation.output_field
+
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        """
+        Return ``(position, reverse)`` from the request cursor token
+
+        :raises: NotFound if the cursor is malformed or does not match the
+                    current ordering
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None, False
+
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            token = json.loads(urlsafe_b64decode(encoded + padding))
+            values = token['p']
+            reverse = bool(token.get('r', False))
+
+            if len(values) != len(self.ordering):
+                raise ValueError
+
+            position = [
+                self.get_field(queryset, name).to_python(value)
+                for (name, descending), value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, AttributeError,
+                FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        token = {'p': [self.encode_value(value) for value in position]}
+        if reverse:
+            token['r'] = 1
+
+        encoded = urlsafe_b64encode(
+            json.dumps(token, separators=(',', ':')).encode('ascii')
+        ).decode('ascii').rstrip('=')
+
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def encode_value(self, value):
+        # Keep full precision, DjangoJSONEncoder truncates microseconds
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': str(self.mode_query_description),
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': str(self.cursor_query_description),
+                'schema': {'type': 'string'},
+            },
+        ]
+        return parameters
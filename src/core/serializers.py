@@ -0,0 +1,275 @@
+"""
+Serializer mixins shared by the API apps
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F
+from rest_framework import ISO_8601, permissions, serializers
+from rest_framework.settings import api_settings
+
+
+class SparseFieldsetMixin:
+    """
+    Lets read requests pick the fields of the response with
+    ``?fields=id,name`` or drop some with ``?omit=description``.
+    Only applies to the top level serializer; unknown names are ignored.
+    """
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def get_sparse_params(self):
+        """
+        :returns: (fields, omit) sets of requested names, fields None if
+            every field was requested
+        """
+        request = self.context.get('request')
+        parent = self.parent
+
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+
+        if (request is None or parent is not None
+                or request.method not in permissions.SAFE_METHODS):
+            return None, set()
+
+        fields = request.query_params.get(self.fields_param)
+        omit = request.query_params.get(self.omit_param, '')
+
+        if fields is not None:
+            fields = {name.strip() for name in fields.split(',') if name.strip()}
+
+        return fields, {name.strip() for name in omit.split(',') if name.strip()}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, omit = self.get_sparse_params()
+        self.is_sparse = bool(only or omit)
+
+        for name in list(fields):
+            if (only and name not in only) or name in omit:
+                del fields[name]
+
+        return fields
+
+
+# How a read plan converts each column value
+RAW = 'raw'
+DECIMAL = 'decimal'
+DATETIME = 'datetime'
+FILE = 'file'
+FIELD = 'field'
+MANY = 'many'
+
+# Field types whose representation of a database value is the value itself
+RAW_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.IntegerField,
+)
+
+
+def format_utc_datetime(value):
+    """
+    DateTimeField.to_representation for aware UTC datetimes
+    """
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def get_file_converter(serializer, name):
+    field = serializer.fields[name]
+    storage = serializer.Meta.model._meta.get_field(field.source).storage
+    request = serializer.context.get('request')
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+    def convert(value):
+        if not value:
+            return None
+        if not use_url:
+            return value
+        url = storage.url(value)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+class ReadPlanSpec:
+    """
+    Serializer independent part of a ReadPlan, cached per serializer class
+    and field selection
+    """
+
+    def __init__(self, fields, many):
+        self.fields = fields
+        self.many = many
+
+
+def get_field_kind(field, model_field):
+    if isinstance(field, serializers.DecimalField):
+        if (field.decimal_places == model_field.decimal_places
+                and getattr(field, 'coerce_to_string',
+                            api_settings.COERCE_DECIMAL_TO_STRING)
+                and not field.localize):
+            return DECIMAL
+        return FIELD
+
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = getattr(field, 'timezone', field.default_timezone())
+        if (output_format is not None
+                and output_format.lower() == ISO_8601
+                and field_timezone is not None
+                and str(field_timezone) == 'UTC'):
+            return DATETIME
+        return FIELD
+
+    if isinstance(field, serializers.FileField):
+        return FILE
+
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return RAW if field.use_pk_only_optimization() else None
+
+    if isinstance(field, RAW_FIELDS):
+        return RAW
+
+    if isinstance(field, (serializers.RelatedField, serializers.BaseSerializer,
+                          serializers.SerializerMethodField)):
+        return None
+
+    return FIELD
+
+
+def compile_read_plan_spec(serializer):
+    """
+    :returns: ReadPlanSpec, or None if a field can't be rendered from a
+        column of the serializer's model
+    """
+    model = serializer.Meta.model
+    fields = []
+    many = []
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or len(field.source_attrs) != 1:
+            return None
+
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+
+        if isinstance(field, serializers.ManyRelatedField):
+            if (not model_field.many_to_many or model_field.auto_created
+                    or not isinstance(field.child_relation, serializers.RelatedField)):
+                return None
+            fields.append((name, None, MANY))
+            many.append((name, model_field))
+            continue
+
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+
+        kind = get_field_kind(field, model_field)
+        if kind is None:
+            return None
+        fields.append((name, field.source, kind))
+
+    pk_name = model._meta.pk.name
+    # to-many fields are matched to their rows by the rendered primary key
+    if many and not any(name == column == pk_name for name, column, _ in fields):
+        return None
+
+    return ReadPlanSpec(fields, many)
+
+
+class ReadPlan:
+    """
+    Precompiled instructions for rendering ``.values()`` rows the way a
+    ModelSerializer renders instances, bound to one serializer instance.
+
+    ``columns`` are the keys to select with ``.values()``. Each entry of
+    ``fields`` is ``(name, column, convert)``, convert being None for
+    values that are emitted as is. ``many`` fields are filled with one
+    query for the whole page.
+    """
+
+    def __init__(self, serializer, spec):
+        self.model = serializer.Meta.model
+        self.columns = [column for _, column, _ in spec.fields if column]
+        self.fields = [
+            (name, column, self.get_converter(serializer, name, kind))
+            for name, column, kind in spec.fields
+        ]
+        self.many = [
+            (name, model_field, serializer.fields[name].child_relation)
+            for name, model_field in spec.many
+        ]
+
+    @staticmethod
+    def get_converter(serializer, name, kind):
+        if kind in (RAW, MANY):
+            return None
+        if kind == DECIMAL:
+            return '{:f}'.format
+        if kind == DATETIME:
+            return format_utc_datetime
+        if kind == FILE:
+            return get_file_converter(serializer, name)
+        return serializer.fields[name].to_representation
+
+    def render(self, rows):
+        """
+        :returns: list of dicts, in the serializer's field order
+        """
+        results = []
+
+        for row in rows:
+            item = {}
+            for name, column, convert in self.fields:
+                # to-many fields keep their place and are filled in below
+                value = row[column] if column else None
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            results.append(item)
+
+        for name, model_field, child_relation in self.many:
+            self.render_many(results, name, model_field, child_relation)
+
+        return results
+
+    def render_many(self, results, name, model_field, child_relation):
+        """
+        Fill a to-many field of every result with a single query
+        """
+        pk_name = self.model._meta.pk.name
+        query_name = model_field.related_query_name()
+        related = model_field.related_model._default_manager.filter(**{
+            f'{query_name}__in': [item[pk_name] for item in results],
+        }).annotate(_read_plan_owner=F(query_name))
+        values = {}
+
+        for instance in related:
+            values.setdefault(instance._read_plan_owner, []).append(
+                child_relation.to_representation(instance))
+
+        for item in results:
+            item[name] = values.get(item[pk_name], [])
+
+
+_read_plan_specs = {}
+
+
+def get_read_plan(serializer):
+    """
+    Return the ReadPlan of a ModelSerializer, or None if it has to be
+    rendered the regular way. Plans are compiled once per serializer class
+    and field selection.
+    """
+    key = (type(serializer), tuple(serializer.fields))
+
+    if key not in _read_plan_specs:
+        _read_plan_specs[key] = compile_read_plan_spec(serializer)
+
+    spec = _read_plan_specs[key]
+    return ReadPlan(serializer, spec) if spec is not None else None
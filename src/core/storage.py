@@ -0,0 +1,137 @@
+"""
+Content-addressed file storage.
+
+Files are stored once under the SHA-256 of their content, so the same
+upload made twice shares one file and its URL never changes meaning,
+which lets clients cache it forever. Each ImageBlob row counts the
+references to its file. Unreferenced blobs are deleted by collect_blobs
+once a grace period has passed, so a blob re-referenced in the meantime
+is kept.
+"""
+import os
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ImageBlob
+
+BLOBS_DIR = os.path.join('uploads', 'product', 'blobs')
+# Variants rendered from a blob, under a directory named after its digest
+VARIANTS_DIR = os.path.join('uploads', 'product', 'variants')
+
+
+def get_blob_name(digest, extension):
+    """
+    Storage name of the blob for digest, fanned out over two directory
+    levels so no directory grows too large
+    """
+    return os.path.join(
+        BLOBS_DIR, digest[:2], digest[2:4], f'{digest}{extension.lower()}')
+
+
+def is_blob_name(name):
+    return name.startswith(BLOBS_DIR + os.sep)
+
+
+def get_blob_digest(name):
+    """
+    Digest of the content stored under name, None if it is not a blob
+    """
+    if not name or not is_blob_name(name):
+        return None
+
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def is_content_addressed(name):
+    """
+    Whether the file stored under name can never change content
+    """
+    return is_blob_name(name) or name.startswith(VARIANTS_DIR + os.sep)
+
+
+def save_blob_file(name, file):
+    if default_storage.exists(name):
+        return
+
+    saved = default_storage.save(name, file)
+    if saved != name:
+        # Lost a race against an upload of the same content
+        default_storage.delete(saved)
+
+
+def acquire_blob(file, digest, extension):
+    """
+    Store file under its digest, unless a blob with this content exists,
+    and add a reference to the blob
+
+    :returns: ImageBlob
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                blob = ImageBlob.objects.select_for_update().filter(
+                    digest=digest).first()
+
+                if blob is None:
+                    blob = ImageBlob.objects.create(
+                        digest=digest,
+                        name=get_blob_name(digest, extension),
+                        size=file.size,
+                    )
+
+                # The row lock keeps collect_blobs from deleting the file
+                # between this check and the commit
+                save_blob_file(blob.name, file)
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    refcount=F('refcount') + 1, updated_at=timezone.now())
+                blob.refcount += 1
+
+                return blob
+        except IntegrityError:
+            # Another upload of the same content created the row first
+            if attempt:
+                raise
+
+
+def release_blob(name):
+    """
+    Drop a reference to the blob stored under name, if it is one
+    """
+    if not name or not is_blob_name(name):
+        return
+
+    ImageBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, updated_at=timezone.now())
+
+
+def collect_blobs(grace_period, batch_size=100, on_delete=None):
+    """
+    Delete the files and rows of blobs unreferenced for longer than
+    grace_period (a timedelta), calling on_delete(blob) for each
+
+    :returns: number of blobs deleted
+    """
+    cutoff = timezone.now() - grace_period
+    deleted = 0
+
+    while True:
+        with transaction.atomic():
+            blobs = list(
+                ImageBlob.objects.select_for_update(skip_locked=True)
+                .filter(refcount=0, updated_at__lt=cutoff)
+                .order_by('updated_at')[:batch_size]
+            )
+
+            for blob in blobs:
+                default_storage.delete(blob.name)
+                if on_delete is not None:
+                    on_delete(blob)
+
+            ImageBlob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+
+        deleted += len(blobs)
+        if len(blobs) < batch_size:
+            return deleted
@@ -0,0 +1,79 @@
+from django.db import connection
+from django.test import TestCase
+
+from core.benchmarks import seed_products
+from core.filters import ProductFilter
+from core.models import Product
+from helpers.test_helpers import (create_category, create_product, create_user,
+                                  explain, iter_plan_nodes)
+
+
+class ProductFilterTests(TestCase):
+    """
+    Tests for the product category filter
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.shoes = create_category(name='running shoes')
+        self.bags = create_category(name='bags')
+        self.both = create_product(self.user, name='Both')
+        self.both.categories.set([self.shoes, self.bags])
+        self.shoes_only = create_product(self.user, name='Shoes only')
+        self.shoes_only.categories.set([self.shoes])
+        create_product(self.user, name='None')
+
+    def filter(self, **params):
+        return ProductFilter(params, queryset=Product.objects.order_by('id')).qs
+
+    def test_any_of_categories(self):
+        """
+        Filtering by names or slugs
+        should return each product having any of them once
+        """
+        products = self.filter(categories='running-shoes,Bags')
+
+        self.assertEqual(list(products), [self.both, self.shoes_only])
+
+    def test_all_of_categories(self):
+        """
+        Filtering with categories_match=all
+        should return only the products having every category
+        """
+        products = self.filter(categories='running-shoes,bags', categories_match='all')
+
+        self.assertEqual(list(products), [self.both])
+
+    def test_unknown_category(self):
+        """
+        Filtering by an unknown category
+        should return no products
+        """
+        self.assertEqual(list(self.filter(categories='hats')), [])
+
+    def test_plan_has_no_distinct(self):
+        """
+        Filtering a large catalogue by a broad category
+        should plan a semijoin without DISTINCT or Unique nodes
+        """
+        seed_products(self.user, 5000)
+        Product.categories.through.objects.bulk_create([
+            Product.categories.through(product_id=pk, category_id=category.pk)
+            for index, pk in enumerate(Product.objects.values_list('pk', flat=True))
+            for category in (self.shoes, self.bags) if index % 2 or category == self.shoes
+        ], ignore_conflicts=True)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_product, core_product_categories, core_category')
+
+        for params in [{'categories': 'running-shoes,bags'},
+                       {'categories': 'running-shoes,bags', 'categories_match': 'all'}]:
+            queryset = ProductFilter(
+                params, queryset=Product.objects.order_by('-created_at')).qs[:20]
+            nodes = list(iter_plan_nodes(explain(queryset)))
+            node_types = {node['Node Type'] for node in nodes}
+
+            self.assertNotIn('DISTINCT', str(queryset.query))
+            self.assertNotIn('Unique', node_types)
+            self.assertNotIn('Aggregate', node_types)
+            self.assertTrue(any(
+                'Semi' in node.get('Join Type', '') for node in nodes))
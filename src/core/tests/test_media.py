@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core.storage import get_blob_name
+
+MEDIA_ROOT = tempfile.mkdtemp()
+DIGEST = 'ab' * 32
+CONTENT = bytes(range(256)) * 4
+
+
+def media_url(name):
+    return reverse('media', args=[name])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SENDFILE_HEADER='')
+class MediaViewTests(SimpleTestCase):
+    """
+    Tests for serving media files
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.blob_name = get_blob_name(DIGEST, '.jpg')
+        cls.legacy_name = os.path.join('uploads', 'product', 'legacy.jpg')
+
+        for name in [cls.blob_name, cls.legacy_name]:
+            path = os.path.join(MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_serve_blob(self):
+        """
+        Fetching a content-addressed image
+        should stream it with an immutable Cache-Control
+        """
+        res = self.client.get(media_url(self.blob_name))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_legacy_files_are_not_immutable(self):
+        """
+        Fetching an image stored under a random name
+        should not mark it immutable
+        """
+        res = self.client.get(media_url(self.legacy_name))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('immutable', res['Cache-Control'])
+
+    def test_range_request(self):
+        """
+        Fetching a byte range
+        should return 206 - Partial Content with only those bytes
+        """
+        cases = [
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-24', 1000, 1023),
+            ('bytes=1000-5000', 1000, 1023),
+        ]
+
+        for header, start, end in cases:
+            with self.subTest(header=header):
+                res = self.client.get(
+                    media_url(self.blob_name), HTTP_RANGE=header)
+
+                self.assertEqual(res.status_code, 206)
+                self.assertEqual(
+                    res['Content-Range'], f'bytes {start}-{end}/{len(CONTENT)}')
+                self.assertEqual(
+                    b''.join(res.streaming_content), CONTENT[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        """
+        Fetching a range past the end of the file
+        should return 416 - Range Not Satisfiable
+        """
+        res = self.client.get(media_url(self.blob_name), HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_not_modified(self):
+        """
+        Fetching an image with its current ETag
+        should return 304 - Not Modified
+        """
+        etag = self.client.get(media_url(self.blob_name))['ETag']
+        res = self.client.get(media_url(self.blob_name), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_sendfile_offload(self):
+        """
+        Fetching an image with a sendfile header configured
+        should leave the transfer to the web server
+        """
+        with self.settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect',
+                           MEDIA_ACCEL_REDIRECT_LOCATION='/protected-media/'):
+            res = self.client.get(media_url(self.blob_name))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-media/{self.blob_name}')
+
+        with self.settings(MEDIA_SENDFILE_HEADER='X-Sendfile'):
+            res = self.client.get(media_url(self.blob_name))
+
+        self.assertEqual(
+            res['X-Sendfile'], os.path.join(MEDIA_ROOT, self.blob_name))
+
+    def test_missing_or_outside_files(self):
+        """
+        Fetching a missing file or one outside the media root
+        should return 404 - Not Found
+        """
+        for name in ['uploads/missing.jpg', '../settings.py']:
+            with self.subTest(name=name):
+                res = self.client.get(media_url(name))
+                self.assertEqual(res.status_code, 404)
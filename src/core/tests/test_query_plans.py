@@ -0,0 +1,230 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.benchmarks import make_vocabulary, seed_products
+from core.models import Cart, Order, OrderItem, Product, Rating
+from helpers.test_helpers import (create_category, create_user, explain,
+                                  iter_plan_nodes)
+
+# Tables that grow with the business, where a sequential scan on a hot
+# path would eventually hurt
+LARGE_TABLES = {
+    'core_product', 'core_product_categories', 'core_cart', 'core_order',
+    'core_orderitem', 'core_rating',
+}
+
+INDEX_SCANS = {'Index Scan', 'Index Only Scan'}
+
+
+def get_ordering_sort(plan):
+    """
+    :returns: the Sort node answering the ORDER BY of a plan, if any
+    """
+    while plan['Node Type'] in ('Limit', 'Gather Merge'):
+        plan = plan['Plans'][0]
+
+    return plan if plan['Node Type'] == 'Sort' else None
+
+
+def iter_sorted_rows(sort):
+    """
+    Yield the nodes below a Sort whose rows it sorts as they are,
+    leaving out those aggregated first
+    """
+    for child in sort.get('Plans', []):
+        if child['Node Type'] != 'Aggregate':
+            yield child
+            yield from iter_sorted_rows(child)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on every query of the main endpoints over seeded data,
+    with sequential scans disabled, so a Seq Scan on a large table means
+    no index can serve the query at all. The planner then falls back to
+    sorting a full index scan, so the index each access path was added
+    for is also checked by name.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.buyers = [
+            create_user(email=f'buyer{index}@email.com',
+                        username=f'buyer{index}')
+            for index in range(20)
+        ]
+        cls.category = create_category(name='shoes')
+        cls.seller = create_user(email='seller@email.com', username='seller')
+        seed_products(cls.seller, 50)
+
+        seed_products(cls.user, 3000, vocabulary=make_vocabulary(500))
+        products = list(Product.objects.order_by('id'))
+        cls.product = products[0]
+
+        Product.categories.through.objects.bulk_create([
+            Product.categories.through(product=product, category=cls.category)
+            for product in products[::3]
+        ])
+
+        orders = Order.objects.bulk_create([
+            Order(user=buyer) for buyer in cls.buyers for _ in range(200)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[index % len(products)],
+                      unit_price=50, quantity=1)
+            for index, order in enumerate(orders)
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=buyer, product=product, unit_price=product.price)
+            for buyer in cls.buyers for product in products[:50]
+        ])
+        Rating.objects.bulk_create([
+            Rating(user=buyer, product=product, rating=4)
+            for buyer in cls.buyers for product in products[:100]
+        ])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyers[0])
+        cache.clear()
+
+    def get_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, 200, url)
+        return [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def get_plans(self, url, params=None):
+        """
+        :returns: [(sql, plan)] of the SELECTs of a request, explained
+            with sequential scans disabled
+        """
+        plans = []
+
+        for sql in self.get_queries(url, params):
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+            try:
+                plans.append((sql, explain(sql)))
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET enable_seqscan')
+
+        return plans
+
+    def assertNoSeqScans(self, url, params=None, index=None):
+        """
+        Fail on a Seq Scan of a large table, or on an ORDER BY sorting a
+        full index scan of one: with sequential scans off, that is how
+        the planner reads a table no index can order. If index is set, it
+        must serve one of the queries.
+        """
+        plans = self.get_plans(url, params)
+
+        for sql, plan in plans:
+            seq_scans = [
+                node['Relation Name'] for node in iter_plan_nodes(plan)
+                if node['Node Type'] == 'Seq Scan'
+                and node['Relation Name'] in LARGE_TABLES
+            ]
+            self.assertEqual(seq_scans, [], f'{url} {params}\n{sql}')
+
+            sort = get_ordering_sort(plan)
+            sorted_scans = [
+                node['Index Name'] for node in iter_sorted_rows(sort or {})
+                if node['Node Type'] in INDEX_SCANS
+                and node['Relation Name'] in LARGE_TABLES
+                and 'Index Cond' not in node
+            ]
+            self.assertEqual(sorted_scans, [], f'{url} {params}\n{sql}')
+
+        if index is not None:
+            used = {
+                node['Index Name']
+                for _, plan in plans for node in iter_plan_nodes(plan)
+                if 'Index Name' in node
+            }
+            self.assertIn(index, used, f'{url} {params}')
+
+    def test_public_product_list(self):
+        """
+        The public product list, in each ordering and filter
+        should not scan any large table sequentially
+        """
+        url = reverse('products:public-list')
+        cases = [
+            ({}, 'product_updated_at_idx'),
+            ({'pagination': 'cursor'}, None),
+            ({'pagination': 'cursor', 'ordering': '-created_at'},
+             'product_created_at_id_idx'),
+            ({'pagination': 'cursor', 'ordering': 'price'}, 'product_price_id_idx'),
+            ({'pagination': 'cursor', 'ordering': '-total_sold'},
+             'product_total_sold_id_idx'),
+            ({'pagination': 'cursor', 'ordering': '-rating_avg'},
+             'product_rating_avg_id_idx'),
+            ({'ordering': 'price', 'price_min': 100, 'price_max': 500},
+             'product_price_id_idx'),
+            ({'categories': 'shoes', 'ordering': '-created_at'}, None),
+            ({'search': self.product.name.split()[0]}, 'product_search_vector_idx'),
+        ]
+
+        for params, index in cases:
+            with self.subTest(params=params):
+                self.assertNoSeqScans(url, params, index)
+
+    def test_public_product_reads(self):
+        """
+        Product detail, facets, suggestions and ratings
+        should not scan any large table sequentially
+        """
+        cases = [
+            (reverse('products:public-retrieve', args=[self.product.id]), None,
+             'core_product_pkey'),
+            (reverse('products:public-facets'), {'categories': 'shoes'}, None),
+            (reverse('products:suggest'), {'q': self.product.name[:5]},
+             'product_name_upper_prefix_idx'),
+            (reverse('api:ratings-list'), {'product': self.product.id},
+             'rating_product_created_at_idx'),
+        ]
+
+        for url, params, index in cases:
+            with self.subTest(url=url):
+                self.assertNoSeqScans(url, params, index)
+
+    def test_user_reads(self):
+        """
+        Orders, order items, carts and the cart count of a user
+        should not scan any large table sequentially
+        """
+        cases = [
+            (reverse('api:orders-list'), 'order_user_created_at_idx'),
+            (reverse('api:order_items-list'), None),
+            (reverse('carts:carts-list'), None),
+            (reverse('carts:count'), None),
+        ]
+
+        for url, index in cases:
+            with self.subTest(url=url):
+                self.assertNoSeqScans(url, index=index)
+
+    def test_seller_product_list(self):
+        """
+        The seller's product list
+        should not scan any large table sequentially
+        """
+        self.client.force_authenticate(self.seller)
+
+        self.assertNoSeqScans(
+            reverse('products:products-list'), {'ordering': '-created_at'},
+            'product_user_created_at_idx')
@@ -0,0 +1,163 @@
+"""
+Serving of uploaded media
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from core.storage import is_content_addressed
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Parse a single byte range of a Range header.
+    Malformed and multi-part ranges are ignored, serving the whole file.
+
+    :returns: (first byte, last byte) or None for the whole file
+    :raises: RangeNotSatisfiable if the range lies past the end of the file
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+
+    if match is None or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+
+    if size == 0:
+        raise RangeNotSatisfiable
+    if not first:
+        # Suffix range, the last n bytes
+        if int(last) == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - int(last)), size - 1
+
+    start = int(first)
+    end = size - 1 if not last else min(int(last), size - 1)
+
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+
+    return start, end
+
+
+class FileRange:
+    """
+    File-like object reading ``length`` bytes from the file's position
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def get_file_response(request, path, full_path, size, content_type, etag):
+    sendfile_header = settings.MEDIA_SENDFILE_HEADER
+
+    if sendfile_header:
+        # The web server sends the file, Range requests included
+        response = HttpResponse(content_type=content_type)
+        if sendfile_header.lower() == 'x-accel-redirect':
+            response[sendfile_header] = (
+                settings.MEDIA_ACCEL_REDIRECT_LOCATION + quote(path))
+        else:
+            response[sendfile_header] = full_path
+        return response
+
+    byte_range = None
+    # A Range with an outdated If-Range validator gets the whole file
+    if request.META.get('HTTP_IF_RANGE') in (None, etag):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        file = open(full_path, 'rb')
+        file.seek(start)
+        response = FileResponse(FileRange(file, length), content_type=content_type)
+
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = length
+
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Stream a media file, with validators and Range support.
+    Content-addressed files never change, so they are cached for a year
+    and marked immutable.
+    """
+    try:
+        full_path = default_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found.')
+
+    if not os.path.isfile(full_path):
+        raise Http404('File not found.')
+
+    stat = os.stat(full_path)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        response = get_file_response(
+            request, path, full_path, stat.st_size,
+            content_type or 'application/octet-stream', etag)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    if is_content_addressed(path):
+        cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        cache_control = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+    return response
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 
 from core.models import Cart, Category, Order, OrderItem, Product
 
@@ -83,3 +84,25 @@ def create_order(user, shipping_info={}):
         user=user,
         shipping_info=shipping_info,
     )
+
+
+def explain(sql, params=None):
+    """
+    Helper function to return the root plan node of EXPLAIN (FORMAT JSON)
+    for a queryset or a raw SQL statement
+    """
+    if hasattr(sql, 'query'):
+        sql, params = sql.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return cursor.fetchone()[0][0]['Plan']
+
+
+def iter_plan_nodes(plan):
+    """
+    Helper function to walk every node of an EXPLAIN plan
+    """
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from iter_plan_nodes(child)
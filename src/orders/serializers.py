@@ -1,9 +1,13 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
-from core.models import Cart, Order, OrderItem
+from core.models import Cart, Order, OrderItem, Product
+from core.serializers import SparseFieldsetMixin
+from products.inventory import get_available_inventory, release, reserve_order
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Order model
     """
@@ -26,6 +30,9 @@ class OrderSerializer(serializers.ModelSerializer):
             'created_at': {'read_only': True},
             'updated_at': {'read_only': True},
         }
+        method_field_paths = {
+            'total': ['order_items__unit_price', 'order_items__quantity'],
+        }
 
     def get_total(self, instance):
         return instance.get_total()
@@ -68,13 +75,31 @@ class OrderSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    @transaction.atomic
     def create(self, validated_data):
+        """
+        Order the carts, taking their stock right away unless created
+        with stock_committed=False, which only reserves it until paid
+        """
         carts = validated_data.pop('carts', [])
+        user = validated_data.get('user')
+        product_ids = sorted(cart.product_id for cart in carts)
+
+        # Locked, and checked against what others have reserved
+        list(Product.objects.select_for_update().filter(pk__in=product_ids))
+        available = get_available_inventory(product_ids, user=user)
+        for cart in carts:
+            if cart.quantity > available.get(cart.product_id, 0):
+                raise serializers.ValidationError(
+                    f'Insufficient inventory for product {cart.product.name}'
+                )
+
         order = Order.objects.create(**validated_data)
         order_items = []
 
         for cart in carts:
             product = cart.product
+            product.refresh_from_db(fields=['inventory', 'total_sold'])
             new_inventory = product.inventory - cart.quantity
 
             order_item = OrderItem(
@@ -85,12 +110,17 @@ class OrderSerializer(serializers.ModelSerializer):
             )
 
             order_items.append(order_item)
-            product.inventory = new_inventory
-            product.total_sold += cart.quantity
-            product.save()
+            if order.stock_committed:
+                product.inventory = new_inventory
+                product.total_sold += cart.quantity
+                product.save()
             cart.delete()
 
         OrderItem.objects.bulk_create(order_items)
+        if not order.stock_committed:
+            reserve_order(order, settings.CHECKOUT_RESERVATION_TTL)
+        if user is not None:
+            release(product_ids, user=user)
 
         return order
 
@@ -98,7 +128,10 @@ class OrderSerializer(serializers.ModelSerializer):
 
         # Checking if the order is canceled
         # If cancelled, revert the product quantity and inventory
-        if validated_data.get('is_cancelled', False):
+        if validated_data.get('is_cancelled', False) and not instance.stock_committed:
+            # An unpaid checkout only reserved its items
+            release(order=instance)
+        elif validated_data.get('is_cancelled', False):
             order_items = OrderItem.objects.filter(order=instance)
 
             for order_item in order_items:
@@ -111,7 +144,7 @@ class OrderSerializer(serializers.ModelSerializer):
         return instance
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for items in Order
     """
@@ -131,6 +164,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'created_at': {'read_only': True},
             'updated_at': {'read_only': True},
         }
+        method_field_paths = {
+            'product_name': ['product__name'],
+            'total': ['unit_price', 'quantity'],
+        }
 
     def get_product_name(self, instance):
         return instance.get_product_name()
@@ -1,14 +1,19 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Order
+from core.models import Order, OrderItem, Reservation
 from helpers.test_helpers import (create_carts, create_order,
-                                  create_order_item, create_user)
+                                  create_order_item, create_product,
+                                  create_user)
 from orders.serializers import OrderSerializer
+from products.inventory import reserve_order
 
 ORDERS_URL = reverse('api:orders-list')
+ORDER_ITEMS_URL = reverse('api:order_items-list')
 
 
 def detail_url(id):
@@ -191,6 +196,25 @@ class PrivateOrdersApiTests(TestCase):
         self.assertEqual(inventory_after_order_create + 1, product.inventory)
         self.assertEqual(total_sold_after_order_create - 1, product.total_sold)
 
+    def test_cancel_unpaid_order(self):
+        """
+        Cancelling an order that was never paid
+        should release its reservations and leave the inventory as is
+        """
+        product = create_product(self.user, inventory=3)
+        order = create_order(self.user)
+        OrderItem.objects.create(
+            order=order, product=product, unit_price=product.price, quantity=2)
+        reserve_order(order, 60)
+
+        res = self.client.patch(detail_url(order.id), {'is_cancelled': True})
+        product.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Reservation.objects.filter(order=order).exists())
+        self.assertEqual(product.inventory, 3)
+        self.assertEqual(product.total_sold, 0)
+
     def test_delete_order(self):
         """
         Deleting an order
@@ -203,3 +227,39 @@ class PrivateOrdersApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(orders.exists())
+
+    def test_list_query_count_is_constant(self):
+        """
+        Fetching orders and order items with a larger page size
+        should run the same number of queries
+        """
+        for _ in range(4):
+            order = create_order(self.user)
+            for cart in create_carts(self.user):
+                create_order_item(order, cart)
+
+        for url in [ORDERS_URL, ORDER_ITEMS_URL]:
+            with CaptureQueriesContext(connection) as small_page:
+                self.client.get(url, {'limit': 2})
+            with CaptureQueriesContext(connection) as full_page:
+                res = self.client.get(url, {'limit': 8})
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(small_page), len(full_page))
+
+    def test_sparse_fieldset(self):
+        """
+        Fetching orders without their total
+        should not prefetch the order items
+        """
+        order = create_order(self.user)
+        for cart in create_carts(self.user):
+            create_order_item(order, cart)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ORDERS_URL, {'fields': 'id,status'})
+
+        self.assertEqual(
+            res.data['results'], [{'id': order.id, 'status': order.status}])
+        self.assertNotIn(
+            'core_orderitem', ' '.join(query['sql'] for query in queries))
@@ -1,26 +1,30 @@
 from rest_framework import permissions, viewsets
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from core.mixins import QuerysetPlannerMixin
 from core.models import Order, OrderItem
 from orders.serializers import OrderItemSerializer, OrderSerializer
 
 
-class OrdersViewSet(viewsets.ModelViewSet):
+class OrdersViewSet(QuerysetPlannerMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    queryset = Order.objects.all()
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return super().get_queryset().filter(
+            user=self.request.user).order_by('-created_at')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderItemViewSet(QuerysetPlannerMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = OrderItemSerializer
+    queryset = OrderItem.objects.all()
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return OrderItem.objects.filter(order__user=self.request.user)
+        return super().get_queryset().filter(order__user=self.request.user)
@@ -0,0 +1,71 @@
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from carts.upsert import add_to_cart
+from core.models import Cart, Order, Reservation
+from helpers.test_helpers import create_product, create_user
+from payments.views import handle_successful_payment
+
+CART_CHECKOUT_URL = reverse('payments:cart_checkout')
+DIRECT_CHECKOUT_URL = reverse('payments:direct_checkout')
+
+
+@patch('stripe.checkout.Session.create', return_value=Mock(id='cs_test'))
+class PrivateCheckoutApiTests(TestCase):
+    """
+    Tests for authenticated checkout api requests
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.product = create_product(self.user, inventory=2)
+        add_to_cart(self.user, self.product.id, 2,
+                    settings.CART_RESERVATION_TTL)
+
+    def test_unpaid_cart_checkout(self, patched_create):
+        """
+        Checking out a cart without paying
+        should reserve its items for the order, leaving the inventory
+        as is until the payment goes through
+        """
+        cart = Cart.objects.get(user=self.user)
+        res = self.client.post(CART_CHECKOUT_URL, {
+            'cart_ids': [cart.id], 'shipping_info': {}}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK, res.data)
+        order = Order.objects.get(user=self.user)
+        self.assertFalse(order.stock_committed)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory, 2)
+        self.assertEqual(self.product.total_sold, 0)
+        self.assertEqual(
+            list(Reservation.objects.values_list('order', 'quantity')),
+            [(order.id, 2)])
+
+        handle_successful_payment({'metadata': {'order_id': order.id}})
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory, 0)
+        self.assertEqual(self.product.total_sold, 2)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_direct_checkout_of_units_in_own_cart(self, patched_create):
+        """
+        Checking out directly the units held by the buyer's own cart
+        should return 200 - OK and move the hold to the order
+        """
+        res = self.client.post(DIRECT_CHECKOUT_URL, {
+            'product_id': self.product.id, 'quantity': 2}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK, res.data)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(
+            list(Reservation.objects.values_list('order', 'quantity')),
+            [(order.id, 2)])
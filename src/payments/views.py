@@ -12,6 +12,8 @@ from rest_framework_simplejwt.authentication import (
 
 from core.models import Order, OrderItem, Product
 from orders.serializers import OrderSerializer
+from products.inventory import (InsufficientInventory, commit_order_stock,
+                                reserve_order)
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -69,8 +71,9 @@ class DirectCheckoutSession(views.APIView):
 
         if quantity <= product.inventory and quantity > 0:
 
-            with transaction.atomic():
-                try:
+            # The units are only reserved until the payment goes through
+            try:
+                with transaction.atomic():
                     order = Order.objects.create(
                         user=user,
                         shipping_info=shipping_info,
@@ -80,14 +83,17 @@ class DirectCheckoutSession(views.APIView):
                         order=order, product=product,
                         unit_price=product.price, quantity=quantity)
 
-                    product.inventory -= quantity
-                    product.total_sold += quantity
-                    product.save()
+                    reserve_order(order, settings.CHECKOUT_RESERVATION_TTL)
 
-                except IntegrityError:
-                    return Response(
-                        {'error': 'Unable to process your order.'},
-                        status=status.HTTP_400_BAD_REQUEST)
+            except InsufficientInventory:
+                return Response(
+                    {'error': 'Insufficient inventory.'},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+            except IntegrityError:
+                return Response(
+                    {'error': 'Unable to process your order.'},
+                    status=status.HTTP_400_BAD_REQUEST)
 
         item = [{
                 'price_data': {
@@ -132,7 +138,8 @@ class CartCheckoutSession(views.APIView):
             return Response(order_serializer.errors,
                             status=status.HTTP_400_BAD_REQUEST)
 
-        pending_order = order_serializer.save(user=user)
+        # The stock is only reserved until the payment goes through
+        pending_order = order_serializer.save(user=user, stock_committed=False)
 
         order_items = []
         for order_item in pending_order.order_items.all():
@@ -192,7 +199,9 @@ def handle_successful_payment(session):
         order, data={'status': Order.PAID}, partial=True)
 
     if serializer.is_valid():
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            commit_order_stock(order)
         return status.HTTP_200_OK, ''
     else:
         return (status.HTTP_400_BAD_REQUEST,
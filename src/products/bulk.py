@@ -0,0 +1,256 @@
+"""
+Streaming bulk import and export of a seller's products.
+
+Imports are parsed row by row and validated in chunks: the categories
+of a chunk are resolved together, in one query at most, and its valid
+rows are inserted with bulk_create. Exports read through a server-side
+cursor and are written out one row at a time.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from categories.names import normalize_category_names, resolve_category_ids
+from core.models import Product
+from products.cache import invalidate_category_counts, invalidate_product_cache
+
+FILE_FORMATS = ('csv', 'ndjson')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_FIELDS = [
+    'id', 'name', 'price', 'inventory', 'description', 'total_sold',
+    'categories', 'created_at', 'updated_at',
+]
+
+
+class InvalidImportFile(ValueError):
+    """
+    Raised when the file itself can't be read past a line
+    """
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    """
+    Validates a single imported row. Categories are matched by name
+    later, for the whole chunk at once.
+    """
+    categories = serializers.ListField(
+        child=serializers.CharField(), required=False, default=list)
+
+    class Meta:
+        model = Product
+        fields = ['name', 'price', 'inventory', 'description', 'categories']
+        extra_kwargs = {
+            'description': {'required': False, 'allow_blank': True},
+        }
+
+    def validate_categories(self, value):
+        return normalize_category_names(value)
+
+
+def get_file_format(file_format, filename=''):
+    """
+    Return the requested file format, falling back to the file extension
+
+    :raises: ValueError if the format is not supported
+    """
+    if not file_format and '.' in filename:
+        file_format = filename.rsplit('.', 1)[1].lower()
+        if file_format in ('json', 'jsonl'):
+            file_format = 'ndjson'
+
+    if file_format not in FILE_FORMATS:
+        raise ValueError(
+            f'Unsupported file format, expected one of: {", ".join(FILE_FORMATS)}.')
+
+    return file_format
+
+
+def decode_lines(lines):
+    """
+    Decode the lines of a binary file as UTF-8 one by one, skipping
+    a leading BOM, so an invalid byte is reported on its own line
+
+    :raises: InvalidImportFile
+    """
+    for line_number, line in enumerate(lines, start=1):
+        try:
+            yield line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise InvalidImportFile(line_number, 'File is not valid UTF-8.')
+
+
+def iter_rows(stream, file_format):
+    """
+    Parse a text stream lazily into (line number, row) pairs.
+    CSV categories are a comma separated cell.
+
+    :raises: InvalidImportFile if the CSV is malformed
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        try:
+            for row in reader:
+                row = {key: value for key, value in row.items() if key}
+                if isinstance(row.get('categories'), str):
+                    row['categories'] = row['categories'].split(',')
+                yield reader.line_num, row
+        except csv.Error as e:
+            # DictReader.line_num only counts the rows parsed
+            raise InvalidImportFile(reader.reader.line_num, f'Malformed CSV: {e}.')
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_chunk(user, rows):
+    """
+    Validate and insert one chunk of (line number, row) pairs
+
+    :returns: (number of products created, [{line, errors}])
+    """
+    errors = []
+    valid = []
+
+    for line, row in rows:
+        if not isinstance(row, dict):
+            errors.append({'line': line, 'errors': ['Invalid row.']})
+            continue
+
+        serializer = ProductImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((line, serializer.validated_data))
+        else:
+            errors.append({'line': line, 'errors': serializer.errors})
+
+    categories, _ = resolve_category_ids(list(dict.fromkeys(
+        name for _, data in valid for name in data['categories'])))
+
+    products = []
+    for line, data in valid:
+        missing = [name for name in data['categories'] if name not in categories]
+        if missing:
+            errors.append({'line': line, 'errors': {
+                'categories': [f'Category not found: {name}' for name in missing],
+            }})
+            continue
+
+        category_ids = {categories[name] for name in data.pop('categories')}
+        products.append((Product(user=user, **data), category_ids))
+
+    if products:
+        with transaction.atomic():
+            created = Product.objects.bulk_create(
+                [product for product, _ in products])
+            Product.categories.through.objects.bulk_create([
+                Product.categories.through(
+                    product_id=product.pk, category_id=category_id)
+                for product, (_, category_ids) in zip(created, products)
+                for category_id in category_ids
+            ])
+            invalidate_product_cache([])
+            invalidate_category_counts()
+
+    return len(products), errors
+
+
+def import_products(user, stream, file_format, chunk_size=1000, max_errors=100):
+    """
+    Import products for user from a CSV or NDJSON text stream.
+    Invalid rows are skipped and reported, valid ones are imported.
+
+    :returns: {'created': int, 'skipped': int, 'errors': [{line, errors}]},
+        reporting at most max_errors errors (None for all)
+    :raises: InvalidImportFile if the stream can't be read, the chunks
+        before the offending line being imported
+    """
+    created = 0
+    skipped = 0
+    errors = []
+
+    for rows in chunked(iter_rows(stream, file_format), chunk_size):
+        chunk_created, chunk_errors = import_chunk(user, rows)
+        created += chunk_created
+        skipped += len(chunk_errors)
+
+        if max_errors is None:
+            errors += chunk_errors
+        else:
+            errors += chunk_errors[:max_errors - len(errors)]
+
+    return {'created': created, 'skipped': skipped, 'errors': errors}
+
+
+def get_export_queryset(user):
+    return (
+        Product.objects.filter(user=user)
+        .annotate(category_names=ArrayAgg(
+            'categories__name',
+            filter=Q(categories__isnull=False),
+            ordering='categories__name',
+        ))
+        .order_by('id')
+        .values(*[field for field in EXPORT_FIELDS if field != 'categories'],
+                'category_names')
+    )
+
+
+class _Echo:
+    """
+    File-like object handing back what csv.writer writes to it
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_products(user, file_format, chunk_size=2000):
+    """
+    Yield the user's products as CSV or NDJSON lines, read through a
+    server-side cursor so memory stays flat however many rows there are
+    """
+    rows = get_export_queryset(user).iterator(chunk_size=chunk_size)
+
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+
+        for row in rows:
+            row['categories'] = ','.join(row.pop('category_names'))
+            yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+        return
+
+    for row in rows:
+        row['categories'] = row.pop('category_names')
+        yield json.dumps(
+            {field: row[field] for field in EXPORT_FIELDS},
+            cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,51 @@
+"""
+Invalidation of the cached public catalogue responses.
+
+Public list pages depend on the 'catalogue' version, a product detail
+on its own 'product:<pk>' version plus 'categories' (category names are
+embedded in every product). Leaderboards and related products are
+bumped by their refresh, 'category_counts' whenever products join or
+leave a category.
+"""
+from django.db import transaction
+
+from core.cache import bump_version
+
+CATALOGUE = 'catalogue'
+CATEGORIES = 'categories'
+LEADERBOARDS = 'leaderboards'
+CATEGORY_COUNTS = 'category_counts'
+RELATED_PRODUCTS = 'related_products'
+
+
+def product_version(pk):
+    return f'product:{pk}'
+
+
+def invalidate(*names):
+    """
+    Bump the versions now and again once the transaction commits, so a
+    response rendered from the pre-commit rows in between is not kept
+    """
+    bump_version(*names)
+    transaction.on_commit(lambda: bump_version(*names))
+
+
+def invalidate_product_cache(product_ids):
+    invalidate(CATALOGUE, *[product_version(pk) for pk in product_ids])
+
+
+def invalidate_category_cache():
+    invalidate(CATALOGUE, CATEGORIES)
+
+
+def invalidate_leaderboard_cache():
+    invalidate(LEADERBOARDS)
+
+
+def invalidate_category_counts():
+    invalidate(CATEGORY_COUNTS)
+
+
+def invalidate_related_cache():
+    invalidate(RELATED_PRODUCTS)
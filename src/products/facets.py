@@ -0,0 +1,46 @@
+"""
+Grouped aggregate queries behind the storefront filter sidebar
+"""
+from django.db.models import Count, F
+from django.db.models.functions import Floor
+
+from core.models import Category, Product
+
+
+def category_counts(queryset):
+    """
+    Number of products of queryset in each category,
+    most populated categories first
+    """
+    return list(
+        Category.objects
+        .filter(product__in=queryset.order_by().values('pk'))
+        .values('id', 'name')
+        .annotate(count=Count('product'))
+        .order_by('-count', 'name')
+    )
+
+
+def price_histogram(queryset, interval):
+    """
+    Number of products of queryset per price bucket of the given width.
+    Empty buckets are left out.
+    """
+    # Filtered through a subquery, keeping annotations of the filters
+    # (e.g. search rank) out of the GROUP BY
+    buckets = (
+        Product.objects.filter(pk__in=queryset.order_by().values('pk'))
+        .annotate(bucket=Floor(F('price') / interval))
+        .values('bucket')
+        .annotate(count=Count('pk'))
+        .order_by('bucket')
+    )
+
+    return [
+        {
+            'min': bucket['bucket'] * interval,
+            'max': (bucket['bucket'] + 1) * interval,
+            'count': bucket['count'],
+        }
+        for bucket in buckets
+    ]
@@ -0,0 +1,203 @@
+"""
+Product image pipeline.
+
+Uploads are stored as-is in the content-addressed blob store (see
+core.storage) and queued as ImageJobs. The process_images worker
+renders the size variants below outside of the request path, under a
+directory named after the source's hash, so products sharing an image
+share its variants too.
+"""
+import hashlib
+import os
+import shutil
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import ImageJob, Product
+from core.storage import (VARIANTS_DIR, acquire_blob, get_blob_digest,
+                          release_blob)
+from products.cache import invalidate_product_cache
+
+IMAGE_VARIANTS = {
+    'thumbnail': (150, 150),
+    'card': (400, 400),
+    'full': (1200, 1200),
+}
+
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def hash_file(file):
+    """
+    Return the SHA-256 hex digest of an uploaded or stored file
+    """
+    digest = hashlib.sha256()
+
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+
+    return digest.hexdigest()
+
+
+def store_image(product, image):
+    """
+    Store the uploaded image on the product and queue its variants.
+    Uploading the image the product already has is a no-op, unless its
+    variants were never rendered and no job is rendering them.
+
+    :returns: True if a new image was stored
+    """
+    image_hash = hash_file(image)
+
+    if get_blob_digest(product.image.name) == image_hash:
+        queued = product.image_jobs.filter(
+            source_hash=image_hash,
+            status__in=[ImageJob.PENDING, ImageJob.PROCESSING],
+        )
+        if product.image_hash == image_hash or queued.exists():
+            return False
+
+    with transaction.atomic():
+        blob = acquire_blob(
+            image, image_hash, os.path.splitext(image.name)[1])
+        release_blob(product.image.name)
+        product.image = blob.name
+        product.save(update_fields=['image', 'updated_at'])
+        product.image_jobs.filter(status=ImageJob.PENDING).delete()
+        ImageJob.objects.create(
+            product=product,
+            source=product.image.name,
+            source_hash=image_hash,
+        )
+
+    return True
+
+
+def delete_variants(blob):
+    """
+    Delete the variants rendered from a garbage collected blob
+    """
+    shutil.rmtree(
+        default_storage.path(os.path.join(VARIANTS_DIR, blob.digest)),
+        ignore_errors=True)
+
+
+def render_variants(source_path, output_dir, media_root):
+    """
+    Render every size variant of the source image in every format.
+    Runs in worker processes, so it only touches the filesystem.
+    Variants that already exist for this content are kept.
+
+    :returns: {variant: {format: name relative to media_root}}
+    """
+    variants = {}
+    os.makedirs(os.path.join(media_root, output_dir), exist_ok=True)
+
+    with Image.open(source_path) as source:
+        source = ImageOps.exif_transpose(source)
+        source.load()
+
+        for variant, size in IMAGE_VARIANTS.items():
+            img = source.copy()
+            img.thumbnail(size, Image.LANCZOS)
+            variants[variant] = {}
+
+            for extension, (image_format, options) in IMAGE_FORMATS.items():
+                name = os.path.join(output_dir, f'{variant}.{extension}')
+                path = os.path.join(media_root, name)
+                variants[variant][extension] = name
+
+                if os.path.exists(path):
+                    continue
+
+                output = img
+                if image_format == 'JPEG' and img.mode != 'RGB':
+                    output = img.convert('RGB')
+
+                temp_path = f'{path}.{os.getpid()}.tmp'
+                output.save(temp_path, image_format, **options)
+                os.replace(temp_path, path)
+
+    return variants
+
+
+def get_render_args(job):
+    return (
+        default_storage.path(job.source),
+        os.path.join(VARIANTS_DIR, job.source_hash),
+        default_storage.path(''),
+    )
+
+
+def claim_jobs(batch_size, max_attempts, stale_after):
+    """
+    Mark up to batch_size runnable jobs as processing and return them.
+    Jobs stuck in processing for longer than stale_after are retried.
+    """
+    stale_before = timezone.now() - timedelta(seconds=stale_after)
+
+    with transaction.atomic():
+        jobs = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ImageJob.PENDING)
+                | Q(status=ImageJob.PROCESSING, updated_at__lt=stale_before),
+                attempts__lt=max_attempts,
+            )
+            .order_by('created_at')[:batch_size]
+        )
+        ImageJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=ImageJob.PROCESSING,
+            attempts=F('attempts') + 1,
+            updated_at=timezone.now(),
+        )
+
+    return jobs
+
+
+def is_unchanged(job):
+    """
+    Whether the product already has variants for this job's image
+    """
+    return Product.objects.filter(
+        pk=job.product_id, image=job.source, image_hash=job.source_hash,
+    ).exists()
+
+
+def finish_job(job, variants=None):
+    """
+    Attach the rendered variants, unless the image was replaced meanwhile,
+    and mark the job as done
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        if variants is not None:
+            updated = Product.objects.filter(
+                pk=job.product_id, image=job.source,
+            ).update(
+                image_hash=job.source_hash,
+                image_variants=variants,
+                updated_at=now,
+            )
+            if updated:
+                invalidate_product_cache([job.product_id])
+        ImageJob.objects.filter(pk=job.pk).update(
+            status=ImageJob.DONE, error='', updated_at=now)
+
+
+def fail_job(job, error, max_attempts):
+    status = ImageJob.FAILED if job.attempts + 1 >= max_attempts \
+        else ImageJob.PENDING
+
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=status, error=str(error), updated_at=timezone.now())
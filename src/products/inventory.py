@@ -0,0 +1,210 @@
+"""
+Time-boxed inventory reservations.
+
+A reservation holds units of a product for one holder, either a user's
+cart or a pending order, until it expires. What a holder can still
+reserve is the inventory minus the live reservations of everyone else.
+Reserving locks the product row, so concurrent reservations of the same
+product are checked one after the other and can never oversell it.
+Expired reservations no longer count and are deleted in batches by
+expire_reservations.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from core.models import Order, Product, Reservation
+from products.cache import invalidate_product_cache
+
+
+class InsufficientInventory(Exception):
+    def __init__(self, product_id, available):
+        self.product_id = product_id
+        self.available = available
+        super().__init__(f'Insufficient inventory for product {product_id}')
+
+
+def get_holder_filter(user=None, order=None):
+    if order is not None:
+        return Q(order=order)
+    return Q(user=user, order__isnull=True)
+
+
+def get_live_reservations(now=None):
+    return Reservation.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def get_reserved_quantity(user=None, order=None, now=None):
+    """
+    Subquery of the units of the outer product held by live reservations
+    of other holders than the given one
+    """
+    reservations = get_live_reservations(now).filter(product=OuterRef('pk'))
+
+    if user is not None or order is not None:
+        reservations = reservations.exclude(get_holder_filter(user, order))
+
+    return Coalesce(Subquery(
+        reservations.values('product')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+        .order_by()
+    ), 0)
+
+
+def get_available_inventory(product_ids, user=None, order=None):
+    """
+    Inventory minus the live reservations of other holders, in one query
+
+    :returns: {product_id: quantity}
+    """
+    return dict(
+        Product.objects.filter(pk__in=product_ids)
+        .annotate(available=F('inventory') - get_reserved_quantity(user, order))
+        .values_list('pk', 'available')
+    )
+
+
+def reserve(product_id, quantity, ttl, user=None, order=None):
+    """
+    Hold quantity units of a product for the holder until ttl seconds
+    from now, replacing what it held before
+
+    :raises: InsufficientInventory if fewer units are available,
+        Product.DoesNotExist
+    """
+    now = timezone.now()
+    holder = get_holder_filter(user, order)
+
+    with transaction.atomic():
+        # Reservations of a product are serialized on its row lock
+        inventory = Product.objects.select_for_update().values_list(
+            'inventory', flat=True).get(pk=product_id)
+        reserved = (
+            get_live_reservations(now)
+            .filter(product_id=product_id).exclude(holder)
+            .aggregate(total=Coalesce(Sum('quantity'), 0))['total']
+        )
+        available = inventory - reserved
+
+        if quantity > available:
+            raise InsufficientInventory(product_id, available)
+
+        expires_at = now + timedelta(seconds=ttl)
+        updated = Reservation.objects.filter(holder, product_id=product_id).update(
+            quantity=quantity, expires_at=expires_at)
+        if not updated:
+            Reservation.objects.create(
+                product_id=product_id,
+                user=user if order is None else None,
+                order=order,
+                quantity=quantity,
+                expires_at=expires_at,
+            )
+
+
+def shrink_reservation(product_id, quantity, user=None, order=None):
+    """
+    Lower the holder's reservation to at most quantity units.
+    Holding less never needs checking against the inventory.
+    """
+    Reservation.objects.filter(
+        get_holder_filter(user, order), product_id=product_id,
+    ).update(quantity=Least(F('quantity'), quantity))
+
+
+def release(product_ids=None, user=None, order=None):
+    """
+    Drop the holder's reservations, of the given products only if set
+    """
+    reservations = Reservation.objects.filter(get_holder_filter(user, order))
+
+    if product_ids is not None:
+        reservations = reservations.filter(product__in=product_ids)
+
+    reservations.delete()
+
+
+def transfer_cart_reservation(order, product_id, quantity):
+    """
+    Hand up to quantity units the buyer's cart holds of a product over
+    to their order, so the buyer never competes with their own cart
+    """
+    reservations = Reservation.objects.filter(
+        get_holder_filter(user=order.user_id), product_id=product_id)
+
+    reservations.filter(quantity__lte=quantity).delete()
+    reservations.update(quantity=F('quantity') - quantity)
+
+
+def reserve_order(order, ttl):
+    """
+    Reserve the items of a pending order instead of taking them out
+    of the inventory, until the order is paid. The buyer's cart holds
+    on the items are transferred to the order.
+
+    :raises: InsufficientInventory
+    """
+    with transaction.atomic():
+        for item in order.order_items.order_by('product_id'):
+            # Locked before touching its reservations, like reserve does
+            list(Product.objects.select_for_update().filter(
+                pk=item.product_id).values_list('pk'))
+            transfer_cart_reservation(order, item.product_id, item.quantity)
+            reserve(item.product_id, item.quantity, ttl, order=order)
+
+        Order.objects.filter(pk=order.pk).update(stock_committed=False)
+        order.stock_committed = False
+
+
+def commit_order_stock(order):
+    """
+    Take the items of a paid order out of the inventory and drop its
+    reservations. An order paid after its reservations expired still
+    takes its units, never below zero.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        updated = Order.objects.filter(pk=order.pk, stock_committed=False).update(
+            stock_committed=True, updated_at=now)
+        if not updated:
+            return
+
+        items = list(order.order_items.order_by('product_id'))
+        for item in items:
+            Product.objects.filter(pk=item.product_id).update(
+                inventory=Greatest(F('inventory') - item.quantity, 0),
+                total_sold=F('total_sold') + item.quantity,
+                updated_at=now,
+            )
+
+        release(order=order)
+        invalidate_product_cache([item.product_id for item in items])
+        order.stock_committed = True
+
+
+def expire_reservations(batch_size=1000, now=None):
+    """
+    Delete expired reservations, batch_size rows per statement
+
+    :returns: number of reservations deleted
+    """
+    now = now or timezone.now()
+    deleted = 0
+
+    while True:
+        batch = list(
+            Reservation.objects.filter(expires_at__lte=now)
+            .order_by('expires_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if batch:
+            Reservation.objects.filter(pk__in=batch).delete()
+
+        deleted += len(batch)
+        if len(batch) < batch_size:
+            return deleted
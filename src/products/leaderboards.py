@@ -0,0 +1,153 @@
+"""
+Best-seller leaderboards over rolling periods.
+
+Sold quantities are rolled up from order items into hourly ProductSales
+buckets. Only the orders counted in Product.total_sold are sold: paid
+ones, or those whose stock was taken, never unpaid checkouts that only
+reserved it. The buckets are rebuilt incrementally: the hours since
+the last refresh, plus older hours whose orders changed (e.g. were paid
+or cancelled) since then. The ranked LeaderboardEntry rows of every period, overall
+and per category, are then recomputed from the buckets in one statement
+per period, so serving a leaderboard is a single indexed range read.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from core.models import (LeaderboardEntry, Order, OrderItem, Product,
+                         ProductSales)
+from products.cache import invalidate_leaderboard_cache
+
+RANK_SQL = '''
+    WITH sales AS (
+        SELECT product_id, SUM(quantity) AS quantity
+        FROM {sales}
+        WHERE hour >= %(since)s
+        GROUP BY product_id
+    ), ranked AS (
+        SELECT NULL::integer AS category_id, product_id, quantity,
+               ROW_NUMBER() OVER (ORDER BY quantity DESC, product_id) AS rank
+        FROM sales
+        UNION ALL
+        SELECT product_categories.category_id, sales.product_id, sales.quantity,
+               ROW_NUMBER() OVER (
+                   PARTITION BY product_categories.category_id
+                   ORDER BY sales.quantity DESC, sales.product_id
+               ) AS rank
+        FROM sales
+        JOIN {product_categories} product_categories
+            ON product_categories.product_id = sales.product_id
+    )
+    INSERT INTO {entries}
+        (period, category_id, rank, product_id, quantity, refreshed_at)
+    SELECT %(period)s, category_id, rank, product_id, quantity, %(now)s
+    FROM ranked
+    WHERE rank <= %(size)s
+'''
+
+
+def truncate_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def get_sold_items():
+    return (
+        OrderItem.objects
+        .filter(Q(order__status=Order.PAID) | Q(order__stock_committed=True))
+        .exclude(order__is_cancelled=True)
+        .exclude(order__status=Order.CANCELLED)
+    )
+
+
+def refresh_sales(since):
+    """
+    Rebuild the hourly buckets from since onwards, and the older hours
+    holding items of orders updated since then
+
+    :returns: number of buckets written
+    """
+    start = truncate_hour(since)
+    changed_hours = list(
+        OrderItem.objects
+        .filter(order__updated_at__gte=since, created_at__lt=start)
+        .annotate(hour=TruncHour('created_at'))
+        .values_list('hour', flat=True).distinct()
+    )
+    buckets = (
+        get_sold_items()
+        .annotate(hour=TruncHour('created_at'))
+        .filter(Q(created_at__gte=start) | Q(hour__in=changed_hours))
+        .values('product', 'hour')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        ProductSales.objects.filter(
+            Q(hour__gte=start) | Q(hour__in=changed_hours)).delete()
+        created = ProductSales.objects.bulk_create([
+            ProductSales(
+                product_id=bucket['product'],
+                hour=bucket['hour'],
+                quantity=bucket['total'],
+            )
+            for bucket in buckets
+        ])
+
+    return len(created)
+
+
+def rank_products(size, now):
+    """
+    Replace every leaderboard with the top size products of each
+    period, overall and per category
+
+    :returns: number of entries written
+    """
+    sql = RANK_SQL.format(
+        sales=connection.ops.quote_name(ProductSales._meta.db_table),
+        product_categories=connection.ops.quote_name(
+            Product.categories.through._meta.db_table),
+        entries=connection.ops.quote_name(LeaderboardEntry._meta.db_table),
+    )
+    current_hour = truncate_hour(now)
+    written = 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        LeaderboardEntry.objects.all().delete()
+
+        for period, hours in LeaderboardEntry.PERIOD_HOURS.items():
+            cursor.execute(sql, {
+                'since': current_hour - timedelta(hours=hours - 1),
+                'period': period,
+                'now': now,
+                'size': size,
+            })
+            written += cursor.rowcount
+
+        invalidate_leaderboard_cache()
+
+    return written
+
+
+def refresh_leaderboards(lookback_hours=2, full=False, size=100, now=None):
+    """
+    Refresh the sales buckets and recompute the leaderboards.
+    Refreshes must run at least every lookback_hours, or use full,
+    for cancellations to be picked up.
+
+    :returns: {'buckets': int, 'entries': int}
+    """
+    now = now or timezone.now()
+    longest = max(LeaderboardEntry.PERIOD_HOURS.values())
+    since = now - timedelta(hours=longest if full else lookback_hours)
+
+    buckets = refresh_sales(since)
+    ProductSales.objects.filter(
+        hour__lt=truncate_hour(now) - timedelta(hours=longest - 1)).delete()
+    entries = rank_products(size, now)
+
+    return {'buckets': buckets, 'entries': entries}
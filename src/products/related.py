@@ -0,0 +1,135 @@
+"""
+"Frequently bought together" recommendations.
+
+Every pair of products bought in the same paid order adds one to their
+ProductPair entry of the sparse co-purchase matrix. Orders are counted
+once settled, in batches of new orders (pairs_counted unset), by a
+single grouped self-join of their items upserted into the matrix, so
+memory stays bounded by the batch whatever the size of the order
+history. Pending orders are left for a later run, cancelled ones are
+marked counted without adding pairs. The rows of a batch are locked,
+skipping those another run holds, so concurrent runs never count an
+order twice.
+The top products of each row touched by a batch are then re-ranked into
+RelatedProduct, which serving reads with one index range scan.
+
+Cancelling an order after it was counted keeps its pairs, a full
+rebuild recounts the history from scratch.
+"""
+from django.db import connection, transaction
+
+from core.models import Order, OrderItem, ProductPair, RelatedProduct
+from products.cache import invalidate_related_cache
+
+PAIRS_SQL = '''
+    INSERT INTO {pairs} (product_id, related_id, orders)
+    SELECT items.product_id, others.product_id, COUNT(DISTINCT items.order_id)
+    FROM {items} items
+    JOIN {items} others
+        ON others.order_id = items.order_id
+        AND others.product_id <> items.product_id
+    WHERE items.order_id = ANY(%(orders)s)
+    GROUP BY items.product_id, others.product_id
+    ON CONFLICT (product_id, related_id)
+    DO UPDATE SET orders = {pairs}.orders + EXCLUDED.orders
+'''
+
+RANK_SQL = '''
+    INSERT INTO {related} (product_id, rank, related_id, orders)
+    SELECT product_id, rank, related_id, orders
+    FROM (
+        SELECT product_id, related_id, orders,
+               ROW_NUMBER() OVER (
+                   PARTITION BY product_id
+                   ORDER BY orders DESC, related_id
+               ) AS rank
+        FROM {pairs}
+        WHERE product_id = ANY(%(products)s)
+    ) ranked
+    WHERE rank <= %(size)s
+'''
+
+
+def format_sql(sql):
+    quote_name = connection.ops.quote_name
+
+    return sql.format(
+        pairs=quote_name(ProductPair._meta.db_table),
+        items=quote_name(OrderItem._meta.db_table),
+        related=quote_name(RelatedProduct._meta.db_table),
+    )
+
+
+def count_pairs(batch_size):
+    """
+    Count the next batch of new settled orders into the co-purchase
+    matrix, in the caller's transaction
+
+    :returns: (number of orders counted, ids of the products whose pairs changed)
+    """
+    orders = list(
+        Order.objects.filter(pairs_counted=False)
+        .exclude(status=Order.PENDING)
+        .select_for_update(skip_locked=True)
+        .order_by('pk')
+        .values_list('pk', 'is_cancelled', 'status')[:batch_size]
+    )
+    order_ids = [pk for pk, _, _ in orders]
+    sold = [
+        pk for pk, is_cancelled, status in orders
+        if not is_cancelled and status == Order.PAID
+    ]
+    product_ids = set(
+        OrderItem.objects.filter(order__in=sold)
+        .values_list('product', flat=True).distinct()
+    ) if sold else set()
+
+    if sold:
+        with connection.cursor() as cursor:
+            cursor.execute(format_sql(PAIRS_SQL), {'orders': sold})
+
+    Order.objects.filter(pk__in=order_ids).update(pairs_counted=True)
+
+    return len(order_ids), product_ids
+
+
+def rank_related(product_ids, size):
+    """
+    Replace the related products of product_ids with their top size pairs
+    """
+    RelatedProduct.objects.filter(product__in=product_ids).delete()
+
+    with connection.cursor() as cursor:
+        cursor.execute(format_sql(RANK_SQL), {
+            'products': list(product_ids),
+            'size': size,
+        })
+
+
+def build_related_products(batch_size=10000, size=10, full=False):
+    """
+    Count the orders not counted yet and re-rank the products they touch,
+    one transaction per batch of orders
+
+    :returns: {'orders': int, 'products': int}
+    """
+    if full:
+        with transaction.atomic():
+            RelatedProduct.objects.all().delete()
+            ProductPair.objects.all().delete()
+            Order.objects.filter(pairs_counted=True).update(pairs_counted=False)
+
+    counted = 0
+    ranked = set()
+
+    while True:
+        with transaction.atomic():
+            orders, product_ids = count_pairs(batch_size)
+            if product_ids:
+                rank_related(product_ids, size)
+                invalidate_related_cache()
+
+        counted += orders
+        ranked |= product_ids
+        if orders < batch_size:
+            return {'orders': counted, 'products': len(ranked)}
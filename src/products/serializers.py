@@ -1,38 +1,103 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
-from core.models import Category, Product
+from categories.names import (build_categories, normalize_category_names,
+                              resolve_category_ids)
+from core.models import Category, LeaderboardEntry, Product, RelatedProduct
+from core.serializers import SparseFieldsetMixin
 
 
 class CategoryListField(serializers.RelatedField):
     """
-    Categories list field for Product serializer
-    Modifying the to_internal_value to check if the category exists,
-    and return it the category
+    Categories list field for Product serializer, reading and writing
+    categories by name. With many=True the names are resolved together
+    by CategoryManyField.
     """
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return CategoryManyField(**list_kwargs)
+
     def to_representation(self, value):
         return value.name
 
     def to_internal_value(self, data):
-        try:
-            category = Category.objects.get(name=data.lower())
-            return category
-        except Category.DoesNotExist:
+        names = normalize_category_names([str(data)])
+        resolved, _ = resolve_category_ids(names)
+
+        if not resolved:
             raise serializers.ValidationError(f"Category not found: {data}")
 
+        return build_categories(names, resolved)[0]
+
 
-class ProductSerializer(serializers.ModelSerializer):
+class CategoryManyField(serializers.ManyRelatedField):
+    """
+    Resolves every category name of a product in one query (or none,
+    when the names are cached), reporting all missing names at once
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        names = normalize_category_names([str(name) for name in data])
+        resolved, missing = resolve_category_ids(names)
+
+        if missing:
+            raise serializers.ValidationError(
+                [f"Category not found: {name}" for name in missing])
+
+        return build_categories(names, resolved)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only field for the rendered image variants,
+    mapping each variant and format to its URL
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        variants = {}
+
+        for variant, formats in value.items():
+            variants[variant] = {}
+
+            for extension, name in formats.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[variant][extension] = url
+
+        return variants
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Product
     """
     categories = CategoryListField(
         queryset=Category.objects.all(), many=True, required=False)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'price', 'inventory', 'image',
-            'description', 'total_sold',
+            'id', 'name', 'price', 'inventory', 'image', 'image_variants',
+            'description', 'total_sold', 'rating_avg', 'rating_count',
             'categories', 'created_at', 'updated_at']
         extra_kwargs = {
             'id': {'read_only': True},
@@ -40,6 +105,8 @@ class ProductSerializer(serializers.ModelSerializer):
             'categories': {'read_only': True},
             'description': {'required': False, 'allow_blank': True},
             'total_sold': {'read_only': True},
+            'rating_avg': {'read_only': True},
+            'rating_count': {'read_only': True},
             'created_at': {'read_only': True},
             'updated_at': {'read_only': True}
         }
@@ -57,3 +124,74 @@ class ProductSerializer(serializers.ModelSerializer):
                     field_name: "This field is read-only."
                 })
         return super().to_internal_value(data)
+
+
+class ProductSuggestionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for typeahead suggestions
+    """
+    class Meta:
+        model = Product
+        fields = ['id', 'name']
+        read_only_fields = fields
+
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    """
+    Serializer for a product shown alongside another one
+    """
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'price', 'image', 'image_variants',
+            'rating_avg', 'rating_count']
+        read_only_fields = fields
+
+
+class RelatedProductSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a product frequently bought together with another one
+    """
+    product = ProductSummarySerializer(source='related', read_only=True)
+
+    class Meta:
+        model = RelatedProduct
+        fields = ['rank', 'orders', 'product']
+        read_only_fields = fields
+
+
+class CategoryFacetSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+
+
+class PriceBucketSerializer(serializers.Serializer):
+    min = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    max = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    count = serializers.IntegerField(read_only=True)
+
+
+class ProductFacetsSerializer(serializers.Serializer):
+    """
+    Serializer for the category counts and price histogram
+    of a filtered product list
+    """
+    categories = CategoryFacetSerializer(many=True, read_only=True)
+    price_interval = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True)
+    price_histogram = PriceBucketSerializer(many=True, read_only=True)
+
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    """
+    Serializer for a ranked product of a leaderboard
+    """
+    product = ProductSerializer(read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ['rank', 'quantity', 'product', 'refreshed_at']
+        read_only_fields = fields
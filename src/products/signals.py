@@ -0,0 +1,69 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Category, Product
+from core.storage import release_blob
+from products.cache import (invalidate_category_cache,
+                            invalidate_category_counts,
+                            invalidate_product_cache)
+
+
+def touch_products(queryset):
+    """
+    Bump updated_at of products whose serialized form changed without
+    a save of their own (category names are embedded), so their
+    ETag/Last-Modified validators change as well
+    """
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    invalidate_product_cache([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # The product's category rows are deleted along with it
+    invalidate_category_counts()
+    release_blob(instance.image.name)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        touch_products(Product.objects.filter(categories=instance))
+        return
+
+    if not action.startswith('post_'):
+        return
+
+    invalidate_category_counts()
+
+    if not reverse:
+        instance.updated_at = timezone.now()
+        Product.objects.filter(pk=instance.pk).update(
+            updated_at=instance.updated_at)
+        invalidate_product_cache([instance.pk])
+    elif pk_set:
+        touch_products(Product.objects.filter(pk__in=pk_set))
+        invalidate_product_cache(pk_set)
+    else:
+        # post_clear from the category side doesn't report the products
+        invalidate_category_cache()
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_category_products(sender, instance, created=False, **kwargs):
+    if not created:
+        touch_products(Product.objects.filter(categories=instance))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_category_cache()
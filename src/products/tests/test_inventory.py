@@ -0,0 +1,135 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core.models import Order, OrderItem, Reservation
+from helpers.test_helpers import create_product, create_user
+from products.inventory import (InsufficientInventory, commit_order_stock,
+                                get_available_inventory, release, reserve,
+                                reserve_order)
+
+
+class ReservationTests(TestCase):
+    """
+    Tests for inventory reservations
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user(email='other@email.com', username='other')
+        self.product = create_product(self.user, inventory=5)
+
+    def test_reserve_holds_units(self):
+        """
+        Reserving units
+        should lower what other holders can reserve
+        """
+        reserve(self.product.id, 3, 60, user=self.user)
+
+        self.assertEqual(get_available_inventory([self.product.id]), {self.product.id: 2})
+        self.assertEqual(
+            get_available_inventory([self.product.id], user=self.user),
+            {self.product.id: 5})
+        with self.assertRaises(InsufficientInventory):
+            reserve(self.product.id, 3, 60, user=self.other)
+
+    def test_reserve_replaces_own_reservation(self):
+        """
+        Reserving again for the same holder
+        should replace its reservation instead of adding to it
+        """
+        reserve(self.product.id, 4, 60, user=self.user)
+        reserve(self.product.id, 5, 60, user=self.user)
+
+        self.assertEqual(Reservation.objects.get().quantity, 5)
+
+    def test_expired_reservations_do_not_count(self):
+        """
+        An expired reservation
+        should not hold units anymore and be deleted by the sweeper
+        """
+        reserve(self.product.id, 5, 60, user=self.user)
+        Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        reserve(self.product.id, 5, 60, user=self.other)
+
+        call_command('expire_reservations', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(Reservation.objects.values_list('user', flat=True)), [self.other.id])
+
+    def test_release(self):
+        """
+        Releasing a holder's reservations
+        should make the units available again
+        """
+        reserve(self.product.id, 5, 60, user=self.user)
+        release([self.product.id], user=self.user)
+
+        self.assertEqual(get_available_inventory([self.product.id]), {self.product.id: 5})
+
+    def test_checkout_reserves_until_paid(self):
+        """
+        A pending order
+        should only reserve its units, taking them out of the inventory once paid
+        """
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order, product=self.product, unit_price=50, quantity=2)
+        reserve_order(order, 60)
+        self.product.refresh_from_db()
+
+        self.assertEqual(self.product.inventory, 5)
+        self.assertEqual(get_available_inventory([self.product.id]), {self.product.id: 3})
+
+        commit_order_stock(order)
+        commit_order_stock(order)
+        self.product.refresh_from_db()
+
+        self.assertEqual(self.product.inventory, 3)
+        self.assertEqual(self.product.total_sold, 2)
+        self.assertFalse(Reservation.objects.exists())
+
+
+class ReservationConcurrencyTests(TransactionTestCase):
+    """
+    Tests for concurrent reservations of a single product
+    """
+
+    def test_concurrent_reservations_never_oversell(self):
+        """
+        Many buyers reserving the last units at the same time
+        should never reserve more than the inventory
+        """
+        seller = create_user()
+        product = create_product(seller, inventory=10)
+        buyers = [
+            create_user(email=f'buyer{index}@email.com', username=f'buyer{index}')
+            for index in range(30)
+        ]
+        barrier = threading.Barrier(len(buyers))
+        results = []
+
+        def buy(buyer):
+            try:
+                barrier.wait()
+                reserve(product.id, 1, 60, user=buyer)
+                results.append(True)
+            except InsufficientInventory:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=[buyer]) for buyer in buyers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(Reservation.objects.count(), 10)
+        self.assertEqual(get_available_inventory([product.id]), {product.id: 0})
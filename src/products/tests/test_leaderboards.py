@@ -0,0 +1,183 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import LeaderboardEntry, Order, OrderItem, ProductSales
+from helpers.test_helpers import create_category, create_product, create_user
+from products.inventory import commit_order_stock
+
+
+def leaderboard_url(period):
+    return reverse('products:public-leaderboards', args=[period])
+
+
+class LeaderboardApiTests(TestCase):
+    """
+    Tests for the best-seller leaderboards
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.category = create_category(name='shoes')
+        self.products = [
+            create_product(self.user, name=f'Product {index}')
+            for index in range(3)
+        ]
+        self.products[1].categories.add(self.category)
+        self.now = timezone.now()
+        cache.clear()
+
+    def sell(self, product, quantity, hours_ago=0, **fields):
+        order = Order.objects.create(user=self.user, **fields)
+        item = OrderItem.objects.create(
+            order=order, product=product,
+            unit_price=product.price, quantity=quantity)
+        OrderItem.objects.filter(pk=item.pk).update(
+            created_at=self.now - timedelta(hours=hours_ago))
+
+        return order
+
+    def refresh(self, **options):
+        call_command('refresh_leaderboards', stdout=StringIO(), **options)
+
+    def get_ranking(self, period, **params):
+        res = self.client.get(leaderboard_url(period), params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [
+            (entry['product']['id'], entry['quantity'])
+            for entry in res.data['results']
+        ]
+
+    def test_rolling_periods(self):
+        """
+        Fetching each leaderboard
+        should rank the products by units sold within its period
+        """
+        first, second, third = self.products
+        self.sell(first, 5, hours_ago=72)
+        self.sell(second, 3, hours_ago=1)
+        self.sell(third, 1)
+        self.sell(third, 1, hours_ago=24 * 20)
+        self.refresh(full=True)
+
+        self.assertEqual(
+            self.get_ranking('24h'), [(second.id, 3), (third.id, 1)])
+        self.assertEqual(
+            self.get_ranking('7d'), [(first.id, 5), (second.id, 3), (third.id, 1)])
+        self.assertEqual(
+            self.get_ranking('30d'), [(first.id, 5), (second.id, 3), (third.id, 2)])
+
+    def test_category_leaderboard(self):
+        """
+        Fetching a leaderboard of a category by name or slug
+        should only rank the products of that category
+        """
+        for product in self.products:
+            self.sell(product, 2)
+        self.refresh()
+
+        self.assertEqual(
+            self.get_ranking('7d', category='Shoes'), [(self.products[1].id, 2)])
+        self.assertEqual(
+            self.get_ranking('7d', category=self.category.slug),
+            [(self.products[1].id, 2)])
+
+    def test_incremental_refresh_drops_cancelled_orders(self):
+        """
+        Cancelling an order older than the lookback
+        should remove its units at the next incremental refresh
+        """
+        order = self.sell(self.products[0], 4, hours_ago=48)
+        self.sell(self.products[1], 1, hours_ago=48)
+        self.refresh(full=True)
+        self.assertEqual(self.get_ranking('7d')[0], (self.products[0].id, 4))
+
+        order.is_cancelled = True
+        order.save()
+        self.refresh()
+
+        self.assertEqual(self.get_ranking('7d'), [(self.products[1].id, 1)])
+        self.assertEqual(ProductSales.objects.count(), 1)
+
+    def test_unpaid_checkouts_are_not_sold(self):
+        """
+        Refreshing while a checkout is unpaid
+        should leave its units out until it is paid
+        """
+        order = self.sell(
+            self.products[0], 4, hours_ago=48, stock_committed=False)
+        self.sell(self.products[1], 1, hours_ago=48, status=Order.PAID)
+        self.refresh(full=True)
+        self.assertEqual(self.get_ranking('7d'), [(self.products[1].id, 1)])
+
+        commit_order_stock(order)
+        Order.objects.filter(pk=order.pk).update(status=Order.PAID)
+        self.refresh()
+
+        self.assertEqual(self.get_ranking('7d')[0], (self.products[0].id, 4))
+
+    def test_refresh_invalidates_cache(self):
+        """
+        Refreshing the leaderboards
+        should invalidate the cached responses
+        """
+        self.refresh()
+        first = self.client.get(leaderboard_url('24h'))
+        self.sell(self.products[0], 1)
+        self.refresh()
+        second = self.client.get(leaderboard_url('24h'))
+
+        self.assertEqual(first.data['results'], [])
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual(len(second.data['results']), 1)
+
+    def test_size_limits_entries(self):
+        """
+        Refreshing with a size
+        should keep only that many products per leaderboard
+        """
+        for index, product in enumerate(self.products):
+            self.sell(product, index + 1)
+        self.refresh(size=2)
+
+        self.assertEqual(
+            LeaderboardEntry.objects.filter(period='24h', category=None).count(), 2)
+        self.assertEqual(
+            [product_id for product_id, _ in self.get_ranking('24h')],
+            [self.products[2].id, self.products[1].id])
+
+    def test_query_count_is_constant(self):
+        """
+        Fetching a larger leaderboard page
+        should run the same number of queries
+        """
+        for product in self.products:
+            product.categories.add(self.category)
+            self.sell(product, 1)
+        self.refresh()
+
+        with self.assertNumQueries(3):
+            self.client.get(leaderboard_url('24h'), {'limit': 1})
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.client.get(leaderboard_url('24h'), {'limit': 3})
+
+    def test_unknown_period_or_category(self):
+        """
+        Fetching an unknown period or category
+        should return 404 - Not Found
+        """
+        res = self.client.get(leaderboard_url('1y'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.get(leaderboard_url('24h'), {'category': 'hats'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,14 +1,32 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Product
+from categories.names import clear_category_ids
+from core.models import Category, Product
 from helpers.test_helpers import create_category, create_product, create_user
 from products.serializers import ProductSerializer
+from products.views import ProductSuggestView
 
 PRODUCTS_URL = reverse('products:products-list')
+IMPORT_URL = reverse('products:products-import-products')
+EXPORT_URL = reverse('products:products-export-products')
 PUBLIC_PRODUCTS_URL = reverse('products:public-list')
+SUGGEST_URL = reverse('products:suggest')
+FACETS_URL = reverse('products:public-facets')
 
 
 def public_detail_url(id):
@@ -30,6 +48,7 @@ class PublicProductApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = create_user()
+        cache.clear()
 
     def test_list_products(self):
         """
@@ -38,7 +57,7 @@ class PublicProductApiTests(TestCase):
         """
         for _ in range(5):
             create_product(self.user)
-        products = Product.objects.all()
+        products = Product.objects.order_by('id')
         serialized_products = ProductSerializer(products, many=True)
         res = self.client.get(PUBLIC_PRODUCTS_URL)
 
@@ -80,6 +99,380 @@ class PublicProductApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_cursor_pagination_walks_every_ordering(self):
+        """
+        Following the next links in cursor mode
+        should return every product exactly once, in order,
+        for each of the ordering fields
+        """
+        for index in range(7):
+            create_product(self.user, price=50 + index % 3, total_sold=index % 2)
+
+        for ordering in ['price', '-price', 'total_sold', '-total_sold',
+                         'created_at', '-created_at']:
+            tie_breaker = '-id' if ordering.startswith('-') else 'id'
+            expected = list(Product.objects.order_by(
+                ordering, tie_breaker).values_list('id', flat=True))
+            params = {'pagination': 'cursor', 'ordering': ordering, 'limit': 3}
+            res = self.client.get(PUBLIC_PRODUCTS_URL, params)
+            ids = []
+
+            while True:
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', res.data)
+                ids += [product['id'] for product in res.data['results']]
+                if not res.data['next']:
+                    break
+                res = self.client.get(res.data['next'])
+
+            self.assertEqual(ids, expected)
+
+    def test_cursor_pagination_previous_link(self):
+        """
+        Following the previous link in cursor mode
+        should return the page before the current one
+        """
+        for index in range(5):
+            create_product(self.user, price=50 + index)
+        params = {'pagination': 'cursor', 'ordering': 'price', 'limit': 2}
+        first_page = self.client.get(PUBLIC_PRODUCTS_URL, params)
+        second_page = self.client.get(first_page.data['next'])
+        res = self.client.get(second_page.data['previous'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], first_page.data['results'])
+        self.assertIsNone(first_page.data['previous'])
+
+    def test_list_query_count_is_constant(self):
+        """
+        Fetching products with a larger page size
+        should run the same number of queries
+        """
+        categories = [create_category(name=f'Category {index}') for index in range(2)]
+        for _ in range(6):
+            product = create_product(self.user)
+            product.categories.set(categories)
+
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(PUBLIC_PRODUCTS_URL, {'limit': 2})
+        with CaptureQueriesContext(connection) as full_page:
+            res = self.client.get(PUBLIC_PRODUCTS_URL, {'limit': 6})
+
+        self.assertEqual(len(res.data['results'][5]['categories']), 2)
+        self.assertEqual(len(small_page), len(full_page))
+
+    def test_list_is_served_from_cache(self):
+        """
+        Fetching the same page twice
+        should serve the second response from the cache
+        """
+        create_product(self.user)
+        first = self.client.get(PUBLIC_PRODUCTS_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(PUBLIC_PRODUCTS_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        # Only the conditional GET validator query
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'shop.example.com'])
+    def test_cache_is_keyed_by_host_and_scheme(self):
+        """
+        Fetching the same page through another host or scheme
+        should not be served the absolute URLs cached for the first one
+        """
+        for _ in range(2):
+            create_product(self.user)
+        params = {'limit': 1}
+        first = self.client.get(PUBLIC_PRODUCTS_URL, params)
+        other_host = self.client.get(
+            PUBLIC_PRODUCTS_URL, params, HTTP_HOST='shop.example.com')
+        secure = self.client.get(PUBLIC_PRODUCTS_URL, params, secure=True)
+
+        self.assertEqual(other_host['X-Cache'], 'MISS')
+        self.assertTrue(
+            other_host.json()['next'].startswith('http://shop.example.com/'))
+        self.assertEqual(secure['X-Cache'], 'MISS')
+        self.assertTrue(secure.json()['next'].startswith('https://'))
+        self.assertTrue(first.json()['next'].startswith('http://testserver/'))
+
+    def test_cache_hit_keeps_headers(self):
+        """
+        Fetching a cached page
+        should return the headers of the response that was cached
+        """
+        create_product(self.user)
+        first = self.client.get(PUBLIC_PRODUCTS_URL)
+        second = self.client.get(PUBLIC_PRODUCTS_URL)
+
+        self.assertEqual(second['X-Cache'], 'HIT')
+        for header in ['Content-Type', 'Vary', 'Allow']:
+            self.assertEqual(second[header], first[header])
+
+    def test_product_update_invalidates_cache(self):
+        """
+        Updating a product
+        should invalidate the cached list and detail responses
+        """
+        product = create_product(self.user, name='Old name')
+        self.client.get(PUBLIC_PRODUCTS_URL)
+        self.client.get(public_detail_url(product.id))
+        product.name = 'New name'
+        product.save()
+
+        list_res = self.client.get(PUBLIC_PRODUCTS_URL)
+        detail_res = self.client.get(public_detail_url(product.id))
+
+        self.assertEqual(list_res['X-Cache'], 'MISS')
+        self.assertEqual(list_res.data['results'][0]['name'], 'New name')
+        self.assertEqual(detail_res['X-Cache'], 'MISS')
+        self.assertEqual(detail_res.data['name'], 'New name')
+
+    def test_category_change_invalidates_cache(self):
+        """
+        Adding a category to a product or renaming a category
+        should invalidate the cached product detail
+        """
+        product = create_product(self.user)
+        category = create_category(name='old category')
+        self.client.get(public_detail_url(product.id))
+
+        product.categories.add(category)
+        res = self.client.get(public_detail_url(product.id))
+        self.assertEqual(res.data['categories'], ['old category'])
+
+        category.name = 'new category'
+        category.save()
+        res = self.client.get(public_detail_url(product.id))
+        self.assertEqual(res.data['categories'], ['new category'])
+
+    def test_sparse_fieldset(self):
+        """
+        Fetching products with fields
+        should return only those fields, without loading the others
+        """
+        product = create_product(self.user, description='Long description')
+        product.categories.add(create_category())
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                PUBLIC_PRODUCTS_URL, {'fields': 'id,name,price'})
+
+        self.assertEqual(
+            res.data['results'],
+            [{'id': product.id, 'name': product.name, 'price': '50.00'}])
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('core_category', sql)
+
+    def test_omit_fields(self):
+        """
+        Fetching a product with omit
+        should return every other field
+        """
+        product = create_product(self.user)
+        res = self.client.get(
+            public_detail_url(product.id), {'omit': 'description,categories'})
+
+        self.assertNotIn('description', res.data)
+        self.assertNotIn('categories', res.data)
+        self.assertEqual(res.data['name'], product.name)
+
+    def test_sparse_fieldset_with_cursor(self):
+        """
+        Paging through products with fields and a cursor
+        should still follow the requested ordering
+        """
+        for price in [300, 100, 200]:
+            create_product(self.user, price=price)
+
+        res = self.client.get(PUBLIC_PRODUCTS_URL, {
+            'fields': 'id', 'ordering': 'price', 'pagination': 'cursor', 'limit': 2})
+        with self.assertNumQueries(2):
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(list(res.data['results'][0]), ['id'])
+
+    def test_fast_list_matches_serializer(self):
+        """
+        Fetching products through the read plan
+        should return the same JSON as the serializer
+        """
+        categories = [create_category(name=name) for name in ['shoes', 'bags']]
+        for price in [300, 100, 200]:
+            product = create_product(
+                self.user, name=f'Product {price}', price=price,
+                image=f'uploads/products/{price}.jpg')
+            product.categories.set(categories[:price // 200 + 1])
+        cases = [
+            {},
+            {'fields': 'id,name,categories'},
+            {'omit': 'id,description'},
+            {'pagination': 'cursor', 'ordering': '-price', 'limit': 2},
+            {'search': 'product', 'categories': 'shoes'},
+        ]
+
+        for params in cases:
+            with self.subTest(params=params):
+                cache.clear()
+                fast = self.client.get(PUBLIC_PRODUCTS_URL, params)
+                cache.clear()
+                with patch('core.mixins.get_read_plan', return_value=None):
+                    regular = self.client.get(PUBLIC_PRODUCTS_URL, params)
+
+                self.assertEqual(fast.status_code, status.HTTP_200_OK)
+                self.assertEqual(fast.content, regular.content)
+
+    def test_detail_not_modified(self):
+        """
+        Fetching a product with its current ETag
+        should return 304 - Not Modified without serializing it
+        """
+        product = create_product(self.user)
+        etag = self.client.get(public_detail_url(product.id))['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                public_detail_url(product.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(len(queries), 1)
+
+    def test_detail_etag_changes_on_update(self):
+        """
+        Fetching an updated product with its old ETag
+        should return 200 - OK and a new ETag
+        """
+        product = create_product(self.user)
+        etag = self.client.get(public_detail_url(product.id))['ETag']
+        product.categories.add(create_category(name='new category'))
+
+        res = self.client.get(
+            public_detail_url(product.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertFalse(res['ETag'].startswith('W/'))
+
+    def test_list_not_modified(self):
+        """
+        Fetching the product list with its current validators
+        should return 304 - Not Modified, until a product is added
+        """
+        create_product(self.user)
+        first = self.client.get(PUBLIC_PRODUCTS_URL)
+
+        res = self.client.get(
+            PUBLIC_PRODUCTS_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        res = self.client.get(
+            PUBLIC_PRODUCTS_URL, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        create_product(self.user)
+        res = self.client.get(
+            PUBLIC_PRODUCTS_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_list_etag_changes_on_delete(self):
+        """
+        Fetching the product list with its ETag after deleting
+        a product other than the newest
+        should return 200 - OK and a new ETag
+        """
+        old_product = create_product(self.user)
+        create_product(self.user)
+        first = self.client.get(PUBLIC_PRODUCTS_URL)
+
+        old_product.delete()
+        res = self.client.get(
+            PUBLIC_PRODUCTS_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], first['ETag'])
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_etag_changes_on_write_from_other_process(self):
+        """
+        Fetching the product list with its ETag after a write whose
+        version bump this process never saw
+        should return 200 - OK and a new ETag
+        """
+        product = create_product(self.user)
+        first = self.client.get(PUBLIC_PRODUCTS_URL)
+
+        # A queryset update sends no signal, like a write made by another
+        # worker with its own cache
+        Product.objects.filter(pk=product.pk).update(
+            name='Renamed', updated_at=timezone.now())
+        res = self.client.get(
+            PUBLIC_PRODUCTS_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], first['ETag'])
+
+    def test_search_matches_name_and_description(self):
+        """
+        Searching products
+        should return the products whose name or description match
+        """
+        by_name = create_product(self.user, name='Wireless keyboard')
+        by_description = create_product(
+            self.user, name='Desk set', description='Mouse and keyboards')
+        create_product(self.user, name='Coffee mug')
+        res = self.client.get(PUBLIC_PRODUCTS_URL, {'search': 'keyboard'})
+        ids = {product['id'] for product in res.data['results']}
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(ids, {by_name.id, by_description.id})
+
+    def test_search_ranks_name_matches_first(self):
+        """
+        Searching products
+        should order name matches above description matches,
+        in both limit/offset and cursor mode
+        """
+        for index in range(3):
+            create_product(self.user, name=f'Lamp {index}',
+                           description='Lamp with a ceramic base')
+        for index in range(3):
+            create_product(self.user, name=f'Shade {index}',
+                           description='Fits any ceramic lamp')
+        names = Product.objects.filter(name__startswith='Lamp')
+        expected = set(names.values_list('id', flat=True))
+
+        res = self.client.get(PUBLIC_PRODUCTS_URL, {'search': 'lamp'})
+        ids = [product['id'] for product in res.data['results']]
+        self.assertEqual(set(ids[:3]), expected)
+
+        params = {'search': 'lamp', 'pagination': 'cursor', 'limit': 2}
+        res = self.client.get(PUBLIC_PRODUCTS_URL, params)
+        cursor_ids = []
+        while True:
+            cursor_ids += [product['id'] for product in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(set(cursor_ids)), 6)
+        self.assertEqual(set(cursor_ids[:3]), expected)
+
+    def test_invalid_cursor(self):
+        """
+        Fetching a page with a malformed cursor
+        should return 404 - Not Found
+        """
+        res = self.client.get(PUBLIC_PRODUCTS_URL, {'cursor': 'invalid'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class PrivateProductApiTests(TestCase):
     """
@@ -190,6 +583,67 @@ class PrivateProductApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertFalse(products.exists())
 
+    def test_create_product_category_queries_are_constant(self):
+        """
+        Creating a product with many categories
+        should run as many queries as with a single category
+        """
+        names = [create_category(name=f'Category {index}').name for index in range(15)]
+        payload = {'name': 'Generic product', 'price': 55, 'inventory': 1}
+
+        with CaptureQueriesContext(connection) as one_category:
+            self.client.post(
+                PRODUCTS_URL, {**payload, 'categories': names[:1]}, format='json')
+        clear_category_ids()
+        with CaptureQueriesContext(connection) as all_categories:
+            res = self.client.post(
+                PRODUCTS_URL, {**payload, 'categories': names}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['categories']), 15)
+        self.assertEqual(len(one_category), len(all_categories))
+
+    def test_category_names_are_cached(self):
+        """
+        Creating products with the same categories again
+        should not look their names up, until a category is renamed
+        """
+        category = create_category(name='Tech')
+        payload = {
+            'name': 'Generic product', 'price': 55, 'inventory': 1,
+            'categories': ['Tech'],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(PRODUCTS_URL, payload, format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(PRODUCTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any(
+            '"core_category"."name" IN' in query['sql'] for query in queries))
+
+        category.name = 'Gadgets'
+        category.save()
+        res = self.client.post(PRODUCTS_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_product_reports_every_missing_category(self):
+        """
+        Creating a product with several nonexistent categories
+        should return 400 - Bad Request listing all of them
+        """
+        create_category(name='Tech')
+        payload = {
+            'name': 'Generic product', 'price': 55, 'inventory': 1,
+            'categories': ['Tech', 'Hats', 'Shoes'],
+        }
+        res = self.client.post(PRODUCTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['categories'], [
+            'Category not found: hats', 'Category not found: shoes'])
+
     def test_creating_product_with_read_only_field(self):
         """
         Creating a product with ready only fields
@@ -319,3 +773,285 @@ class PrivateProductApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(Product.objects.filter(user=another_user).exists())
+
+
+class ProductBulkApiTests(TestCase):
+    """
+    Tests for bulk product import and export
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        create_category(name='shoes')
+        create_category(name='bags')
+
+    def upload(self, name, content, **data):
+        return self.client.post(IMPORT_URL, {
+            'file': SimpleUploadedFile(
+                name, content if isinstance(content, bytes) else content.encode()),
+            **data})
+
+    def test_import_csv(self):
+        """
+        Importing a CSV file
+        should return 201 - Created, create the valid rows
+        and report the invalid ones by line
+        """
+        content = (
+            'name,price,inventory,description,categories\n'
+            'Sneakers,120.50,10,Running shoes,"shoes,bags"\n'
+            'Tote,80,5,,bags\n'
+            'X,10,5,,shoes\n'
+            'Hat,60,5,,hats\n'
+        )
+        res = self.upload('products.csv', content)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(
+            sorted(error['line'] for error in res.data['errors']), [4, 5])
+        sneakers = Product.objects.get(user=self.user, name='Sneakers')
+        self.assertEqual(
+            sorted(sneakers.categories.values_list('name', flat=True)),
+            ['bags', 'shoes'])
+
+    def test_import_ndjson_resolves_categories_once_per_chunk(self):
+        """
+        Importing an NDJSON file
+        should run a constant number of queries per chunk
+        """
+        rows = [
+            {'name': f'Product {index}', 'price': 50 + index,
+             'inventory': 1, 'categories': ['shoes']}
+            for index in range(20)
+        ]
+        content = '\n'.join(json.dumps(row) for row in rows)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.upload('products.txt', content, file_format='ndjson')
+
+        self.assertEqual(res.data['created'], 20)
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(
+            Product.objects.filter(categories__name='shoes').count(), 20)
+
+    def test_import_invalid_utf8(self):
+        """
+        Importing a file that isn't UTF-8
+        should return 400 - Bad Request with the offending line
+        """
+        content = (
+            b'name,price,inventory\n'
+            b'Sneakers,120,10\n'
+            b'Caf\xe9,80,5\n'
+        )
+        res = self.upload('products.csv', content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 3)
+        self.assertFalse(Product.objects.filter(user=self.user).exists())
+
+    def test_import_malformed_csv(self):
+        """
+        Importing a CSV file that can't be parsed
+        should return 400 - Bad Request with the offending line
+        """
+        content = (
+            'name,price,inventory\n'
+            'Sneakers,120,10\n'
+            f'{"x" * 200000},80,5\n'
+        )
+        res = self.upload('products.csv', content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 3)
+
+    def test_import_unsupported_format(self):
+        """
+        Importing a file of an unknown format
+        should return 400 - Bad Request
+        """
+        res = self.upload('products.xml', '<products/>')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_round_trip(self):
+        """
+        Exporting products as CSV and NDJSON
+        should stream only the user's products, re-importable as is
+        """
+        product = create_product(self.user, name='Sneakers', price=120)
+        product.categories.set(Category.objects.all())
+        create_product(create_user(
+            email='other@email.com', username='otherusername'))
+
+        res = self.client.get(EXPORT_URL, {'file_format': 'ndjson'})
+        lines = b''.join(res.streaming_content).decode().splitlines()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['categories'], ['bags', 'shoes'])
+
+        res = self.client.get(EXPORT_URL, {'file_format': 'csv'})
+        content = b''.join(res.streaming_content).decode()
+        res = self.upload('products.csv', content)
+
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(
+            Product.objects.filter(user=self.user, name='Sneakers').count(), 2)
+
+    def test_import_export_commands(self):
+        """
+        Exporting with export_products and importing with import_products
+        should copy the products over to another user
+        """
+        create_product(self.user, name='Sneakers').categories.set(
+            Category.objects.all())
+        other_user = create_user(email='other@email.com', username='otherusername')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.ndjson')
+            call_command('export_products', self.user.email, output=path)
+            call_command('import_products', other_user.email, path,
+                         stdout=StringIO())
+
+        product = Product.objects.get(user=other_user)
+        self.assertEqual(product.name, 'Sneakers')
+        self.assertEqual(product.categories.count(), 2)
+
+
+class ProductSuggestApiTests(TestCase):
+    """
+    Tests for the typeahead suggestions API
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        ProductSuggestView.suggestions_cache.clear()
+
+    def test_suggest_by_prefix(self):
+        """
+        Fetching suggestions for a prefix
+        should return 200 - OK and only the ids and names of the matches
+        """
+        product = create_product(self.user, name='Keyboard')
+        create_product(self.user, name='Coffee mug')
+        res = self.client.get(SUGGEST_URL, {'q': 'key'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': product.id, 'name': product.name}])
+
+    def test_suggest_with_typo(self):
+        """
+        Fetching suggestions for a misspelled word
+        should still return the similar product names
+        """
+        product = create_product(self.user, name='Wireless keyboard')
+        res = self.client.get(SUGGEST_URL, {'q': 'keybord'})
+
+        self.assertEqual([item['id'] for item in res.data], [product.id])
+
+    def test_suggest_limit_is_capped(self):
+        """
+        Requesting more suggestions than the maximum
+        should return at most the maximum number of suggestions
+        """
+        for index in range(ProductSuggestView.max_limit + 5):
+            create_product(self.user, name=f'Lamp {index}')
+        res = self.client.get(SUGGEST_URL, {'q': 'lamp', 'limit': 100})
+
+        self.assertEqual(len(res.data), ProductSuggestView.max_limit)
+
+    def test_short_prefixes_are_cached(self):
+        """
+        Fetching suggestions for the same short prefix twice
+        should not query the database the second time
+        """
+        create_product(self.user, name='Lamp')
+        first = self.client.get(SUGGEST_URL, {'q': 'la'})
+
+        with self.assertNumQueries(0):
+            second = self.client.get(SUGGEST_URL, {'q': 'la'})
+
+        self.assertEqual(first.data, second.data)
+
+
+class ProductFacetsApiTests(TestCase):
+    """
+    Tests for the product facets endpoint
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        cache.clear()
+        self.shoes = create_category(name='shoes')
+        self.bags = create_category(name='bags')
+
+        for price, categories in [
+            (50, [self.shoes]),
+            (120, [self.shoes, self.bags]),
+            (180, [self.bags]),
+            (250, [self.shoes]),
+        ]:
+            product = create_product(self.user, price=price)
+            product.categories.set(categories)
+
+    def test_facets(self):
+        """
+        Fetching the facets
+        should return 200 - OK, the category counts and price histogram
+        """
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(facet['name'], facet['count']) for facet in res.data['categories']],
+            [('shoes', 3), ('bags', 2)])
+        self.assertEqual(
+            [(bucket['min'], bucket['max'], bucket['count'])
+             for bucket in res.data['price_histogram']],
+            [('0.00', '100.00', 1), ('100.00', '200.00', 2), ('200.00', '300.00', 1)])
+
+    def test_facets_ignore_their_own_filter(self):
+        """
+        Fetching the facets with category and price filters
+        should apply the price filter to category counts
+        and the category filter to the price histogram
+        """
+        res = self.client.get(FACETS_URL, {
+            'categories': 'bags',
+            'price_min': 100,
+            'price_interval': 50,
+        })
+
+        self.assertEqual(
+            [(facet['name'], facet['count']) for facet in res.data['categories']],
+            [('bags', 2), ('shoes', 2)])
+        self.assertEqual(
+            [(bucket['min'], bucket['count']) for bucket in res.data['price_histogram']],
+            [('100.00', 1), ('150.00', 1)])
+
+    def test_facets_query_count(self):
+        """
+        Fetching the facets
+        should run one query per facet and serve repeats from the cache
+        """
+        with self.assertNumQueries(2):
+            self.client.get(FACETS_URL, {'price_interval': 25})
+        with self.assertNumQueries(0):
+            res = self.client.get(FACETS_URL, {'price_interval': 25})
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_invalid_price_interval(self):
+        """
+        Fetching the facets with a price interval below 1
+        should return 400 - Bad Request
+        """
+        res = self.client.get(FACETS_URL, {'price_interval': 0})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
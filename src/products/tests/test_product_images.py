@@ -0,0 +1,209 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, ImageJob
+from helpers.test_helpers import create_product, create_user
+from products.images import IMAGE_FORMATS, IMAGE_VARIANTS
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def upload_url(id):
+    return reverse('products:products-upload-image', args=[id])
+
+
+def detail_url(id):
+    return reverse('products:products-detail', args=[id])
+
+
+def create_image_file(color='red', size=(800, 600)):
+    """
+    Helper function to return an uploadable JPEG image
+    """
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+
+    return SimpleUploadedFile(
+        'image.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ProductImagePipelineTests(TestCase):
+    """
+    Tests for product image uploads and variant rendering
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.product = create_product(self.user)
+
+    def process_images(self):
+        call_command('process_images', once=True, workers=1, stdout=StringIO())
+
+    def test_upload_queues_image_job(self):
+        """
+        Uploading an image
+        should return 200 - OK, store the image untouched
+        and queue a job for its variants
+        """
+        res = self.client.post(
+            upload_url(self.product.id), {'image': create_image_file()})
+        self.product.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.product.image_variants, {})
+        with Image.open(self.product.image.path) as img:
+            self.assertEqual(img.size, (800, 600))
+        self.assertTrue(ImageJob.objects.filter(
+            product=self.product, status=ImageJob.PENDING).exists())
+
+    def test_process_images_renders_variants(self):
+        """
+        Running the image worker
+        should render every variant in every format
+        """
+        self.client.post(
+            upload_url(self.product.id), {'image': create_image_file()})
+        self.process_images()
+        self.product.refresh_from_db()
+        job = ImageJob.objects.get(product=self.product)
+
+        self.assertEqual(job.status, ImageJob.DONE)
+        self.assertEqual(self.product.image_hash, job.source_hash)
+        self.assertEqual(set(self.product.image_variants), set(IMAGE_VARIANTS))
+
+        for variant, max_size in IMAGE_VARIANTS.items():
+            formats = self.product.image_variants[variant]
+            self.assertEqual(set(formats), set(IMAGE_FORMATS))
+
+            for name in formats.values():
+                with Image.open(os.path.join(MEDIA_ROOT, name)) as img:
+                    self.assertLessEqual(img.size[0], max_size[0])
+
+        res = self.client.get(detail_url(self.product.id))
+        self.assertTrue(
+            res.data['image_variants']['card']['webp'].endswith('card.webp'))
+
+    def test_same_image_is_not_reprocessed(self):
+        """
+        Uploading the same image again
+        should not queue another job
+        """
+        image = create_image_file()
+        self.client.post(upload_url(self.product.id), {'image': image})
+        self.process_images()
+        image.seek(0)
+        self.client.post(upload_url(self.product.id), {'image': image})
+
+        self.assertEqual(ImageJob.objects.filter(product=self.product).count(), 1)
+
+    def test_reuploading_previous_image_replaces_pending_one(self):
+        """
+        Uploading the rendered image again while another upload is pending
+        should store it back on the product
+        """
+        first = create_image_file('red')
+        self.client.post(upload_url(self.product.id), {'image': first})
+        self.process_images()
+        self.product.refresh_from_db()
+        first_name = self.product.image.name
+
+        self.client.post(
+            upload_url(self.product.id), {'image': create_image_file('blue')})
+        first.seek(0)
+        self.client.post(upload_url(self.product.id), {'image': first})
+        self.product.refresh_from_db()
+
+        self.assertEqual(self.product.image.name, first_name)
+        self.assertEqual(
+            ImageJob.objects.get(
+                product=self.product, status=ImageJob.PENDING).source,
+            first_name)
+
+    def test_updating_product_does_not_reprocess_image(self):
+        """
+        Updating the price of a product with an image
+        should not queue another job
+        """
+        self.client.post(
+            upload_url(self.product.id), {'image': create_image_file()})
+        self.process_images()
+        res = self.client.patch(detail_url(self.product.id), {'price': 75})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(ImageJob.objects.filter(product=self.product).count(), 1)
+
+    def test_same_image_is_stored_once(self):
+        """
+        Uploading the same image to two products
+        should store a single content-addressed file referenced twice
+        """
+        other = create_product(self.user, name='Other product')
+        image = create_image_file()
+        self.client.post(upload_url(self.product.id), {'image': image})
+        image.seek(0)
+        self.client.post(upload_url(other.id), {'image': image})
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+
+        blob = ImageBlob.objects.get()
+        self.assertEqual(self.product.image.name, blob.name)
+        self.assertEqual(other.image.name, blob.name)
+        self.assertIn(blob.digest, blob.name)
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(self.product.image.path))), 1)
+
+    def test_unreferenced_images_are_collected(self):
+        """
+        Replacing a product's image
+        should release the old image, which gc_images then deletes
+        """
+        self.client.post(
+            upload_url(self.product.id), {'image': create_image_file('red')})
+        self.process_images()
+        self.product.refresh_from_db()
+        old_path = self.product.image.path
+        old_variants = os.path.dirname(os.path.join(
+            MEDIA_ROOT, self.product.image_variants['card']['webp']))
+
+        self.client.post(
+            upload_url(self.product.id), {'image': create_image_file('blue')})
+        call_command('gc_images', grace_period=0, stdout=StringIO())
+        self.product.refresh_from_db()
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertFalse(os.path.exists(old_variants))
+        self.assertTrue(os.path.exists(self.product.image.path))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', flat=True)),
+            [self.product.image.name])
+
+    def test_deleting_product_releases_image(self):
+        """
+        Deleting a product
+        should drop its reference to the image
+        """
+        self.client.post(
+            upload_url(self.product.id), {'image': create_image_file()})
+        self.product.refresh_from_db()
+        self.product.delete()
+
+        self.assertEqual(ImageBlob.objects.get().refcount, 0)
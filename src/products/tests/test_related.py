@@ -0,0 +1,129 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Order, OrderItem, ProductPair
+from helpers.test_helpers import create_product, create_user
+
+
+def related_url(pk):
+    return reverse('products:public-related', args=[pk])
+
+
+class RelatedProductApiTests(TestCase):
+    """
+    Tests for the frequently bought together products
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.products = [
+            create_product(self.user, name=f'Product {index}')
+            for index in range(4)
+        ]
+        cache.clear()
+
+    def buy(self, *products, status=Order.PAID, **fields):
+        order = Order.objects.create(user=self.user, status=status, **fields)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product,
+                      unit_price=product.price, quantity=1)
+            for product in products
+        ])
+
+        return order
+
+    def build(self, **options):
+        call_command('build_related_products', stdout=StringIO(), **options)
+
+    def get_related(self, product):
+        res = self.client.get(related_url(product.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(entry['product']['id'], entry['orders']) for entry in res.data]
+
+    def test_related_products(self):
+        """
+        Fetching the related products of a product
+        should rank the products bought with it by number of orders
+        """
+        first, second, third, fourth = self.products
+        self.buy(first, second, third)
+        self.buy(first, third)
+        self.buy(second, fourth)
+        self.build()
+
+        self.assertEqual(self.get_related(first), [(third.id, 2), (second.id, 1)])
+        self.assertEqual(
+            self.get_related(second), [(first.id, 1), (third.id, 1), (fourth.id, 1)])
+        self.assertEqual(self.get_related(fourth), [(second.id, 1)])
+
+    def test_incremental_build(self):
+        """
+        Building again after new orders
+        should only count the new orders, across several batches
+        """
+        first, second, third, _ = self.products
+        self.buy(first, second)
+        self.build()
+        self.buy(first, third)
+        self.buy(first, third)
+        self.buy(first, second, status=Order.CANCELLED)
+        self.build(batch_size=1)
+
+        self.assertEqual(self.get_related(first), [(third.id, 2), (second.id, 1)])
+        self.assertFalse(Order.objects.filter(pairs_counted=False).exists())
+
+        self.build(full=True)
+
+        self.assertEqual(self.get_related(first), [(third.id, 2), (second.id, 1)])
+        self.assertEqual(ProductPair.objects.count(), 4)
+
+    def test_pending_orders_wait_until_paid(self):
+        """
+        Building while an order is pending
+        should leave it uncounted until it is paid
+        """
+        first, second, _, _ = self.products
+        order = self.buy(first, second, status=Order.PENDING)
+        self.build()
+
+        self.assertEqual(self.get_related(first), [])
+        order.refresh_from_db()
+        self.assertFalse(order.pairs_counted)
+
+        Order.objects.filter(pk=order.pk).update(status=Order.PAID)
+        self.build()
+
+        self.assertEqual(self.get_related(first), [(second.id, 1)])
+
+    def test_size_limits_related_products(self):
+        """
+        Building with a size
+        should keep only that many related products per product
+        """
+        self.buy(*self.products)
+        self.build(size=2)
+
+        self.assertEqual(
+            self.get_related(self.products[0]),
+            [(self.products[1].id, 1), (self.products[2].id, 1)])
+
+    def test_single_query(self):
+        """
+        Fetching the related products
+        should read them with the products in one query
+        """
+        self.buy(*self.products)
+        self.build()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(related_url(self.products[0].id))
+
+        self.assertEqual(len(res.data), 3)
@@ -1,8 +1,10 @@
 from django.urls import path
 from rest_framework.routers import SimpleRouter
 
-from products.views import (ProductViewSet, PublicProductDetailView,
-                            PublicProductView)
+from products.views import (CatalogueCacheStatsView, LeaderboardView,
+                            ProductFacetsView, ProductSuggestView,
+                            ProductViewSet, PublicProductDetailView,
+                            PublicProductView, RelatedProductView)
 
 app_name = 'products'
 
@@ -12,7 +14,15 @@ router.register('user/products', ProductViewSet, basename='products')
 urlpatterns = [
     path('public/<int:pk>/', PublicProductDetailView.as_view(),
          name='public-retrieve'),
+    path('public/<int:pk>/related/', RelatedProductView.as_view(),
+         name='public-related'),
+    path('public/facets/', ProductFacetsView.as_view(), name='public-facets'),
+    path('public/leaderboards/<str:period>/', LeaderboardView.as_view(),
+         name='public-leaderboards'),
     path('public/', PublicProductView.as_view(), name='public-list'),
+    path('suggest/', ProductSuggestView.as_view(), name='suggest'),
+    path('cache_stats/', CatalogueCacheStatsView.as_view(),
+         name='cache-stats'),
 
 ]
 
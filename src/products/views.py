@@ -1,28 +1,65 @@
-from rest_framework import generics, permissions, status, viewsets
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.utils import translate_validation
+from rest_framework import (exceptions, generics, permissions, status,
+                            viewsets)
 from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from core.filters import ProductFilter
-from core.models import Product
-from products.serializers import ProductSerializer
+from carts.pricing import reprice_carts
+from core.cache import LocalTTLCache, get_cache_stats
+from core.filters import ProductFilter, ProductSearchFilter
+from core.lookups import TrigramWordSimilarity
+from core.mixins import (CachedResponseMixin, ConditionalGetMixin,
+                         FastListMixin, QuerysetPlannerMixin)
+from core.models import Category, LeaderboardEntry, Product, RelatedProduct
+from core.pagination import OptInCursorPagination
+from products.bulk import (CONTENT_TYPES, InvalidImportFile, decode_lines,
+                           export_products, get_file_format, import_products)
+from products.cache import (CATALOGUE, CATEGORIES, LEADERBOARDS,
+                            RELATED_PRODUCTS, product_version)
+from products.facets import category_counts, price_histogram
+from products.images import store_image
+from products.serializers import (LeaderboardEntrySerializer,
+                                  ProductFacetsSerializer, ProductSerializer,
+                                  ProductSuggestionSerializer,
+                                  RelatedProductSerializer)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(FastListMixin, QuerysetPlannerMixin, viewsets.ModelViewSet):
     serializer_class = ProductSerializer
+    queryset = Product.objects.order_by('id')
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptInCursorPagination
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name']
-    ordering_fields = ['price', 'total_sold', 'created_at']
+    ordering_fields = ['price', 'total_sold', 'created_at', 'rating_avg']
 
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        price = serializer.instance.price
+        product = serializer.save()
+        self.carts_repriced = (
+            reprice_carts([product.pk]) if product.price != price else 0)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['X-Carts-Repriced'] = self.carts_repriced
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload_image',
             parser_classes=[MultiPartParser])
     def upload_image(self, request, pk=None):
@@ -30,23 +67,278 @@ class ProductViewSet(viewsets.ModelViewSet):
         image = request.FILES.get('image')
 
         if image:
-            product.image = image
-            product.save()
+            store_image(product, image)
             return Response({'detail': 'Image uploaded.'},
                             status=status.HTTP_200_OK)
 
         return Response({'detail': 'Image not found.'},
                         status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['POST'], detail=False, url_path='import',
+            parser_classes=[MultiPartParser])
+    def import_products(self, request):
+        """
+        Import products from an uploaded CSV or NDJSON file.
+        Invalid rows are skipped and reported with their line number.
+        """
+        upload = request.FILES.get('file')
+
+        if not upload:
+            return Response({'detail': 'File not found.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            file_format = get_file_format(
+                request.data.get('file_format'), upload.name)
+        except ValueError as e:
+            return Response({'detail': str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = import_products(
+                request.user, decode_lines(upload.file), file_format)
+        except InvalidImportFile as e:
+            return Response({'detail': str(e), 'line': e.line},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result, status=status.HTTP_201_CREATED)
 
-class PublicProductView(generics.ListAPIView):
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export_products(self, request):
+        """
+        Stream the user's products as NDJSON (default) or CSV
+        """
+        try:
+            file_format = get_file_format(
+                request.query_params.get('file_format', 'ndjson'))
+        except ValueError as e:
+            return Response({'detail': str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            export_products(request.user, file_format),
+            content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = \
+            f'attachment; filename="products.{file_format}"'
+
+        return response
+
+
+class PublicProductView(ConditionalGetMixin, CachedResponseMixin,
+                        FastListMixin, QuerysetPlannerMixin,
+                        generics.ListAPIView):
     serializer_class = ProductSerializer
-    queryset = Product.objects.all()
+    queryset = Product.objects.order_by('id')
+    pagination_class = OptInCursorPagination
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name']
-    ordering_fields = ['price', 'total_sold', 'created_at']
+    ordering_fields = ['price', 'total_sold', 'created_at', 'rating_avg']
+    cache_name = CATALOGUE
+
+    def get_cache_versions(self):
+        return [CATALOGUE]
 
 
-class PublicProductDetailView(generics.RetrieveAPIView):
+class PublicProductDetailView(ConditionalGetMixin, CachedResponseMixin,
+                              QuerysetPlannerMixin, generics.RetrieveAPIView):
     serializer_class = ProductSerializer
     queryset = Product.objects.all()
+    cache_name = CATALOGUE
+
+    def get_cache_versions(self):
+        return [CATEGORIES, product_version(self.kwargs['pk'])]
+
+
+class ProductFacetsView(CachedResponseMixin, generics.GenericAPIView):
+    """
+    Category counts and price histogram for the filter sidebar,
+    accepting the same filter and search parameters as the product list.
+
+    Each facet ignores its own filter, so the counts of the other
+    categories and price ranges stay visible once one is selected.
+    """
+    serializer_class = ProductFacetsSerializer
+    queryset = Product.objects.all()
+    pagination_class = None
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter]
+    filterset_class = ProductFilter
+    default_price_interval = Decimal(100)
+    cache_name = 'facets'
+    cache_timeout = 60
+
+    def get_cache_versions(self):
+        return [CATALOGUE]
+
+    def get_price_interval(self):
+        value = self.request.query_params.get('price_interval')
+
+        if value is None:
+            return self.default_price_interval
+
+        try:
+            interval = Decimal(value)
+        except InvalidOperation:
+            interval = None
+
+        if interval is None or not interval.is_finite() or interval < 1:
+            raise exceptions.ValidationError(
+                {'price_interval': 'Must be a number greater than or equal to 1.'})
+
+        return interval
+
+    def filter_products(self, exclude=()):
+        params = self.request.query_params.copy()
+        for name in exclude:
+            params.pop(name, None)
+
+        filterset = self.filterset_class(
+            params, queryset=self.get_queryset(), request=self.request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+
+        return ProductSearchFilter().filter_queryset(
+            self.request, filterset.qs, self)
+
+    def get_facets(self, request, *args, **kwargs):
+        interval = self.get_price_interval()
+        facets = {
+            'categories': category_counts(
+                self.filter_products(exclude=['categories'])),
+            'price_interval': interval,
+            'price_histogram': price_histogram(
+                self.filter_products(exclude=['price_min', 'price_max']),
+                interval),
+        }
+
+        return Response(self.get_serializer(facets).data)
+
+    def get(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            self.get_facets, request, *args, **kwargs)
+
+
+class LeaderboardView(CachedResponseMixin, QuerysetPlannerMixin,
+                      generics.ListAPIView):
+    """
+    Best sellers of the last 24h, 7d or 30d, overall or within the
+    category given by name or slug.
+    Rankings are precomputed by refresh_leaderboards, so a page is an
+    index range read on the leaderboard table.
+    """
+    serializer_class = LeaderboardEntrySerializer
+    queryset = LeaderboardEntry.objects.order_by('rank')
+    filter_backends = []
+    cache_name = 'leaderboards'
+
+    def get_cache_versions(self):
+        return [LEADERBOARDS, CATALOGUE]
+
+    def get_category(self):
+        value = self.request.query_params.get('category')
+
+        if not value:
+            return None
+
+        category = Category.objects.filter(
+            Q(name=value.lower()) | Q(slug=value)).first()
+        if category is None:
+            raise exceptions.NotFound('Category not found.')
+
+        return category
+
+    def get_queryset(self):
+        period = self.kwargs['period']
+
+        if period not in LeaderboardEntry.PERIOD_HOURS:
+            raise exceptions.NotFound(
+                f'Unknown period, expected one of: '
+                f'{", ".join(LeaderboardEntry.PERIOD_HOURS)}.')
+
+        return super().get_queryset().filter(
+            period=period, category=self.get_category())
+
+
+class RelatedProductView(CachedResponseMixin, QuerysetPlannerMixin,
+                         generics.ListAPIView):
+    """
+    Products frequently bought together with a product.
+    Precomputed by build_related_products, so the list is a single
+    index range read joined to the related products.
+    """
+    serializer_class = RelatedProductSerializer
+    queryset = RelatedProduct.objects.order_by('rank')
+    pagination_class = None
+    filter_backends = []
+    cache_name = 'related'
+
+    def get_cache_versions(self):
+        return [RELATED_PRODUCTS, CATALOGUE]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(product=self.kwargs['pk'])
+
+
+class CatalogueCacheStatsView(APIView):
+    """
+    Hit/miss counters of the public catalogue response cache
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_cache_stats(CATALOGUE))
+
+
+class ProductSuggestView(generics.ListAPIView):
+    """
+    Typeahead suggestions for the storefront search box.
+    Matches name prefixes through the UPPER(name) prefix index and typos
+    through the trigram index on Product.name, returning only ids and
+    names.
+    Short prefixes match the most rows, so they are cached in memory.
+    """
+    serializer_class = ProductSuggestionSerializer
+    pagination_class = None
+    filter_backends = []
+    default_limit = 8
+    max_limit = 10
+    max_cached_length = 3
+    suggestions_cache = LocalTTLCache(max_size=4096, timeout=30)
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return self.default_limit
+
+        return max(1, min(limit, self.max_limit))
+
+    def get_suggestions(self, term, limit):
+        suggestions = (
+            Product.objects.filter(
+                Q(name__istartswith=term) | Q(name__trigram_word_similar=term))
+            .annotate(similarity=TrigramWordSimilarity(term, 'name'))
+            .order_by('-similarity', 'name', 'id')
+            .values('id', 'name')[:limit]
+        )
+
+        return self.get_serializer(suggestions, many=True).data
+
+    def list(self, request, *args, **kwargs):
+        term = ' '.join(request.query_params.get('q', '').lower().split())
+        limit = self.get_limit()
+
+        if not term:
+            return Response([])
+
+        if len(term) > self.max_cached_length:
+            return Response(self.get_suggestions(term, limit))
+
+        key = (term, limit)
+        suggestions = self.suggestions_cache.get(key)
+
+        if suggestions is None:
+            suggestions = self.get_suggestions(term, limit)
+            self.suggestions_cache.set(key, suggestions)
+
+        return Response(suggestions)
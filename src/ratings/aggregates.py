@@ -0,0 +1,88 @@
+"""
+Denormalized rating aggregates on Product.
+
+Null ratings (comment only) are left out of the sum and count.
+rating_avg is recomputed from the updated sum and count in the same
+UPDATE, so it never needs a read of the ratings table.
+"""
+from decimal import Decimal
+
+from django.db.models import (Count, DecimalField, ExpressionWrapper, F,
+                              IntegerField, OuterRef, Q, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from core.models import Product, Rating
+from products.cache import invalidate_product_cache
+
+ZERO = Value(Decimal(0))
+
+
+def get_average(rating_sum, rating_count):
+    return Coalesce(
+        ExpressionWrapper(
+            rating_sum / NullIf(rating_count, 0),
+            output_field=DecimalField(),
+        ),
+        ZERO,
+    )
+
+
+def apply_rating_delta(product_id, old_rating=None, new_rating=None):
+    """
+    Update the product aggregates for a rating that changed from
+    old_rating to new_rating, None meaning no rating on that side
+    """
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    count_delta = (new_rating is not None) - (old_rating is not None)
+
+    if not sum_delta and not count_delta:
+        return
+
+    rating_sum = F('rating_sum') + Value(Decimal(sum_delta))
+    rating_count = F('rating_count') + count_delta
+
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating_avg=get_average(rating_sum, rating_count),
+        updated_at=timezone.now(),
+    )
+    invalidate_product_cache([product_id])
+
+
+def rebuild_rating_aggregates(start_id, end_id):
+    """
+    Recompute the aggregates of the products with start_id <= id < end_id
+    from the ratings table, in one UPDATE for the products whose
+    aggregates drifted
+
+    :returns: ids of the products updated
+    """
+    ratings = Rating.objects.filter(
+        product=OuterRef('pk'), rating__isnull=False,
+    ).order_by().values('product')
+    rating_sum = Coalesce(
+        Subquery(ratings.annotate(total=Sum('rating')).values('total')),
+        ZERO, output_field=DecimalField())
+    rating_count = Coalesce(
+        Subquery(ratings.annotate(total=Count('pk')).values('total')),
+        0, output_field=IntegerField())
+
+    product_ids = list(
+        Product.objects.filter(pk__gte=start_id, pk__lt=end_id)
+        .annotate(new_sum=rating_sum, new_count=rating_count)
+        .filter(~Q(rating_sum=F('new_sum')) | ~Q(rating_count=F('new_count')))
+        .values_list('pk', flat=True)
+    )
+
+    if product_ids:
+        Product.objects.filter(pk__in=product_ids).update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            rating_avg=get_average(rating_sum, rating_count),
+            updated_at=timezone.now(),
+        )
+        invalidate_product_cache(product_ids)
+
+    return product_ids
@@ -0,0 +1,35 @@
+from rest_framework import serializers
+
+from core.models import Rating
+
+
+class RatingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for Rating
+    """
+    class Meta:
+        model = Rating
+        fields = ['id', 'user', 'product', 'rating', 'comment', 'created_at']
+        extra_kwargs = {
+            'id': {'read_only': True},
+            'user': {'read_only': True},
+            'created_at': {'read_only': True},
+        }
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        product = attrs.get('product')
+
+        if (self.instance is None
+                and Rating.objects.filter(user=user, product=product).exists()):
+            raise serializers.ValidationError(
+                'You have already rated this product.')
+
+        return attrs
+
+
+class RatingDetailSerializer(RatingSerializer):
+
+    class Meta(RatingSerializer.Meta):
+        extra_kwargs = dict(RatingSerializer.Meta.extra_kwargs)
+        extra_kwargs.update({'product': {'read_only': True}})
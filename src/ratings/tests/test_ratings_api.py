@@ -0,0 +1,198 @@
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product, Rating
+from helpers.test_helpers import create_product, create_user
+from ratings.serializers import RatingSerializer
+
+RATINGS_URL = reverse('api:ratings-list')
+PUBLIC_PRODUCTS_URL = reverse('products:public-list')
+
+
+def detail_url(id):
+    return reverse('api:ratings-detail', args=[id])
+
+
+class PublicRatingsApiTests(TestCase):
+    """
+    Tests for unauthenticated ratings api requests
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.product = create_product(self.user)
+
+    def test_list_ratings(self):
+        """
+        Fetching the ratings of a product
+        should return 200 - OK and only that product's ratings
+        """
+        other_product = create_product(self.user)
+        Rating.objects.create(user=self.user, product=self.product, rating=4)
+        Rating.objects.create(user=self.user, product=other_product, rating=2)
+        res = self.client.get(RATINGS_URL, {'product': self.product.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['rating'], '4.0')
+
+    def test_create_rating_unauthorized(self):
+        """
+        Creating a rating without authentication
+        should return 401 - Unauthorized
+        """
+        res = self.client.post(
+            RATINGS_URL, {'product': self.product.id, 'rating': 4})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRatingsApiTests(TestCase):
+    """
+    Tests for authenticated ratings api requests
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.other_user = create_user(
+            email='other@email.com', username='otherusername')
+        self.client.force_authenticate(self.user)
+        self.product = create_product(self.other_user)
+
+    def rate(self, rating, user=None):
+        return Rating.objects.create(
+            user=user or self.other_user, product=self.product, rating=rating)
+
+    def assertAggregates(self, rating_count, rating_avg):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, rating_count)
+        self.assertEqual(self.product.rating_avg, Decimal(rating_avg))
+
+    def test_create_rating(self):
+        """
+        Rating a product
+        should return 201 - Created and update its aggregates
+        """
+        res = self.client.post(
+            RATINGS_URL, {'product': self.product.id, 'rating': 4})
+        self.client.force_authenticate(self.other_user)
+        self.client.post(RATINGS_URL, {'product': self.product.id, 'rating': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['user'], self.user.id)
+        self.assertAggregates(2, '4.50')
+
+    def test_create_comment_only_rating(self):
+        """
+        Rating a product with only a comment
+        should not count towards its aggregates
+        """
+        res = self.client.post(RATINGS_URL, {
+            'product': self.product.id, 'rating': '', 'comment': 'Nice'},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED, res.data)
+        self.assertAggregates(0, '0')
+
+    def test_rating_twice(self):
+        """
+        Rating the same product twice
+        should return 400 - Bad Request
+        """
+        self.client.post(RATINGS_URL, {'product': self.product.id, 'rating': 4})
+        res = self.client.post(
+            RATINGS_URL, {'product': self.product.id, 'rating': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertAggregates(1, '4')
+
+    def test_rating_twice_concurrently(self):
+        """
+        Rating a product already rated by a request that passed
+        validation at the same time
+        should return 400 - Bad Request
+        """
+        self.client.post(RATINGS_URL, {'product': self.product.id, 'rating': 4})
+
+        with patch.object(RatingSerializer, 'validate', lambda self, attrs: attrs):
+            res = self.client.post(
+                RATINGS_URL, {'product': self.product.id, 'rating': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertAggregates(1, '4')
+
+    def test_update_rating(self):
+        """
+        Updating a rating
+        should return 200 - OK and apply the difference to the aggregates
+        """
+        rating = self.client.post(
+            RATINGS_URL, {'product': self.product.id, 'rating': 2}).data
+        res = self.client.patch(detail_url(rating['id']), {'rating': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertAggregates(1, '5')
+
+    def test_delete_rating(self):
+        """
+        Deleting a rating
+        should return 204 - No Content and remove it from the aggregates
+        """
+        rating = self.client.post(
+            RATINGS_URL, {'product': self.product.id, 'rating': 2}).data
+        res = self.client.delete(detail_url(rating['id']))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertAggregates(0, '0')
+
+    def test_update_other_users_rating(self):
+        """
+        Updating the rating of another user
+        should return 404 - Not Found
+        """
+        rating = self.rate(3)
+        res = self.client.patch(detail_url(rating.id), {'rating': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_products_sorted_and_filtered_by_rating(self):
+        """
+        Fetching products ordered and filtered by rating
+        should use the rating aggregates
+        """
+        low = create_product(self.other_user, name='Low')
+        self.client.post(RATINGS_URL, {'product': self.product.id, 'rating': 5})
+        self.client.post(RATINGS_URL, {'product': low.id, 'rating': 2})
+
+        res = self.client.get(PUBLIC_PRODUCTS_URL, {'ordering': '-rating_avg'})
+        self.assertEqual(
+            [product['id'] for product in res.data['results']],
+            [self.product.id, low.id])
+
+        res = self.client.get(PUBLIC_PRODUCTS_URL, {'rating_min': 4})
+        self.assertEqual(
+            [product['id'] for product in res.data['results']],
+            [self.product.id])
+
+    def test_rebuild_ratings(self):
+        """
+        Rebuilding the rating aggregates
+        should recompute them from the ratings table
+        """
+        self.rate(4)
+        self.rate(1, user=self.user)
+        Product.objects.filter(pk=self.product.pk).update(
+            rating_sum=0, rating_count=0, rating_avg=0)
+
+        call_command('rebuild_ratings', chunk_size=1, stdout=StringIO())
+
+        self.assertAggregates(2, '2.5')
@@ -0,0 +1,6 @@
+from rest_framework.routers import SimpleRouter
+
+from ratings.views import RatingViewSet
+
+router = SimpleRouter()
+router.register('ratings', RatingViewSet, basename='ratings')
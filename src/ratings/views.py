@@ -0,0 +1,63 @@
+from django.db import IntegrityError, transaction
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import permissions, serializers, viewsets
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from core.models import Rating
+from ratings.aggregates import apply_rating_delta
+from ratings.serializers import RatingDetailSerializer, RatingSerializer
+
+
+class RatingViewSet(viewsets.ModelViewSet):
+    """
+    Product ratings. Anyone can read them, users manage their own.
+    Every write updates the product's rating aggregates in the
+    same transaction.
+    """
+    serializer_class = RatingDetailSerializer
+    queryset = Rating.objects.select_related('user').order_by('-created_at', '-id')
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    http_method_names = ['get', 'post', 'head', 'options', 'patch', 'delete']
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['product', 'user']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.request.method not in permissions.SAFE_METHODS:
+            queryset = queryset.filter(user=self.request.user)
+
+        return queryset
+
+    def get_serializer_class(self):
+        if (self.action == 'create' or self.action == 'list'):
+            return RatingSerializer
+        return self.serializer_class
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        try:
+            with transaction.atomic():
+                rating = serializer.save(user=self.request.user)
+        except IntegrityError:
+            # A concurrent request rated the product after validation
+            raise serializers.ValidationError(
+                'You have already rated this product.')
+        apply_rating_delta(rating.product_id, new_rating=rating.rating)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # Locked so concurrent updates apply their deltas one after another
+        old_rating = Rating.objects.select_for_update().values_list(
+            'rating', flat=True).get(pk=serializer.instance.pk)
+        rating = serializer.save()
+        apply_rating_delta(
+            rating.product_id, old_rating=old_rating, new_rating=rating.rating)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        old_rating = Rating.objects.select_for_update().values_list(
+            'rating', flat=True).get(pk=instance.pk)
+        instance.delete()
+        apply_rating_delta(instance.product_id, old_rating=old_rating)